@@ -1,20 +1,42 @@
 import streamlit as st
 import os
+import time
+import uuid
 from dotenv import load_dotenv
 from auth.clerk_auth import get_user_token, get_user_data, verify_session
 from auth.resume_parser import parse_resume
-from database.chroma_connection import get_chroma_client
+from auth.tech_keywords import score_skills
+from database.storage import initialize_storage
 from database.user_operations import create_user, get_user_by_email, update_user
-from chat.chat_manager import initialize_chat, send_message, get_chat_history
-from utils.matching import find_random_match, find_city_match
-from moderation.language_filter import check_message_toxicity
+from database.inbox_operations import get_inbox, mark_conversation_read
+from database.search_operations import search_messages
+from database.analytics import get_dashboard
+from chat.chat_manager import initialize_chat, send_message, get_chat_history, subscribe_to_chat, unsubscribe_from_chat
+from chat.chat_view import render_chat_view, watch_for_new_messages
+from utils.pairing import start_live_match, check_live_match, cancel_live_match, finish_match
+from moderation.language_filter import check_message_toxicity, ModerationBusyError
+from moderation.moderation_queue import get_moderation_mode
 from payments.payment_gateway import create_subscription, verify_payment, get_subscription_plans
+from utils.tracing import begin_rerun, end_rerun, is_enabled as tracing_enabled
+from utils.debug_panel import render_trace_panel, render_warmup_panel, render_moderation_panel
+from utils.profiling import begin_profile, end_profile
+from utils.presence import get_presence_tracker
+from utils.rate_limit import check_send_rate, refund_send_rate
+from utils.warmup import warm_up, is_ready
+from utils.config import (
+    PRESENCE_HEARTBEAT_SECONDS, PAIRING_POLL_SECONDS, WARMUP_ENABLED, ADMIN_EMAILS, ANALYTICS_FLUSH_SECONDS
+)
 
 # Load environment variables
 load_dotenv()
 
-# Initialize ChromaDB
-chroma_client = get_chroma_client()
+# Warm up this server process before serving, unless python -m utils.warmup --serve already did;
+# sessions that arrive during the warm-up wait for it (see utils/warmup.py)
+if WARMUP_ENABLED and not is_ready():
+    warm_up()
+
+# Initialize storage (opens ChromaDB unless another backend is configured)
+initialize_storage()
 
 # Page configuration
 st.set_page_config(
@@ -51,6 +73,10 @@ st.markdown("""
         border-radius: 10px;
         margin: 5px 0;
     }
+    .chat-message-status {
+        font-size: 0.75rem;
+        color: #777;
+    }
     .message-count {
         font-size: 0.8rem;
         color: #777;
@@ -232,6 +258,18 @@ if 'selected_plan' not in st.session_state:
     st.session_state.selected_plan = None
 if 'page' not in st.session_state:
     st.session_state.page = "Welcome"  # default page
+if 'pairing' not in st.session_state:
+    st.session_state.pairing = None  # live pairing ticket and city while waiting for a partner
+if 'pairing_error' not in st.session_state:
+    st.session_state.pairing_error = None
+if 'trace_session_id' not in st.session_state:
+    st.session_state.trace_session_id = str(uuid.uuid4())
+
+# Collect tracing spans for this rerun (no-op unless TRACING_ENABLED is set)
+begin_rerun(st.session_state.trace_session_id, st.session_state.page)
+
+# Profile this rerun with cProfile / tracemalloc (no-op unless PROFILE_MODE is set)
+begin_profile(st.session_state.page)
 
 # Main app header
 st.markdown("<h1 class='main-header'>TechConnect India 🇮🇳</h1>", unsafe_allow_html=True)
@@ -268,6 +306,63 @@ def change_page(page_name):
     st.session_state.page = page_name
     st.rerun()
 
+# Keep the user online while their tab is open, even if they do not interact
+@st.fragment(run_every=PRESENCE_HEARTBEAT_SECONDS)
+def keep_presence_alive(user_email, city):
+    get_presence_tracker().heartbeat(user_email, city)
+
+if st.session_state.user and st.session_state.profile_completed:
+    keep_presence_alive(st.session_state.user['email'], st.session_state.user.get('city'))
+
+# Enter the live pairing pool; watch_pairing checks the ticket without holding up the script
+def start_pairing(city=None):
+    st.session_state.pairing = {"ticket": start_live_match(st.session_state.user['email'], city), "city": city}
+    st.session_state.pairing_error = None
+
+@st.fragment(run_every=PAIRING_POLL_SECONDS)
+def watch_pairing():
+    pairing = st.session_state.pairing
+    if pairing is None:
+        if st.session_state.pairing_error:
+            st.error(st.session_state.pairing_error)
+        return
+
+    done, partner_email = check_live_match(pairing["ticket"])
+    where = f"in {pairing['city']}" if pairing["city"] else "across India"
+
+    if not done:
+        st.info(f"Looking for someone online {where}...")
+        if st.button("Stop looking"):
+            cancel_live_match(pairing["ticket"])
+            st.session_state.pairing = None
+            st.rerun()
+        return
+
+    # The wait is over: take the live partner, or fall back to online users and stored profiles
+    st.session_state.pairing = None
+    with st.spinner(f"Looking for someone {where}..."):
+        match = finish_match(st.session_state.user['email'], pairing["city"], partner_email)
+
+    if match:
+        st.session_state.current_match = match
+        st.session_state.chat_messages = get_chat_history(
+            st.session_state.user['email'], 
+            match['email']
+        )
+        st.session_state.page = "Chat"
+    elif pairing["city"]:
+        st.session_state.pairing_error = f"No matches available in {pairing['city']} at the moment. Try again later."
+    else:
+        st.session_state.pairing_error = "No matches available at the moment. Try again later."
+    st.rerun()
+
+# Leaving Find Connections takes the user out of the pairing pool
+if st.session_state.page != "Find Connections":
+    if st.session_state.pairing:
+        cancel_live_match(st.session_state.pairing["ticket"])
+    st.session_state.pairing = None
+    st.session_state.pairing_error = None
+
 
 # Sidebar for navigation
 with st.sidebar:
@@ -290,8 +385,11 @@ with st.sidebar:
             nav_buttons = {
                 "Profile": "Profile",
                 "Find Connections": "Find Connections",
+                "Inbox": "Inbox",
                 "Chat": "Chat"
             }
+            if st.session_state.user['email'].lower() in ADMIN_EMAILS:
+                nav_buttons["Admin"] = "Admin"
             
             for button_text, page_name in nav_buttons.items():
                 button_class = "nav-button active" if st.session_state.page == page_name else "nav-button"
@@ -299,6 +397,9 @@ with st.sidebar:
                     change_page(page_name)
         
         if st.button("Logout", use_container_width=True):
+            # Go offline straight away instead of when the presence expires
+            get_presence_tracker().remove(st.session_state.user['email'])
+            
             # Clear session state
             for key in list(st.session_state.keys()):
                 del st.session_state[key]
@@ -336,6 +437,13 @@ with st.sidebar:
         if st.button("Sign Up", key="nav_signup", use_container_width=True):
             change_page("SignUp")
 
+# Opt-in debug panel with the spans of the previous rerun, the process's warm-up and moderation lag
+if tracing_enabled():
+    render_trace_panel(st.session_state.trace_session_id)
+    render_warmup_panel()
+    if get_moderation_mode() == "async":
+        render_moderation_panel()
+
 # Main content area based on current page
 if st.session_state.page == "Welcome":
     # Welcome page
@@ -532,8 +640,9 @@ elif st.session_state.page == "Complete Profile":
                 is_tech_professional, parsed_skills = parse_resume(uploaded_file)
                 skills = parsed_skills
             elif verification_method == "Enter Skills Manually" and skills:
-                # Simple verification based on number of skills
-                is_tech_professional = len(skills) >= 3
+                # At least three of the skills must be recognized tech skills (see auth/tech_keywords.py);
+                # profiles re-verified with auth/reverify_profiles.py are held to the same rule
+                is_tech_professional, _ = score_skills(skills)
             
             if is_tech_professional:
                 # Update user data
@@ -655,49 +764,15 @@ elif st.session_state.page == "Find Connections":
         
         if match_type == "Random (All India)":
             if st.button("Find Random Match"):
-                with st.spinner("Finding a random match across India..."):
-                    match = find_random_match(st.session_state.user['email'])
-                    if match:
-                        st.session_state.current_match = match
-                        st.session_state.chat_messages = get_chat_history(
-                            st.session_state.user['email'], 
-                            match['email']
-                        )
-                        st.session_state.page = "Chat"
-                        st.rerun()
-
-                    else:
-                        st.error("No matches available at the moment. Try again later.")
+                start_pairing()
         else:
             if st.button("Find City Match"):
-                with st.spinner(f"Finding a match in {st.session_state.user['city']}..."):
-                    match = find_city_match(st.session_state.user['email'], st.session_state.user['city'])
-                    if match:
-                        st.session_state.current_match = match
-                        st.session_state.chat_messages = get_chat_history(
-                            st.session_state.user['email'], 
-                            match['email']
-                        )
-                        st.session_state.page = "Chat"
-                        st.rerun()
-
-                    else:
-                        st.error(f"No matches available in {st.session_state.user['city']} at the moment. Try again later.")
+                start_pairing(city=st.session_state.user['city'])
+        watch_pairing()
     else:
         if st.button("Find Random Match"):
-            with st.spinner("Finding a random match across India..."):
-                match = find_random_match(st.session_state.user['email'])
-                if match:
-                    st.session_state.current_match = match
-                    st.session_state.chat_messages = get_chat_history(
-                        st.session_state.user['email'], 
-                        match['email']
-                    )
-                    st.session_state.page = "Chat"
-                    st.rerun()
-
-                else:
-                    st.error("No matches available at the moment. Try again later.")
+            start_pairing()
+        watch_pairing()
         
         st.info("Upgrade to premium for city-based matching!")
         
@@ -748,20 +823,92 @@ elif st.session_state.page == "Find Connections":
                     else:
                         st.error("Failed to create subscription. Please try again.")
 
+elif st.session_state.page == "Inbox":
+    st.markdown("<h2 class='sub-header'>Inbox</h2>", unsafe_allow_html=True)
+    
+    # Full-text search over every message the user sent or received
+    search_query = st.text_input("Search your messages", key="inbox_search")
+    if search_query:
+        hits = search_messages(st.session_state.user['email'], search_query)
+        if not hits:
+            st.info("No messages found.")
+        for i, hit in enumerate(hits):
+            col1, col2 = st.columns([5, 1])
+            with col1:
+                st.markdown(f"**{hit['counterpart']}** · {hit['timestamp'][:16].replace('T', ' ')}")
+                st.text(hit['message'])
+            with col2:
+                if st.button("Open", key=f"search_open_{i}"):
+                    match = get_user_by_email(hit['counterpart'])
+                    if match:
+                        st.session_state.current_match = match
+                        st.session_state.chat_messages = get_chat_history(
+                            st.session_state.user['email'],
+                            match['email']
+                        )
+                        st.session_state.page = "Chat"
+                        st.rerun()
+                    else:
+                        st.error("This user is no longer available.")
+        st.markdown("---")
+    
+    conversations = get_inbox(st.session_state.user['email'])
+    
+    if not conversations:
+        st.info("No conversations yet. Find a connection to start chatting!")
+    
+    for entry in conversations:
+        col1, col2 = st.columns([5, 1])
+        
+        with col1:
+            unread = f" · {entry['unread']} unread" if entry['unread'] else ""
+            st.markdown(f"**{entry['counterpart']}**{unread}")
+            prefix = "You: " if entry['last_sender'] == st.session_state.user['email'] else ""
+            st.text(f"{prefix}{entry['last_message']}  ({entry['last_timestamp'][:16].replace('T', ' ')})")
+        
+        with col2:
+            if st.button("Open", key=f"inbox_open_{entry['counterpart']}"):
+                match = get_user_by_email(entry['counterpart'])
+                if match:
+                    st.session_state.current_match = match
+                    st.session_state.chat_messages = get_chat_history(
+                        st.session_state.user['email'],
+                        match['email']
+                    )
+                    st.session_state.page = "Chat"
+                    st.rerun()
+                else:
+                    st.error("This user is no longer available.")
+
 elif st.session_state.page == "Chat":
     st.markdown("<h2 class='sub-header'>Chat</h2>", unsafe_allow_html=True)
     
     if st.session_state.current_match:
         st.write(f"Chatting with: **{st.session_state.current_match['name']}** from {st.session_state.current_match['city']}")
+        if get_presence_tracker().is_online(st.session_state.current_match['email']):
+            st.caption("🟢 Online")
+        else:
+            st.caption("⚪ Offline")
+        
+        # Everything shown on this page counts as read
+        mark_conversation_read(
+            st.session_state.user['email'],
+            st.session_state.current_match['email']
+        )
+        
+        # Subscribe to new messages in this conversation
+        subscribe_to_chat(
+            st.session_state.user['email'],
+            st.session_state.current_match['email']
+        )
         
         # Display chat messages
         chat_container = st.container()
         with chat_container:
-            for msg in st.session_state.chat_messages:
-                if msg['sender'] == st.session_state.user['email']:
-                    st.markdown(f"<div class='chat-message-user'>{msg['message']}</div>", unsafe_allow_html=True)
-                else:
-                    st.markdown(f"<div class='chat-message-other'>{msg['message']}</div>", unsafe_allow_html=True)
+            render_chat_view(
+                st.session_state.user['email'],
+                st.session_state.current_match['email']
+            )
         
         # Message input
         if st.session_state.message_count >= 50 and st.session_state.user.get('subscription_status') != 'paid':
@@ -817,34 +964,47 @@ elif st.session_state.page == "Chat":
             message = st.text_input("Type your message")
             
             if st.button("Send") and message:
-                # Check for offensive content
-                is_toxic = check_message_toxicity(message)
+                # Throttle bursts before any moderation call or write is made
+                retry_after = check_send_rate(
+                    st.session_state.user['email'],
+                    st.session_state.current_match['email']
+                )
                 
-                if is_toxic:
-                    st.error("Your message contains inappropriate content. Please revise and try again.")
+                if retry_after:
+                    st.warning(f"You're sending messages too quickly. Please wait {retry_after:.1f} seconds and try again.")
                 else:
-                    # Send message
-                    send_message(
-                        st.session_state.user['email'],
-                        st.session_state.current_match['email'],
-                        message
-                    )
-                    
-                    # Update message count for free users
-                    if st.session_state.user.get('subscription_status') != 'paid':
-                        st.session_state.message_count += 1
-                        update_user(
-                            st.session_state.user['email'], 
-                            {'message_count': st.session_state.message_count}
+                    try:
+                        # Check for offensive content (in async mode the message is moderated after it is stored)
+                        is_toxic = get_moderation_mode() == "sync" and check_message_toxicity(
+                            message,
+                            st.session_state.user['email'],
+                            st.session_state.current_match['email']
                         )
+                    except ModerationBusyError as e:
+                        is_toxic = None
+                        # Nothing was sent, so the attempt does not count against the send rate
+                        refund_send_rate(st.session_state.user['email'], st.session_state.current_match['email'])
+                        st.warning(f"Message checks are busy right now. Please wait {e.retry_after:.1f} seconds and try again.")
                     
-                    # Update chat history
-                    st.session_state.chat_messages = get_chat_history(
-                        st.session_state.user['email'],
-                        st.session_state.current_match['email']
-                    )
-                    
-                    st.rerun()
+                    if is_toxic:
+                        st.error("Your message contains inappropriate content. Please revise and try again.")
+                    elif is_toxic is False:
+                        # Send message (this also appends it to the chat history)
+                        send_message(
+                            st.session_state.user['email'],
+                            st.session_state.current_match['email'],
+                            message
+                        )
+                        
+                        # Update message count for free users
+                        if st.session_state.user.get('subscription_status') != 'paid':
+                            st.session_state.message_count += 1
+                            update_user(
+                                st.session_state.user['email'], 
+                                {'message_count': st.session_state.message_count}
+                            )
+                        
+                        st.rerun()
 
             
             if st.session_state.user.get('subscription_status') != 'paid':
@@ -855,14 +1015,60 @@ elif st.session_state.page == "Chat":
             st.session_state.page = "Find Connections"
             st.rerun()
 
+elif st.session_state.page == "Admin":
+    st.markdown("<h2 class='sub-header'>Analytics</h2>", unsafe_allow_html=True)
+    
+    if not st.session_state.user or st.session_state.user['email'].lower() not in ADMIN_EMAILS:
+        st.error("This page is only available to admins.")
+    else:
+        # Only the pre-aggregated buckets are read, never the users or chats
+        start = time.perf_counter()
+        dashboard = get_dashboard()
+        
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Active users today", dashboard['series']['active_users'][-1])
+        col2.metric("Messages today", dashboard['series']['messages'][-1])
+        col3.metric(f"Signups ({len(dashboard['days'])} days)", dashboard['totals']['signups'])
+        conversion_rate = dashboard['totals']['conversion_rate']
+        col4.metric(
+            f"Free to paid ({len(dashboard['days'])} days)",
+            f"{conversion_rate:.1%}" if conversion_rate is not None else "–"
+        )
+        
+        st.markdown("**Daily active users and messages**")
+        st.line_chart({
+            "day": dashboard['days'],
+            "Active users": dashboard['series']['active_users'],
+            "Messages": dashboard['series']['messages']
+        }, x="day")
+        
+        st.markdown("**Signups and conversions**")
+        st.bar_chart({
+            "day": dashboard['days'],
+            "Signups": dashboard['series']['signups'],
+            "Conversions": dashboard['series']['conversions']
+        }, x="day")
+        
+        st.markdown("**Messages per city**")
+        if dashboard['messages_by_city']:
+            st.bar_chart({
+                "city": [city for city, _ in dashboard['messages_by_city']],
+                "Messages": [count for _, count in dashboard['messages_by_city']]
+            }, x="city")
+        else:
+            st.info("No messages in this period yet.")
+        
+        st.caption(
+            f"Read {dashboard['buckets']} buckets in {(time.perf_counter() - start) * 1000:.1f} ms. "
+            f"Counters are flushed every {ANALYTICS_FLUSH_SECONDS:g} seconds."
+        )
+
 
-# Auto-refresh chat (simplified polling)
+# Push-based chat refresh: rerun only when the open conversation has new messages
 if st.session_state.page == "Chat" and st.session_state.current_match:
-    st.empty()
-    st.session_state.chat_messages = get_chat_history(
-        st.session_state.user['email'],
-        st.session_state.current_match['email']
-    )
+    watch_for_new_messages()
+else:
+    unsubscribe_from_chat()
 
 # Add Clerk script to every page
 st.markdown(f"""
@@ -899,3 +1105,7 @@ st.markdown(f"""
     }}
 </script>
 """, unsafe_allow_html=True)
+
+# Export this rerun's tracing spans and profiles
+end_rerun()
+end_profile()
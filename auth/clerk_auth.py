@@ -1,8 +1,9 @@
 import os
-import requests
 import json
 import streamlit as st
 from database.user_operations import get_user_by_email
+from utils.tracing import span, traced, record_response
+from utils.http import get_http_session
 
 def get_user_token():
     """
@@ -18,6 +19,7 @@ def get_user_token():
     # Check for token in session state
     return st.session_state.get('clerk_token')
 
+@traced("auth.clerk.verify_session")
 def verify_session(token):
     """
     Verify a Clerk session token
@@ -40,11 +42,13 @@ def verify_session(token):
             "Content-Type": "application/json"
         }
         
-        response = requests.get(
-            "https://api.clerk.dev/v1/sessions/verify",
-            headers=headers,
-            params={"session_token": token}
-        )
+        with span("http.clerk.sessions_verify", method="GET") as http_span:
+            response = get_http_session().get(
+                "https://api.clerk.dev/v1/sessions/verify",
+                headers=headers,
+                params={"session_token": token}
+            )
+            record_response(http_span, response)
         
         return response.status_code == 200
     
@@ -52,6 +56,7 @@ def verify_session(token):
         st.error(f"Error verifying session: {str(e)}")
         return False
 
+@traced("auth.clerk.get_user_data")
 def get_user_data(token):
     """
     Get user data from Clerk using the session token
@@ -80,11 +85,13 @@ def get_user_data(token):
         }
         
         # First, get the user ID from the session
-        session_response = requests.get(
-            "https://api.clerk.dev/v1/sessions/verify",
-            headers=headers,
-            params={"session_token": token}
-        )
+        with span("http.clerk.sessions_verify", method="GET") as http_span:
+            session_response = get_http_session().get(
+                "https://api.clerk.dev/v1/sessions/verify",
+                headers=headers,
+                params={"session_token": token}
+            )
+            record_response(http_span, session_response)
         
         if session_response.status_code != 200:
             return None
@@ -96,10 +103,12 @@ def get_user_data(token):
             return None
         
         # Then, get the user data
-        user_response = requests.get(
-            f"https://api.clerk.dev/v1/users/{user_id}",
-            headers=headers
-        )
+        with span("http.clerk.users_get", method="GET") as http_span:
+            user_response = get_http_session().get(
+                f"https://api.clerk.dev/v1/users/{user_id}",
+                headers=headers
+            )
+            record_response(http_span, user_response)
         
         if user_response.status_code != 200:
             return None
@@ -1,9 +1,10 @@
 import os
-import requests
 import json
 from urllib.parse import urlencode
 import streamlit as st
 from database.user_operations import get_user_by_email
+from utils.tracing import span, traced, record_response
+from utils.http import get_http_session
 
 def initialize_linkedin_auth():
     """
@@ -25,6 +26,7 @@ def initialize_linkedin_auth():
     auth_url = f"https://www.linkedin.com/oauth/v2/authorization?{urlencode(auth_params)}"
     return auth_url
 
+@traced("auth.linkedin.process_callback")
 def process_linkedin_callback(code):
     """
     Process the LinkedIn callback code and retrieve user information
@@ -44,7 +46,9 @@ def process_linkedin_callback(code):
             "redirect_uri": redirect_uri
         }
         
-        token_response = requests.post(token_url, data=token_payload)
+        with span("http.linkedin.access_token", method="POST") as http_span:
+            token_response = get_http_session().post(token_url, data=token_payload)
+            record_response(http_span, token_response)
         token_data = token_response.json()
         
         if "access_token" not in token_data:
@@ -58,12 +62,16 @@ def process_linkedin_callback(code):
             "Authorization": f"Bearer {access_token}"
         }
         
-        profile_response = requests.get(profile_url, headers=headers)
+        with span("http.linkedin.me", method="GET") as http_span:
+            profile_response = get_http_session().get(profile_url, headers=headers)
+            record_response(http_span, profile_response)
         profile_data = profile_response.json()
         
         # Get user email
         email_url = "https://api.linkedin.com/v2/emailAddress?q=members&projection=(elements*(handle~))"
-        email_response = requests.get(email_url, headers=headers)
+        with span("http.linkedin.email_address", method="GET") as http_span:
+            email_response = get_http_session().get(email_url, headers=headers)
+            record_response(http_span, email_response)
         email_data = email_response.json()
         
         # Extract relevant information
@@ -79,7 +87,9 @@ def process_linkedin_callback(code):
         # Note: In a real implementation, you would need to use LinkedIn's Profile API
         # This is simplified for the demo
         position_url = "https://api.linkedin.com/v2/positions"
-        position_response = requests.get(position_url, headers=headers, params={"q": "members", "projection": "(elements*)"})
+        with span("http.linkedin.positions", method="GET") as http_span:
+            position_response = get_http_session().get(position_url, headers=headers, params={"q": "members", "projection": "(elements*)"})
+            record_response(http_span, position_response)
         
         # Check if the user is in the tech industry
         # This is a simplified check - in a real app, you'd use more sophisticated verification
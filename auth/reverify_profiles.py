@@ -0,0 +1,154 @@
+"""
+Re-score stored profiles after TECH_KEYWORDS or the verification thresholds change
+
+Streams every user from the users repository in batches, scores them on a
+process pool with auth/tech_keywords.py and writes the changed profiles back
+with one batched update per batch. Only tech_verified and the keywords
+version it was scored with (tech_keywords_version) are written, merged into
+each profile as it is stored then, so a plan upgrade or other edit made while
+the batch was being scored is kept. Profiles that are already up to date are
+left alone. Profiles that fail verification are no longer offered as matches
+(see utils/matching.py). The first run after a change to the matching rule
+re-scores everyone; auth/tech_keywords.py lists what version 2 changed.
+
+Progress is saved to REVERIFY_CHECKPOINT_FILE after every batch written, so
+an interrupted run continues where it stopped. The checkpoint is discarded
+when the keywords change and removed when a run completes. Run from the
+repository root:
+
+    python -m auth.reverify_profiles --dry-run
+    python -m auth.reverify_profiles --workers 4
+"""
+import os
+import json
+import time
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from auth.tech_keywords import keywords_version, rescore_profiles
+from database.storage import get_user_repository
+from utils.config import REVERIFY_CHECKPOINT_FILE, REVERIFY_BATCH_SIZE
+
+def _new_checkpoint(version):
+    return {"version": version, "offset": 0, "scanned": 0, "updated": 0, "unverified": 0}
+
+def load_checkpoint(path, version):
+    """
+    Load the progress of an earlier run with the same keywords version
+    Returns the checkpoint dictionary, starting from the beginning if there is none
+    """
+    if not os.path.exists(path):
+        return _new_checkpoint(version)
+
+    with open(path, encoding="utf-8") as checkpoint_file:
+        checkpoint = json.load(checkpoint_file)
+
+    # Progress made with other keywords does not count
+    if checkpoint.get("version") != version:
+        return _new_checkpoint(version)
+
+    return checkpoint
+
+def save_checkpoint(path, checkpoint):
+    """
+    Write the checkpoint atomically, so an interrupted write never leaves a corrupt file
+    """
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.replace(temp_path, path)
+
+def _rows_per_second(rows, start):
+    # Covers this run only, not rows scanned before a resume
+    elapsed = time.perf_counter() - start
+    return round(rows / elapsed, 1) if elapsed else None
+
+def reverify_profiles(workers=None, batch_size=REVERIFY_BATCH_SIZE, checkpoint_path=REVERIFY_CHECKPOINT_FILE,
+                      dry_run=False, restart=False, progress=None):
+    """
+    Re-score every stored profile and write back the ones that changed
+    `progress` is called with the checkpoint and the rows per second after every batch
+    Returns a dictionary with the rows scanned and updated and the rows per second
+    """
+    version = keywords_version()
+    if restart or dry_run:
+        checkpoint = _new_checkpoint(version)
+    else:
+        checkpoint = load_checkpoint(checkpoint_path, version)
+
+    repository = get_user_repository()
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    scanned_at_start = checkpoint["scanned"]
+
+    # Workers only need the scoring module, so they start without the storage stack
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        in_flight = deque()
+        offset = checkpoint["offset"]
+        exhausted = False
+
+        while in_flight or not exhausted:
+            # Keep every worker busy with one batch queued behind it
+            while not exhausted and len(in_flight) < workers * 2:
+                records = repository.list_user_page(offset, batch_size)
+                if not records:
+                    exhausted = True
+                    break
+                offset += len(records)
+                in_flight.append((offset, len(records), pool.submit(rescore_profiles, records, version)))
+
+            if not in_flight:
+                break
+
+            # Results are written in read order, so the checkpoint offset only moves forward
+            batch_end, batch_rows, future = in_flight.popleft()
+            updates = future.result()
+            if updates and not dry_run:
+                repository.update_users(updates)
+
+            checkpoint["offset"] = batch_end
+            checkpoint["scanned"] += batch_rows
+            checkpoint["updated"] += len(updates)
+            checkpoint["unverified"] += sum(1 for _, fields in updates if not fields["tech_verified"])
+            if not dry_run:
+                save_checkpoint(checkpoint_path, checkpoint)
+            if progress:
+                progress(checkpoint, _rows_per_second(checkpoint["scanned"] - scanned_at_start, start))
+
+    if not dry_run and os.path.exists(checkpoint_path):
+        os.unlink(checkpoint_path)
+
+    return {
+        "version": version,
+        "scanned": checkpoint["scanned"],
+        "updated": checkpoint["updated"],
+        "unverified": checkpoint["unverified"],
+        "rows_per_second": _rows_per_second(checkpoint["scanned"] - scanned_at_start, start),
+        "dry_run": dry_run
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score stored profiles with the current tech keywords")
+    parser.add_argument("--workers", type=int, help="scoring processes (default: one per CPU)")
+    parser.add_argument("--batch-size", type=int, default=REVERIFY_BATCH_SIZE)
+    parser.add_argument("--checkpoint", default=REVERIFY_CHECKPOINT_FILE, help="progress file used to resume")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    parser.add_argument("--restart", action="store_true", help="ignore any saved progress")
+    args = parser.parse_args()
+
+    def report(checkpoint, rows_per_second):
+        print(f"scanned {checkpoint['scanned']}  updated {checkpoint['updated']}  {rows_per_second} rows/s", flush=True)
+
+    print(json.dumps(reverify_profiles(
+        workers=args.workers,
+        batch_size=args.batch_size,
+        checkpoint_path=args.checkpoint,
+        dry_run=args.dry_run,
+        restart=args.restart,
+        progress=report
+    )))
+
+if __name__ == "__main__":
+    main()
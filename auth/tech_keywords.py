@@ -0,0 +1,131 @@
+"""
+Tech keywords and the scoring that decides whether a profile is a tech professional
+
+Shared by resume parsing and manual skills at sign-up and by
+auth/reverify_profiles.py, which re-scores stored profiles after the keywords
+or thresholds change. Keywords only match whole words, so "ui" is not found
+in "guitar" nor "git" in "digital marketing".
+
+Matching rule version 2 changed who is verified:
+  - keywords match whole words instead of substrings, in resume text and in
+    listed skills
+  - skills entered at sign-up must include TECH_SKILLS_THRESHOLD recognized
+    tech skills; any three entries used to pass
+  - golang, rust, scala, terraform and ansible were added, and "go", "c" and
+    "r" count as listed skills
+Existing users are affected too: the next re-verification run re-scores every
+stored profile, and one that no longer lists three recognized skills (say
+"Guitar" and "Community outreach", which used to match "ui" and "unity") is
+marked unverified and stops being offered as a match. Run
+python -m auth.reverify_profiles --dry-run first to see how many change.
+"""
+import re
+import hashlib
+
+# List of tech-related keywords to look for in resumes
+TECH_KEYWORDS = [
+    "python", "java", "javascript", "typescript", "c++", "c#", "ruby", "php", "swift", "kotlin",
+    "react", "angular", "vue", "node.js", "express", "django", "flask", "spring", "laravel",
+    "aws", "azure", "gcp", "cloud", "devops", "docker", "kubernetes", "jenkins", "ci/cd",
+    "sql", "mysql", "postgresql", "mongodb", "nosql", "database", "redis", "elasticsearch",
+    "machine learning", "artificial intelligence", "data science", "big data", "analytics",
+    "software engineer", "developer", "programmer", "sde", "web developer", "full stack",
+    "frontend", "backend", "mobile developer", "ios developer", "android developer",
+    "qa", "quality assurance", "testing", "test automation", "selenium", "cypress",
+    "product manager", "project manager", "scrum master", "agile", "jira", "confluence",
+    "git", "github", "gitlab", "bitbucket", "version control", "svn", "cybersecurity",
+    "network", "system administrator", "linux", "unix", "windows server", "powershell",
+    "bash", "shell scripting", "api", "rest", "graphql", "microservices", "soa",
+    "html", "css", "sass", "less", "bootstrap", "tailwind", "material ui", "responsive design",
+    "ux", "ui", "user experience", "user interface", "figma", "sketch", "adobe xd",
+    "data engineer", "etl", "hadoop", "spark", "kafka", "airflow", "tableau", "power bi",
+    "blockchain", "cryptocurrency", "smart contracts", "solidity", "web3", "ethereum",
+    "iot", "embedded systems", "firmware", "hardware", "raspberry pi", "arduino",
+    "game development", "unity", "unreal engine", "3d modeling", "animation",
+    "technical lead", "team lead", "engineering manager", "cto", "chief technology officer",
+    "it support", "helpdesk", "technical support", "systems analyst", "business analyst",
+    "golang", "rust", "scala", "terraform", "ansible"
+]
+
+# Language names that are also ordinary words; they count as a listed skill but not in resume text
+SKILL_ONLY_KEYWORDS = ["go", "c", "r"]
+
+# Keywords a resume must mention to pass verification
+TECH_KEYWORD_THRESHOLD = 5
+
+# Recognized skills a profile without resume text must list to pass verification
+TECH_SKILLS_THRESHOLD = 3
+
+# Skills kept from a resume for display
+MAX_RESUME_SKILLS = 10
+
+# Bumped whenever the way keywords are matched changes, so stored profiles are re-scored
+MATCHING_RULE_VERSION = 2
+
+def _keyword_pattern(keyword):
+    # Letters and digits may not touch the keyword, so it matches as a whole word
+    return re.compile(r"(?<![a-z0-9])" + re.escape(keyword) + r"(?![a-z0-9])")
+
+_KEYWORD_PATTERNS = [(keyword, _keyword_pattern(keyword)) for keyword in TECH_KEYWORDS]
+
+def keywords_version():
+    """
+    Fingerprint the keywords and thresholds
+    Returns a short hex string that changes whenever the scoring would
+    """
+    fingerprint = "\n".join(TECH_KEYWORDS + SKILL_ONLY_KEYWORDS) + (
+        f"\n{TECH_KEYWORD_THRESHOLD}\n{TECH_SKILLS_THRESHOLD}\n{MAX_RESUME_SKILLS}\n{MATCHING_RULE_VERSION}"
+    )
+    return hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:12]
+
+def score_resume_text(text):
+    """
+    Check resume text for tech keywords
+    Returns a tuple of (is_tech_professional, skills_found)
+    """
+    text = text.lower()
+    skills_found = [keyword.title() for keyword, pattern in _KEYWORD_PATTERNS if pattern.search(text)]
+
+    return len(skills_found) >= TECH_KEYWORD_THRESHOLD, skills_found[:MAX_RESUME_SKILLS]
+
+def score_skills(skills):
+    """
+    Check a list of skills for ones that mention a tech keyword
+    This is the rule for skills entered at sign-up as well as for re-verification
+    Returns a tuple of (is_tech_professional, recognized_skills)
+    """
+    recognized = [
+        skill for skill in skills
+        if skill.strip().lower() in SKILL_ONLY_KEYWORDS
+        or any(pattern.search(skill.lower()) for _, pattern in _KEYWORD_PATTERNS)
+    ]
+
+    return len(recognized) >= TECH_SKILLS_THRESHOLD, recognized
+
+def rescore_profile(user_data, version=None):
+    """
+    Re-score a stored profile's skills with the current keywords
+    Resumes are not stored, so a profile verified by resume is scored on the keywords parsed
+    from it; the skills themselves are what the user entered or the resume showed and are kept
+    Returns the tech_verified and tech_keywords_version fields to store, or None if the
+    profile was already scored with this version
+    """
+    version = version or keywords_version()
+    if user_data.get("tech_keywords_version") == version:
+        return None
+
+    tech_verified, _ = score_skills(user_data.get("skills", []))
+
+    return {"tech_verified": tech_verified, "tech_keywords_version": version}
+
+def rescore_profiles(records, version):
+    """
+    Re-score a batch of (user_id, user_data) records; runs in a worker process
+    Returns a list of (user_id, fields) for the profiles that changed
+    """
+    results = []
+    for user_id, user_data in records:
+        fields = rescore_profile(user_data, version)
+        if fields is not None:
+            results.append((user_id, fields))
+    return results
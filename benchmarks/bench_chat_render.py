@@ -0,0 +1,107 @@
+"""
+Benchmark chat transcript rendering against transcript length
+
+Compares the legacy renderer (one st.markdown call per message) with the
+windowed chat view of chat/chat_view.py (one pre-escaped HTML block for the
+last CHAT_WINDOW_SIZE messages). Each renderer runs as a page under AppTest,
+so a timed rerun includes the script run, widget handling and the protobuf
+deltas a server would send; the delta count and markdown bytes are read from
+the rendered page. Run from the repository root:
+
+    python -m benchmarks.bench_chat_render --lengths 10,100,1000,5000
+"""
+import logging
+import argparse
+import datetime
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.element_tree import Block
+from benchmarks.harness import time_call, write_results
+
+USER_EMAIL = "alice@example.com"
+MATCH_EMAIL = "bob@example.com"
+
+def _make_transcript(length):
+    """
+    Build a synthetic transcript alternating between two users
+    """
+    start = datetime.datetime(2025, 1, 1)
+    users = [USER_EMAIL, MATCH_EMAIL]
+    return [
+        {
+            "sender": users[i % 2],
+            "receiver": users[(i + 1) % 2],
+            "message": f"Message {i} <b>with</b> some markup & text",
+            "timestamp": (start + datetime.timedelta(seconds=i)).isoformat()
+        }
+        for i in range(length)
+    ]
+
+def _legacy_page(user_email):
+    # Runs as an AppTest script: the Chat page before the windowed view, one delta per message
+    import streamlit as st
+
+    for msg in st.session_state.chat_messages:
+        if msg['sender'] == user_email:
+            st.markdown(f"<div class='chat-message-user'>{msg['message']}</div>", unsafe_allow_html=True)
+        else:
+            st.markdown(f"<div class='chat-message-other'>{msg['message']}</div>", unsafe_allow_html=True)
+
+def _windowed_page(user_email, match_email):
+    # Runs as an AppTest script: the Chat page's transcript as the app renders it
+    from chat.chat_view import render_chat_view
+
+    render_chat_view(user_email, match_email)
+
+RENDERERS = {
+    "legacy": (_legacy_page, {"user_email": USER_EMAIL}),
+    "windowed": (_windowed_page, {"user_email": USER_EMAIL, "match_email": MATCH_EMAIL})
+}
+
+def run(renderer, messages, repeat, timeout):
+    """
+    Time reruns of one renderer's page showing `messages`
+    Returns the timing statistics with the deltas and markdown bytes of the rendered page
+    """
+    page, kwargs = RENDERERS[renderer]
+    app = AppTest.from_function(page, kwargs=kwargs, default_timeout=timeout)
+    app.session_state.chat_messages = messages
+
+    # The first run compiles the script and sets up the view's session state
+    app.run()
+    if app.exception:
+        raise RuntimeError(f"{renderer} page failed: {app.exception[0].message}")
+
+    timing = time_call(app.run, repeat=repeat)
+    return dict(
+        timing,
+        deltas=sum(1 for node in app.main if not isinstance(node, Block)),
+        html_bytes=sum(len(markdown.value) for markdown in app.markdown)
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chat transcript rendering")
+    parser.add_argument("--lengths", default="10,100,1000,5000", help="comma-separated transcript lengths")
+    parser.add_argument("--repeat", type=int, default=5, help="timed reruns per renderer and length")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-rerun timeout in seconds")
+    args = parser.parse_args()
+
+    # AppTest's script thread logs a missing-context warning from the main thread on every run
+    logging.disable(logging.WARNING)
+
+    results = []
+    for length in [int(length) for length in args.lengths.split(",")]:
+        messages = _make_transcript(length)
+        result = {"transcript_length": length}
+        for renderer in RENDERERS:
+            result[renderer] = run(renderer, messages, args.repeat, args.timeout)
+        results.append(result)
+
+        legacy, windowed = result["legacy"], result["windowed"]
+        print(f"{length:>6} messages: legacy {legacy['median_ms']:>9.3f} ms ({legacy['deltas']} deltas), "
+              f"windowed {windowed['median_ms']:>9.3f} ms ({windowed['deltas']} deltas)")
+
+    path = write_results("chat_render", results)
+    print(f"Results written to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark chat storage backends: insert throughput and read latency
+
+Inserts synthetic messages through each ChatRepository backend with several
+concurrent writers, then times directional history reads and sent-message
+counts for random users. Run from the repository root:
+
+    python -m benchmarks.bench_chat_store --messages 1000000 --backends log
+    python -m benchmarks.bench_chat_store --messages 20000 --backends log,chroma
+
+Chroma computes an embedding for every inserted document, so large runs
+against it take a long time; size --messages accordingly.
+"""
+import os
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import datetime
+import threading
+from database.chat_repository import ChromaChatRepository
+from database.chat_log import LogChatRepository
+from benchmarks.harness import time_call, write_results
+
+def _create_repository(backend, directory, sync_mode):
+    if backend == "log":
+        return LogChatRepository(os.path.join(directory, "chat_log"), sync_mode=sync_mode)
+    if backend == "chroma":
+        os.environ["CHROMA_PERSIST_DIRECTORY"] = os.path.join(directory, "chroma_db")
+        return ChromaChatRepository()
+    raise ValueError(f"Unknown backend: {backend}")
+
+def _insert(repository, message_count, user_count, writers, seed):
+    """
+    Insert messages between random pairs of users from several writer threads
+    Returns the elapsed time in seconds
+    """
+    start_time = datetime.datetime(2025, 1, 1)
+    per_writer = message_count // writers
+
+    def writer(writer_id):
+        rng = random.Random(seed + writer_id)
+        for i in range(per_writer):
+            sender, receiver = rng.sample(range(user_count), 2)
+            repository.add_message(f"{writer_id}-{i}", {
+                "sender": f"user{sender}@example.com",
+                "receiver": f"user{receiver}@example.com",
+                "message": f"Benchmark message {i} from writer {writer_id}",
+                "timestamp": (start_time + datetime.timedelta(milliseconds=i * writers + writer_id)).isoformat()
+            })
+
+    threads = [threading.Thread(target=writer, args=(writer_id,)) for writer_id in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return time.perf_counter() - started
+
+def run_backend(backend, args):
+    directory = tempfile.mkdtemp(prefix=f"bench_chat_{backend}_")
+    try:
+        repository = _create_repository(backend, directory, args.sync_mode)
+        elapsed = _insert(repository, args.messages, args.users, args.writers, args.seed)
+        inserted = (args.messages // args.writers) * args.writers
+
+        rng = random.Random(args.seed)
+        pairs = [tuple(rng.sample(range(args.users), 2)) for _ in range(args.reads)]
+        pair_iter = iter(pairs * 10)
+
+        def read_history():
+            sender, receiver = next(pair_iter)
+            repository.get_messages(f"user{sender}@example.com", f"user{receiver}@example.com", limit=100)
+
+        def count_sent():
+            repository.count_messages_sent(f"user{rng.randrange(args.users)}@example.com")
+
+        result = {
+            "backend": backend,
+            "messages": inserted,
+            "writers": args.writers,
+            "sync_mode": args.sync_mode if backend == "log" else None,
+            "insert_seconds": round(elapsed, 3),
+            "inserts_per_second": round(inserted / elapsed, 1),
+            "get_messages": time_call(read_history, repeat=5, number=max(1, args.reads // 5)),
+            "count_messages_sent": time_call(count_sent, repeat=5, number=max(1, args.reads // 5))
+        }
+        repository.close()
+        return result
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chat storage backends")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--reads", type=int, default=1_000)
+    parser.add_argument("--backends", default="log,chroma")
+    parser.add_argument("--sync-mode", default="group", choices=["group", "async"])
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    results = []
+    for backend in args.backends.split(","):
+        result = run_backend(backend, args)
+        results.append(result)
+        print(f"{backend:>6}: {result['inserts_per_second']:.0f} inserts/s, "
+              f"get_messages median {result['get_messages']['median_ms']:.3f} ms, "
+              f"count median {result['count_messages_sent']['median_ms']:.3f} ms")
+
+    path = write_results("chat_store", results)
+    print(f"Results written to {path}")
+
+if __name__ == "__main__":
+    main()
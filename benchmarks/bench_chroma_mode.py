@@ -0,0 +1,169 @@
+"""
+Benchmark single-process Chroma against several replicas sharing a Chroma server
+
+Every replica is a separate process running the send path of the data layer
+(a chat write, both inbox updates and a history read) from several threads.
+The baseline is one process opening the database with CHROMA_MODE=persistent,
+the only safe way to use a local database. It is compared with 1..N replicas
+in CHROMA_MODE=http, all talking to one server started by
+database.chroma_server. Run from the repository root:
+
+    python -m benchmarks.bench_chroma_mode --replicas 1,2,4 --threads 4 --messages 200
+
+Messages are embedded in the replicas, so the throughput includes the
+embedding model; --messages is per replica.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import datetime
+import threading
+import subprocess
+from benchmarks.harness import summarize_samples, write_results
+
+def run_worker(threads, messages, users, seed):
+    """
+    Send `messages` messages between random users from `threads` threads of this process
+    Returns a dictionary with the wall-clock start and end and the per-send latencies
+    """
+    # Imported here so CHROMA_MODE from the environment is in effect
+    from database.chat_repository import ChromaChatRepository
+    from database.inbox_repository import ChromaInboxRepository
+
+    chats = ChromaChatRepository()
+    inbox = ChromaInboxRepository()
+    chats.get_messages("warmup@example.com", "warmup@example.com", limit=1)
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    started_at = datetime.datetime(2025, 1, 1)
+
+    def sender(thread_id):
+        rng = random.Random(seed * 1000 + thread_id)
+        samples = []
+        failures = []
+        for i in range(messages // threads):
+            sender_id, receiver_id = rng.sample(range(users), 2)
+            message_data = {
+                "sender": f"user{sender_id}@example.com",
+                "receiver": f"user{receiver_id}@example.com",
+                "message": f"Benchmark message {i} from {seed}-{thread_id}",
+                "timestamp": (started_at + datetime.timedelta(milliseconds=i)).isoformat()
+            }
+
+            start = time.perf_counter()
+            try:
+                chats.add_message(f"{seed}-{thread_id}-{i}", message_data)
+                inbox.record_message(message_data)
+                chats.get_messages(message_data["sender"], message_data["receiver"], limit=50)
+            except Exception as e:
+                failures.append(repr(e))
+                continue
+            samples.append((time.perf_counter() - start) * 1000)
+
+        with lock:
+            latencies.extend(samples)
+            errors.extend(failures)
+
+    workers = [threading.Thread(target=sender, args=(thread_id,)) for thread_id in range(threads)]
+    start = time.time()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    return {"start": start, "end": time.time(), "latencies_ms": latencies, "errors": errors}
+
+def run_replicas(replica_count, mode, env, args):
+    """
+    Run `replica_count` worker processes with CHROMA_MODE=`mode` and aggregate their results
+    Returns a dictionary with sends per second and the latency summary
+    """
+    env = dict(os.environ, CHROMA_MODE=mode, **env)
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.bench_chroma_mode", "--worker",
+             "--threads", str(args.threads), "--messages", str(args.messages),
+             "--users", str(args.users), "--seed", str(args.seed + replica)],
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True
+        )
+        for replica in range(replica_count)
+    ]
+
+    results = []
+    for process in processes:
+        output, _ = process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f"{mode} replica exited with status {process.returncode}")
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    latencies = [sample for result in results for sample in result["latencies_ms"]]
+    errors = [error for result in results for error in result["errors"]]
+    if not latencies:
+        raise RuntimeError(f"every {mode} send failed, e.g. {errors[0]}")
+    elapsed = max(result["end"] for result in results) - min(result["start"] for result in results)
+
+    return {
+        "mode": mode,
+        "replicas": replica_count,
+        "sends_per_second": round(len(latencies) / elapsed, 1),
+        "errors": len(errors),
+        "send": summarize_samples(latencies)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark persistent Chroma against replicas sharing a Chroma server")
+    parser.add_argument("--replicas", default="1,2,4", help="comma-separated replica counts for http mode")
+    parser.add_argument("--threads", type=int, default=4, help="sending threads per replica")
+    parser.add_argument("--messages", type=int, default=200, help="messages sent per replica")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--port", type=int, default=8765, help="port of the benchmark Chroma server")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.threads, args.messages, args.users, args.seed)))
+        return
+
+    # Imported here so worker processes do not load the server helpers
+    from database.chroma_server import start_chroma_server, stop_chroma_server
+
+    results = []
+    directory = tempfile.mkdtemp(prefix="bench_chroma_mode_")
+    try:
+        result = run_replicas(1, "persistent", {"CHROMA_PERSIST_DIRECTORY": os.path.join(directory, "local")}, args)
+        results.append(result)
+        print(f"persistent x1: {result['sends_per_second']:>7.1f} sends/s  "
+              f"p50 {result['send']['p50_ms']:>7.1f} ms  p95 {result['send']['p95_ms']:>7.1f} ms  errors {result['errors']}")
+
+        server = start_chroma_server(os.path.join(directory, "server"), port=args.port)
+        try:
+            for replica_count in [int(count) for count in args.replicas.split(",")]:
+                result = run_replicas(replica_count, "http", {"CHROMA_HOST": "localhost", "CHROMA_PORT": str(args.port)}, args)
+                results.append(result)
+                print(f"http x{replica_count:<8} {result['sends_per_second']:>7.1f} sends/s  "
+                      f"p50 {result['send']['p50_ms']:>7.1f} ms  p95 {result['send']['p95_ms']:>7.1f} ms  errors {result['errors']}")
+        finally:
+            stop_chroma_server(server)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    path = write_results("chroma_mode", {
+        "threads": args.threads,
+        "messages_per_replica": args.messages,
+        "results": results
+    })
+    print(f"Results written to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark every data-layer operation at several dataset scales
+
+For each scale a fresh store is seeded with synthetic users, conversations and
+toxic reports, then each public operation in database/user_operations.py,
+database/chat_operations.py and utils/matching.py is timed call by call.
+Results are written as JSON (see benchmarks/harness.py) so that runs from two
+releases can be diffed with benchmarks/compare.py. Run from the repository root:
+
+    python -m benchmarks.bench_data_layer --backend memory --scales 1000,10000,100000
+    python -m benchmarks.bench_data_layer --backend chroma --scales 100,1000
+"""
+import os
+import uuid
+import random
+import shutil
+import argparse
+import tempfile
+from database.storage import use_storage_backend, get_user_repository, get_chat_repository, get_report_repository
+from database.user_operations import create_user, get_user_by_email, update_user, get_all_users, get_users_by_city
+from database.chat_operations import send_message, get_chat_history, count_user_messages
+from utils.matching import find_random_match, find_city_match
+from benchmarks.synthetic import (
+    generate_users,
+    generate_conversations,
+    generate_messages,
+    generate_toxic_reports,
+    generate_message_text
+)
+from benchmarks.harness import time_each, write_results
+
+def seed_store(user_count, seed):
+    """
+    Bulk-load a synthetic dataset straight into the repositories (untimed)
+    Returns a tuple of (users, conversations)
+    """
+    users = generate_users(user_count, seed=seed)
+    conversations = generate_conversations(users, max(1, user_count // 2), seed=seed)
+
+    user_repository = get_user_repository()
+    for user_data in users:
+        user_repository.add_user(str(uuid.uuid4()), user_data)
+
+    chat_repository = get_chat_repository()
+    for sender, receiver, message, timestamp in generate_messages(conversations, seed=seed):
+        chat_repository.add_message(str(uuid.uuid4()), {
+            "sender": sender,
+            "receiver": receiver,
+            "message": message,
+            "timestamp": timestamp
+        })
+
+    report_repository = get_report_repository()
+    for report_data in generate_toxic_reports(users, max(1, user_count // 20), seed=seed):
+        report_repository.add_report(str(uuid.uuid4()), report_data)
+
+    return users, conversations
+
+def run_scale(user_count, args):
+    """
+    Seed a fresh store with `user_count` users and time every operation against it
+    Returns a dictionary of operation name to timing summary
+    """
+    use_storage_backend(args.backend, chat_backend=args.chat_backend)
+    users, conversations = seed_store(user_count, args.seed)
+
+    rng = random.Random(args.seed)
+    ops = args.ops
+    list_ops = max(1, min(ops, args.list_ops))
+
+    def random_user():
+        return rng.choice(users)
+
+    def random_conversation():
+        return rng.choice(conversations)
+
+    new_users = [
+        dict(user_data, email=f"new{i}-{user_data['email']}")
+        for i, user_data in enumerate(generate_users(ops, seed=args.seed + 1))
+    ]
+
+    results = {
+        "dataset": {
+            "users": len(users),
+            "conversations": len(conversations),
+            "messages": sum(count for _, _, count in conversations)
+        }
+    }
+
+    results["create_user"] = time_each(create_user, [(user_data,) for user_data in new_users])
+    results["get_user_by_email"] = time_each(get_user_by_email, [(random_user()["email"],) for _ in range(ops)])
+    results["update_user"] = time_each(
+        update_user,
+        [(random_user()["email"], {"message_count": rng.randint(0, 50)}) for _ in range(ops)]
+    )
+    results["get_all_users"] = time_each(get_all_users, [(random_user()["email"],) for _ in range(list_ops)])
+    results["get_users_by_city"] = time_each(
+        get_users_by_city,
+        [(user_data["city"], user_data["email"]) for user_data in (random_user() for _ in range(list_ops))]
+    )
+    results["send_message"] = time_each(
+        send_message,
+        [(*random_conversation()[:2], generate_message_text(rng)) for _ in range(ops)]
+    )
+    results["get_chat_history"] = time_each(get_chat_history, [random_conversation()[:2] for _ in range(ops)])
+    results["count_user_messages"] = time_each(count_user_messages, [(random_user()["email"],) for _ in range(ops)])
+    results["find_random_match"] = time_each(find_random_match, [(random_user()["email"],) for _ in range(list_ops)])
+    results["find_city_match"] = time_each(
+        find_city_match,
+        [(user_data["email"], user_data["city"]) for user_data in (random_user() for _ in range(list_ops))]
+    )
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark data-layer operations at several scales")
+    parser.add_argument("--backend", default="memory", choices=["memory", "chroma"])
+    parser.add_argument("--chat-backend", default=None, choices=["memory", "chroma"])
+    parser.add_argument("--scales", default="100,1000,10000", help="comma-separated user counts")
+    parser.add_argument("--ops", type=int, default=200, help="timed calls per point operation")
+    parser.add_argument("--list-ops", type=int, default=20, help="timed calls per full-listing operation")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--name", default=None, help="results file name (default data_layer_<backend>)")
+    args = parser.parse_args()
+
+    results = []
+    for user_count in [int(scale) for scale in args.scales.split(",")]:
+        # Chroma is pointed at a fresh directory for every scale
+        directory = tempfile.mkdtemp(prefix="bench_data_layer_")
+        os.environ["CHROMA_PERSIST_DIRECTORY"] = os.path.join(directory, "chroma_db")
+        try:
+            scale_results = run_scale(user_count, args)
+        finally:
+            use_storage_backend(args.backend, chat_backend=args.chat_backend)
+            shutil.rmtree(directory, ignore_errors=True)
+
+        results.append({"scale": user_count, "operations": scale_results})
+        print(f"scale {user_count}:")
+        for operation, summary in scale_results.items():
+            if operation != "dataset":
+                print(f"  {operation:<22} p50 {summary['p50_ms']:>9.3f} ms  p95 {summary['p95_ms']:>9.3f} ms")
+
+    path = write_results(args.name or f"data_layer_{args.backend}", {
+        "backend": args.backend,
+        "chat_backend": args.chat_backend or args.backend,
+        "seed": args.seed,
+        "scales": results
+    })
+    print(f"Results written to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Benchmark stored document size and decode time: legacy JSON vs compact encoding
+
+Encodes a synthetic set of users and chat messages both ways. It reports
+bytes per document and the time to decode every document. With --chroma it
+also loads both encodings into fresh ChromaDB directories, then compares the
+size of chroma.sqlite3 and the latency of the history and user-listing reads.
+Run from the repository root:
+
+    python -m benchmarks.bench_documents --users 10000 --conversations 2000
+    python -m benchmarks.bench_documents --users 2000 --conversations 500 --chroma
+"""
+import os
+import json
+import uuid
+import random
+import shutil
+import argparse
+import tempfile
+from database.chroma_connection import get_collection, get_chat_shard
+from database.user_repository import _user_metadata, ChromaUserRepository
+from database.chat_repository import ChromaChatRepository, get_conversation_id
+from database.document_codec import encode_message, decode_message, encode_user, decode_user
+from benchmarks.synthetic import generate_users, generate_conversations, generate_messages
+from benchmarks.harness import time_call, time_each, write_results
+
+ENCODERS = {
+    "json": (json.dumps, json.dumps),
+    "compact": (encode_user, encode_message)
+}
+
+# Rows per Chroma add() call while loading
+CHROMA_BATCH_SIZE = 1000
+
+def _size_stats(documents):
+    sizes = [len(document.encode("utf-8")) for document in documents]
+    return {
+        "documents": len(sizes),
+        "total_bytes": sum(sizes),
+        "mean_bytes": round(sum(sizes) / len(sizes), 1)
+    }
+
+def bench_codec(users, messages):
+    """
+    Compare document sizes and decode time per encoding
+    Returns a dictionary of encoding name to results
+    """
+    results = {}
+
+    for encoding, (user_encoder, message_encoder) in ENCODERS.items():
+        user_documents = [user_encoder(user_data) for user_data in users]
+        message_documents = [message_encoder(message_data) for message_data in messages]
+        pairs = [(document, message_data["sender"], message_data["receiver"])
+                 for document, message_data in zip(message_documents, messages)]
+
+        user_timing = time_call(lambda: [decode_user(document) for document in user_documents], repeat=5)
+        message_timing = time_call(lambda: [decode_message(*pair) for pair in pairs], repeat=5)
+
+        results[encoding] = {
+            "users": dict(_size_stats(user_documents),
+                          decode_us_per_document=round(user_timing["median_ms"] * 1000 / len(users), 3)),
+            "messages": dict(_size_stats(message_documents),
+                             decode_us_per_document=round(message_timing["median_ms"] * 1000 / len(messages), 3))
+        }
+
+    return results
+
+def _load_chroma(encoding, users, messages):
+    """
+    Bulk-load users and messages into the Chroma directory currently configured
+    """
+    user_encoder, message_encoder = ENCODERS[encoding]
+    collection = get_collection("users")
+    for start in range(0, len(users), CHROMA_BATCH_SIZE):
+        batch = users[start:start + CHROMA_BATCH_SIZE]
+        collection.add(
+            ids=[str(uuid.uuid4()) for _ in batch],
+            documents=[user_encoder(user_data) for user_data in batch],
+            metadatas=[_user_metadata(user_data) for user_data in batch]
+        )
+
+    # Messages go to the shard of their conversation, as the chat repository would put them
+    shards = {}
+    for message_data in messages:
+        collection = get_chat_shard(get_conversation_id(message_data["sender"], message_data["receiver"]))
+        shards.setdefault(collection.name, (collection, []))[1].append(message_data)
+
+    for collection, shard_messages in shards.values():
+        for start in range(0, len(shard_messages), CHROMA_BATCH_SIZE):
+            batch = shard_messages[start:start + CHROMA_BATCH_SIZE]
+            collection.add(
+                ids=[str(uuid.uuid4()) for _ in batch],
+                documents=[message_encoder(message_data) for message_data in batch],
+                metadatas=[{
+                    "sender": message_data["sender"],
+                    "receiver": message_data["receiver"],
+                    "timestamp": message_data["timestamp"]
+                } for message_data in batch]
+            )
+
+def bench_chroma(users, messages, conversations, args):
+    """
+    Compare chroma.sqlite3 size and read latency per encoding
+    Returns a dictionary of encoding name to results
+    """
+    rng = random.Random(args.seed)
+    reads = [rng.choice(conversations)[:2] for _ in range(args.reads)]
+    results = {}
+
+    for encoding in ENCODERS:
+        directory = tempfile.mkdtemp(prefix="bench_documents_")
+        os.environ["CHROMA_PERSIST_DIRECTORY"] = directory
+        try:
+            _load_chroma(encoding, users, messages)
+
+            chat_repository = ChromaChatRepository()
+            user_repository = ChromaUserRepository()
+            results[encoding] = {
+                "sqlite_bytes": os.path.getsize(os.path.join(directory, "chroma.sqlite3")),
+                "get_messages": time_each(chat_repository.get_messages, reads),
+                "list_users": time_call(user_repository.list_users, repeat=5)
+            }
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON vs compact document encoding")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--chroma", action="store_true", help="also compare on-disk size and reads in ChromaDB")
+    parser.add_argument("--reads", type=int, default=200, help="timed history reads per encoding with --chroma")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    users = generate_users(args.users, seed=args.seed)
+    conversations = generate_conversations(users, args.conversations, seed=args.seed)
+    messages = [
+        {"sender": sender, "receiver": receiver, "message": message, "timestamp": timestamp}
+        for sender, receiver, message, timestamp in generate_messages(conversations, seed=args.seed)
+    ]
+
+    results = {"dataset": {"users": len(users), "messages": len(messages)}, "codec": bench_codec(users, messages)}
+    for encoding, codec_results in results["codec"].items():
+        for kind in ("users", "messages"):
+            print(f"{encoding:<8} {kind:<9} {codec_results[kind]['mean_bytes']:>8.1f} B/doc  "
+                  f"decode {codec_results[kind]['decode_us_per_document']:>7.3f} us/doc")
+
+    if args.chroma:
+        results["chroma"] = bench_chroma(users, messages, conversations, args)
+        for encoding, chroma_results in results["chroma"].items():
+            print(f"{encoding:<8} chroma.sqlite3 {chroma_results['sqlite_bytes']:>12} B  "
+                  f"get_messages p50 {chroma_results['get_messages']['p50_ms']:.3f} ms  "
+                  f"list_users median {chroma_results['list_users']['median_ms']:.3f} ms")
+
+    path = write_results("documents", results)
+    print(f"Results written to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark streaming user exports at several history sizes
+
+For each size one user is seeded with that many messages spread over
+--conversations conversations (both directions) plus some toxic reports,
+then exported as zip and as JSONL. Each export is timed for throughput
+(messages and output megabytes per second) and run again under tracemalloc
+for the peak memory it allocates. An export holds at most a page of each
+direction of one conversation, so the peak grows until the directions are
+longer than --page-size and then stays flat. Run from the repository root:
+
+    python -m benchmarks.bench_export --messages 1000,10000,100000
+    CHROMA_PERSIST_DIRECTORY=/tmp/bench_export_db python -m benchmarks.bench_export --backend chroma --messages 1000,10000
+"""
+import os
+import uuid
+import time
+import random
+import shutil
+import argparse
+import datetime
+import tempfile
+import tracemalloc
+from database.storage import use_storage_backend, get_user_repository, get_chat_repository, get_report_repository
+from database.user_export import write_export_zip, write_export_jsonl
+from benchmarks.synthetic import BASE_TIME, generate_users, generate_message_text, generate_toxic_reports
+from benchmarks.harness import write_results
+
+SEED_BATCH_SIZE = 1000
+
+def seed_history(user_email, message_count, conversation_count, seed):
+    """
+    Store a user with `message_count` messages over `conversation_count` conversations (untimed)
+    """
+    rng = random.Random(seed)
+    user_data = dict(generate_users(1, seed=seed)[0], email=user_email)
+    get_user_repository().add_user(str(uuid.uuid4()), user_data)
+
+    counterparts = [f"counterpart{i}-{user_email}" for i in range(conversation_count)]
+    chat_repository = get_chat_repository()
+    records = []
+    for i in range(message_count):
+        counterpart = counterparts[i % conversation_count]
+        sender, receiver = (user_email, counterpart) if rng.random() < 0.5 else (counterpart, user_email)
+        records.append((str(uuid.uuid4()), {
+            "sender": sender,
+            "receiver": receiver,
+            "message": generate_message_text(rng),
+            "timestamp": (BASE_TIME + datetime.timedelta(seconds=i)).isoformat()
+        }))
+        if len(records) == SEED_BATCH_SIZE:
+            chat_repository.add_messages(records)
+            records = []
+    if records:
+        chat_repository.add_messages(records)
+
+    report_repository = get_report_repository()
+    for report_data in generate_toxic_reports([user_data], max(1, message_count // 1000), seed=seed):
+        report_repository.add_report(str(uuid.uuid4()), report_data)
+
+def measure_export(write_export, user_email, path, page_size):
+    """
+    Export a user once for throughput and once under tracemalloc for peak memory
+    Returns a dictionary with the timings, output size and peak allocation
+    """
+    start = time.perf_counter()
+    manifest = write_export(user_email, path, page_size)
+    seconds = time.perf_counter() - start
+    output_bytes = os.path.getsize(path)
+
+    tracemalloc.start()
+    try:
+        write_export(user_email, path, page_size)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "seconds": round(seconds, 3),
+        "messages_per_second": round(manifest["messages"] / seconds, 1),
+        "output_mb": round(output_bytes / 1024 / 1024, 3),
+        "mb_per_second": round(output_bytes / 1024 / 1024 / seconds, 2),
+        "peak_kib": round(peak / 1024, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming user exports")
+    parser.add_argument("--backend", default="memory", choices=["memory", "chroma"])
+    parser.add_argument("--messages", default="1000,10000,100000", help="comma-separated history sizes")
+    parser.add_argument("--conversations", type=int, default=20, help="conversations the history is spread over")
+    parser.add_argument("--page-size", type=int, default=500, help="messages read per storage call")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    results = []
+    directory = tempfile.mkdtemp(prefix="bench_export_")
+    try:
+        for message_count in [int(size) for size in args.messages.split(",")]:
+            use_storage_backend(args.backend)
+            user_email = f"export{message_count}@bench.test"
+            seed_history(user_email, message_count, args.conversations, args.seed)
+
+            for export_format, write_export in (("zip", write_export_zip), ("jsonl", write_export_jsonl)):
+                result = measure_export(write_export, user_email, os.path.join(directory, f"export.{export_format}"),
+                                        args.page_size)
+                results.append(dict(result, messages=message_count, format=export_format))
+                print(f"{message_count:>8} messages  {export_format:<5}  {result['seconds']:>8.3f} s  "
+                      f"{result['messages_per_second']:>10.1f} msg/s  {result['mb_per_second']:>7.2f} MB/s  "
+                      f"peak {result['peak_kib']:>8.1f} KiB")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    path = write_results("export", {
+        "backend": args.backend,
+        "conversations": args.conversations,
+        "page_size": args.page_size,
+        "results": results
+    })
+    print(f"Results written to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Sweep HNSW parameters for similarity search over the users collection
+
+Builds a users collection per (M, construction_ef) pair and queries it with
+every search_ef, measuring the build time, per-query latency and recall@k
+against exact (brute-force) cosine search. Profiles come from
+benchmarks/synthetic.py; their embeddings are synthetic too (one cluster per
+skill, mixed by the skills of the profile), so the sweep measures the index
+and not the embedding model. Run from the repository root:
+
+    python -m benchmarks.bench_hnsw --users 20000 --queries 200 --m 8,16,32 --construction-ef 64,100,200 --search-ef 10,50,100,200
+
+Pick the fastest setting that keeps the recall you need, then set USERS_HNSW_M,
+USERS_HNSW_CONSTRUCTION_EF and USERS_HNSW_SEARCH_EF (see database/schema.py).
+"""
+import time
+import uuid
+import shutil
+import argparse
+import tempfile
+import chromadb
+import numpy as np
+from benchmarks.harness import summarize_samples, write_results
+from benchmarks.synthetic import SKILLS, generate_users
+from database.document_codec import encode_user
+from database.schema import hnsw_index
+
+# Chroma's default embedding model produces vectors of this size
+DIMENSIONS = 384
+BATCH_SIZE = 1000
+
+def embed_profiles(users, seed=42):
+    """
+    Give every profile a unit vector near the centroids of its skills
+    Returns a float32 array with one row per user
+    """
+    rng = np.random.default_rng(seed)
+    centroids = {skill: rng.standard_normal(DIMENSIONS) for skill in SKILLS}
+
+    vectors = np.stack([
+        np.mean([centroids[skill] for skill in user["skills"]], axis=0) + 1.5 * rng.standard_normal(DIMENSIONS)
+        for user in users
+    ]).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def exact_neighbours(vectors, queries, k):
+    """
+    Find the true top-k neighbours of every query by cosine similarity
+    Returns an array of row indices, one row per query
+    """
+    similarities = queries @ vectors.T
+    return np.argsort(-similarities, axis=1)[:, :k]
+
+def build_collection(client, name, users, vectors, m, construction_ef):
+    """
+    Load the users into a new collection with the given index parameters
+    Returns the collection, its IDs in row order and the build time in seconds
+    """
+    collection = client.create_collection(
+        name=name,
+        configuration={"hnsw": hnsw_index(m=m, construction_ef=construction_ef)}
+    )
+    ids = [str(uuid.uuid4()) for _ in users]
+
+    start = time.perf_counter()
+    for offset in range(0, len(users), BATCH_SIZE):
+        collection.add(
+            ids=ids[offset:offset + BATCH_SIZE],
+            documents=[encode_user(user) for user in users[offset:offset + BATCH_SIZE]],
+            embeddings=vectors[offset:offset + BATCH_SIZE],
+            metadatas=[{"email": user["email"], "city": user["city"]} for user in users[offset:offset + BATCH_SIZE]]
+        )
+    # The first query waits for the index to catch up; count it as building
+    collection.query(query_embeddings=vectors[:1], n_results=1, include=[])
+
+    return collection, ids, time.perf_counter() - start
+
+def measure_search(directory, name, ids, queries, truth, k, search_ef):
+    """
+    Query the collection with one search_ef
+    Returns a dictionary with the latency summary and the mean recall@k
+    """
+    client = chromadb.PersistentClient(path=directory)
+    client.get_collection(name).modify(configuration={"hnsw": {"ef_search": search_ef}})
+
+    # A loaded index keeps the search_ef it was loaded with, so reopen the database
+    client.clear_system_cache()
+    collection = chromadb.PersistentClient(path=directory).get_collection(name)
+    positions = {record_id: row for row, record_id in enumerate(ids)}
+
+    latencies = []
+    recalls = []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        results = collection.query(query_embeddings=[query], n_results=k, include=[])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        found = {positions[record_id] for record_id in results["ids"][0]}
+        recalls.append(len(found & set(expected.tolist())) / k)
+
+    return {"search": summarize_samples(latencies), "recall": round(float(np.mean(recalls)), 4)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep HNSW parameters for users similarity search")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10, help="neighbours per query")
+    parser.add_argument("--m", default="8,16,32", help="comma-separated M values")
+    parser.add_argument("--construction-ef", default="64,100,200", help="comma-separated construction_ef values")
+    parser.add_argument("--search-ef", default="10,50,100,200", help="comma-separated search_ef values")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    users = generate_users(args.users, seed=args.seed)
+    vectors = embed_profiles(users, seed=args.seed)
+
+    # Queries are perturbed profiles, so their neighbours are realistic matches
+    rng = np.random.default_rng(args.seed + 1)
+    queries = vectors[rng.choice(len(users), args.queries, replace=False)] + 0.05 * rng.standard_normal((args.queries, DIMENSIONS))
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+    truth = exact_neighbours(vectors, queries, args.k)
+
+    results = []
+    directory = tempfile.mkdtemp(prefix="bench_hnsw_")
+    try:
+        for m in [int(value) for value in args.m.split(",")]:
+            for construction_ef in [int(value) for value in args.construction_ef.split(",")]:
+                name = f"users_m{m}_ef{construction_ef}"
+                client = chromadb.PersistentClient(path=directory)
+                _, ids, build_seconds = build_collection(client, name, users, vectors, m, construction_ef)
+
+                for search_ef in [int(value) for value in args.search_ef.split(",")]:
+                    result = measure_search(directory, name, ids, queries, truth, args.k, search_ef)
+                    results.append(dict(result, m=m, construction_ef=construction_ef, search_ef=search_ef,
+                                        build_seconds=round(build_seconds, 2)))
+                    print(f"M {m:>3}  construction_ef {construction_ef:>4}  search_ef {search_ef:>4}  "
+                          f"build {build_seconds:>7.2f} s  p50 {result['search']['p50_ms']:>7.2f} ms  "
+                          f"p95 {result['search']['p95_ms']:>7.2f} ms  recall@{args.k} {result['recall']:.3f}")
+
+                chromadb.PersistentClient(path=directory).delete_collection(name)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    path = write_results("hnsw", {"users": args.users, "queries": args.queries, "k": args.k, "results": results})
+    print(f"Results written to {path}")
+
+if __name__ == "__main__":
+    main()
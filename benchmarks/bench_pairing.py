@@ -0,0 +1,128 @@
+"""
+Benchmark the live pairing queue
+
+Two measurements:
+  steady state  - thousands of users wait in per-city pools while a stream of
+                  joins is paired with them, each pairing followed by a new
+                  waiter so the pools keep their size; pairings per second
+                  should not depend on how many users are waiting
+  concurrent    - worker threads play sessions that repeatedly join a pool
+                  and poll their ticket until a partner arrives or it times
+                  out, as the Find Connections page does; reports pairings
+                  per second and the wait for a partner
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pairing --waiting 1000,10000,100000 --threads 16
+"""
+import time
+import random
+import argparse
+import threading
+from utils.pairing import PairingQueue, get_pairing_queue, start_live_match, check_live_match, cancel_live_match
+from benchmarks.synthetic import CITIES
+from benchmarks.harness import summarize_samples, write_results
+
+def bench_steady_state(waiting, operations, seed):
+    """
+    Time pairings against pools holding `waiting` users in total
+    Returns a dictionary with pairings per second
+    """
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(CITIES))]
+    queue = PairingQueue()
+
+    for i in range(waiting):
+        queue.join(f"waiting-{i}@bench", rng.choices(CITIES, weights)[0])
+
+    cities = [rng.choices(CITIES, weights)[0] for _ in range(operations)]
+    started = time.perf_counter()
+    for i, city in enumerate(cities):
+        # Pair with someone waiting in the city, then refill the pool
+        queue.join(f"pairer-{i}@bench", city)
+        queue.join(f"refill-{i}@bench", city)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "waiting": waiting,
+        "pairings": operations,
+        "pairings_per_second": round(operations / elapsed, 1)
+    }
+
+def bench_concurrent(threads, duration, wait_timeout, poll_interval, seed):
+    """
+    Run `threads` simulated sessions joining and polling for `duration` seconds
+    Sessions use the process-wide queue, like the app's pairing fragment
+    Returns a dictionary with pairings per second and partner wait times
+    """
+    deadline = time.perf_counter() + duration
+    waits = []
+    timeouts = [0]
+    lock = threading.Lock()
+
+    def session(number):
+        rng = random.Random(seed + number)
+        attempt = 0
+        while time.perf_counter() < deadline:
+            attempt += 1
+            user_email = f"session-{number}-{attempt}@bench"
+            started = time.perf_counter()
+            ticket = start_live_match(user_email, rng.choice(CITIES[:4]))
+            done, partner_email = check_live_match(ticket, wait_timeout)
+            while not done:
+                if time.perf_counter() >= deadline:
+                    cancel_live_match(ticket)
+                    break
+                time.sleep(poll_interval)
+                done, partner_email = check_live_match(ticket, wait_timeout)
+            if not done:
+                break
+
+            with lock:
+                if partner_email:
+                    waits.append((time.perf_counter() - started) * 1000)
+                else:
+                    timeouts[0] += 1
+
+    workers = [threading.Thread(target=session, args=(number,)) for number in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    leftover = get_pairing_queue().waiting_count()
+
+    return {
+        "threads": threads,
+        # Each pairing completes two sessions' waits
+        "pairings_per_second": round(len(waits) / 2 / duration, 1),
+        "timeouts": timeouts[0],
+        "left_waiting": leftover,
+        "wait": summarize_samples(waits) if waits else {}
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the live pairing queue")
+    parser.add_argument("--waiting", default="1000,10000,100000", help="comma-separated waiting user counts")
+    parser.add_argument("--operations", type=int, default=100000, help="timed pairings per steady-state run")
+    parser.add_argument("--threads", type=int, default=16, help="concurrent sessions")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds of concurrent run")
+    parser.add_argument("--wait-timeout", type=float, default=0.05, help="seconds a session waits for a partner")
+    parser.add_argument("--poll-interval", type=float, default=0.005, help="seconds between a session's ticket checks")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    steady = []
+    for waiting in [int(count) for count in args.waiting.split(",")]:
+        result = bench_steady_state(waiting, args.operations, args.seed)
+        steady.append(result)
+        print(f"{waiting:>8} waiting: {result['pairings_per_second']:>12.1f} pairings/s")
+
+    concurrent = bench_concurrent(args.threads, args.duration, args.wait_timeout, args.poll_interval, args.seed)
+    print(f"{args.threads} sessions: {concurrent['pairings_per_second']:.1f} pairings/s, "
+          f"wait p50 {concurrent['wait'].get('p50_ms', 0):.3f} ms, {concurrent['timeouts']} timeouts")
+
+    path = write_results("pairing", {"steady_state": steady, "concurrent": concurrent})
+    print(f"Results written to {path}")
+
+if __name__ == "__main__":
+    main()
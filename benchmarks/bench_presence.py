@@ -0,0 +1,94 @@
+"""
+Benchmark the presence tracker at large numbers of online users
+
+For every size, that many users heartbeat into a tracker driven by a simulated
+clock. Online checks and city / All-India samples are timed while everyone is
+online, then the clock moves past the TTL and the time to expire everyone is
+measured. The tracker's memory is taken with tracemalloc. Run from the
+repository root:
+
+    python -m benchmarks.bench_presence --sizes 10000,100000,500000
+"""
+import time
+import random
+import argparse
+import tracemalloc
+from utils.presence import PresenceTracker
+from benchmarks.synthetic import CITIES
+from benchmarks.harness import time_each, write_results
+
+def run(size, ttl_seconds, tick_seconds, lookups, seed):
+    """
+    Measure one tracker holding `size` presences
+    Returns a dictionary of results
+    """
+    rng = random.Random(seed)
+    now = [0.0]
+    emails = [f"user{i}@example.com" for i in range(size)]
+    cities = [rng.choice(CITIES) for _ in range(size)]
+
+    def fill():
+        # Heartbeats are spread over one TTL, as they would be from live sessions
+        now[0] = 0.0
+        tracker = PresenceTracker(ttl_seconds=ttl_seconds, tick_seconds=tick_seconds, clock=lambda: now[0])
+        for i in range(size):
+            now[0] = ttl_seconds * i / size
+            tracker.heartbeat(emails[i], cities[i])
+        return tracker
+
+    # Memory is measured on a separate build, since tracemalloc slows every allocation
+    tracemalloc.start()
+    tracker = fill()
+    tracker_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del tracker
+
+    started = time.perf_counter()
+    tracker = fill()
+    heartbeat_seconds = time.perf_counter() - started
+
+    online = time_each(tracker.is_online, [(rng.choice(emails),) for _ in range(lookups)])
+    city_sample = time_each(tracker.sample, [(rng.choice(CITIES),) for _ in range(lookups)])
+    global_sample = time_each(tracker.sample, [() for _ in range(lookups)])
+
+    # Everyone expires once the clock passes the last heartbeat plus the TTL
+    now[0] = 2 * ttl_seconds + tick_seconds
+    started = time.perf_counter()
+    remaining = tracker.online_count()
+    expire_seconds = time.perf_counter() - started
+    assert remaining == 0
+
+    return {
+        "presences": size,
+        "heartbeats_per_second": round(size / heartbeat_seconds, 1),
+        "bytes_per_presence": round(tracker_bytes / size, 1),
+        "is_online": online,
+        "city_sample": city_sample,
+        "global_sample": global_sample,
+        "expire_all_ms": round(expire_seconds * 1000, 3)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the presence tracker")
+    parser.add_argument("--sizes", default="10000,100000,500000", help="comma-separated numbers of online users")
+    parser.add_argument("--ttl", type=float, default=60, help="presence TTL in seconds")
+    parser.add_argument("--tick", type=float, default=5, help="expiry tick in seconds")
+    parser.add_argument("--lookups", type=int, default=2000, help="timed checks and samples per size")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    results = []
+    for size in [int(size) for size in args.sizes.split(",")]:
+        result = run(size, args.ttl, args.tick, args.lookups, args.seed)
+        results.append(result)
+        print(f"{size:>7} online: heartbeat {result['heartbeats_per_second']:>9.0f}/s  "
+              f"{result['bytes_per_presence']:>6.0f} B each  "
+              f"is_online p50 {result['is_online']['p50_ms']:.4f} ms  "
+              f"city sample p50 {result['city_sample']['p50_ms']:.4f} ms  "
+              f"expire all {result['expire_all_ms']:.1f} ms")
+
+    path = write_results("presence", {"seed": args.seed, "ttl": args.ttl, "tick": args.tick, "sizes": results})
+    print(f"Results written to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark full-text search latency against corpus size
+
+For every corpus size a message search index is built from synthetic
+conversations. The user count grows with the corpus, so the typical history
+of a user stays the same while the total number of messages grows. Queries of
+one or two common chat words are then timed for random users. With
+per-participant postings, query latency should stay flat as the corpus grows.
+Run from the repository root:
+
+    python -m benchmarks.bench_search --sizes 10000,100000,1000000
+"""
+import time
+import random
+import argparse
+from database.search_index import MessageSearchIndex
+from benchmarks.synthetic import WORDS, generate_users, generate_conversations, generate_messages
+from benchmarks.harness import time_each, write_results
+
+# Messages per user in every corpus, on average
+MESSAGES_PER_USER = 200
+
+def build_index(size, seed):
+    """
+    Index `size` synthetic messages
+    Returns a tuple of (index, participant emails, seconds spent indexing)
+    """
+    users = generate_users(max(10, size // MESSAGES_PER_USER), seed=seed)
+    conversations = generate_conversations(users, max(1, len(users) * 2), seed=seed)
+
+    index = MessageSearchIndex()
+    participants = set()
+    started = time.perf_counter()
+
+    indexed = 0
+    while indexed < size:
+        for sender, receiver, message, timestamp in generate_messages(conversations, seed=seed + indexed):
+            index.add_message({"sender": sender, "receiver": receiver, "message": message, "timestamp": timestamp})
+            participants.add(sender)
+            participants.add(receiver)
+            indexed += 1
+            if indexed == size:
+                break
+
+    return index, sorted(participants), time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark search latency against corpus size")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated message counts")
+    parser.add_argument("--queries", type=int, default=500, help="timed queries per size")
+    parser.add_argument("--limit", type=int, default=20, help="hits per query")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    results = []
+    for size in [int(size) for size in args.sizes.split(",")]:
+        index, participants, build_seconds = build_index(size, args.seed)
+
+        rng = random.Random(args.seed)
+        queries = [
+            (rng.choice(participants), " ".join(rng.sample(WORDS, rng.randint(1, 2))), args.limit)
+            for _ in range(args.queries)
+        ]
+        summary = time_each(index.search, queries)
+
+        results.append({
+            "messages": size,
+            "participants": len(participants),
+            "index_messages_per_second": round(size / build_seconds, 1),
+            "query": summary
+        })
+        print(f"{size:>9} messages: index {size / build_seconds:>9.0f} msg/s  "
+              f"query p50 {summary['p50_ms']:>7.3f} ms  p95 {summary['p95_ms']:>7.3f} ms  p99 {summary['p99_ms']:>7.3f} ms")
+
+    path = write_results("search", {"seed": args.seed, "limit": args.limit, "sizes": results})
+    print(f"Results written to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Benchmark the storage daemon against a single process owning the storage
+
+Every app process is simulated by a worker process that runs the send path
+of the data layer (a chat write, both inbox updates and a history read) from
+several threads. The baseline is one worker using the storage directly; it is
+compared with 1..N workers using STORAGE_BACKEND=daemon against one daemon.
+Run from the repository root:
+
+    python -m benchmarks.bench_storage_daemon --processes 1,2,4 --threads 4 --messages 200
+
+Use --backend memory to measure the IPC overhead without Chroma.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import datetime
+import threading
+import subprocess
+from benchmarks.harness import summarize_samples, write_results
+
+def run_worker(threads, messages, users, seed):
+    """
+    Send `messages` messages between random users from `threads` threads of this process
+    Returns a dictionary with the wall-clock start and end, per-send latencies and errors
+    """
+    # Imported here so STORAGE_BACKEND from the environment is in effect
+    from database.storage import get_chat_repository, get_inbox_repository
+
+    chats = get_chat_repository()
+    inbox = get_inbox_repository()
+    chats.get_messages("warmup@example.com", "warmup@example.com", limit=1)
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    started_at = datetime.datetime(2025, 1, 1)
+
+    def sender(thread_id):
+        rng = random.Random(seed * 1000 + thread_id)
+        samples = []
+        failures = []
+        for i in range(messages // threads):
+            sender_id, receiver_id = rng.sample(range(users), 2)
+            message_data = {
+                "sender": f"user{sender_id}@example.com",
+                "receiver": f"user{receiver_id}@example.com",
+                "message": f"Benchmark message {i} from {seed}-{thread_id}",
+                "timestamp": (started_at + datetime.timedelta(milliseconds=i)).isoformat()
+            }
+
+            start = time.perf_counter()
+            try:
+                chats.add_message(f"{seed}-{thread_id}-{i}", message_data)
+                inbox.record_message(message_data)
+                chats.get_messages(message_data["sender"], message_data["receiver"], limit=50)
+            except Exception as e:
+                failures.append(repr(e))
+                continue
+            samples.append((time.perf_counter() - start) * 1000)
+
+        with lock:
+            latencies.extend(samples)
+            errors.extend(failures)
+
+    workers = [threading.Thread(target=sender, args=(thread_id,)) for thread_id in range(threads)]
+    start = time.time()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    return {"start": start, "end": time.time(), "latencies_ms": latencies, "errors": errors}
+
+def run_processes(process_count, env, args):
+    """
+    Run `process_count` worker processes with `env` and aggregate their results
+    Returns a dictionary with sends per second and the latency summary
+    """
+    env = dict(os.environ, **env)
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.bench_storage_daemon", "--worker",
+             "--threads", str(args.threads), "--messages", str(args.messages),
+             "--users", str(args.users), "--seed", str(args.seed + number)],
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True
+        )
+        for number in range(process_count)
+    ]
+
+    results = []
+    for process in processes:
+        output, _ = process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f"worker exited with status {process.returncode}")
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    latencies = [sample for result in results for sample in result["latencies_ms"]]
+    errors = [error for result in results for error in result["errors"]]
+    if not latencies:
+        raise RuntimeError(f"every send failed, e.g. {errors[0]}")
+    elapsed = max(result["end"] for result in results) - min(result["start"] for result in results)
+
+    return {
+        "processes": process_count,
+        "sends_per_second": round(len(latencies) / elapsed, 1),
+        "errors": len(errors),
+        "send": summarize_samples(latencies)
+    }
+
+def _report(label, result):
+    print(f"{label:<12} {result['sends_per_second']:>8.1f} sends/s  p50 {result['send']['p50_ms']:>7.2f} ms  "
+          f"p95 {result['send']['p95_ms']:>7.2f} ms  errors {result['errors']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the storage daemon against direct storage")
+    parser.add_argument("--processes", default="1,2,4", help="comma-separated app process counts for the daemon")
+    parser.add_argument("--threads", type=int, default=4, help="sending threads per process")
+    parser.add_argument("--messages", type=int, default=200, help="messages sent per process")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--backend", default="chroma", choices=["chroma", "memory"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.threads, args.messages, args.users, args.seed)))
+        return
+
+    results = []
+    directory = tempfile.mkdtemp(prefix="bench_storage_daemon_")
+    try:
+        storage_env = {
+            "CHROMA_MODE": "persistent",
+            "SEARCH_INDEX_JOURNAL": "",
+            "CHAT_STORAGE_BACKEND": args.backend
+        }
+
+        result = run_processes(1, dict(storage_env, STORAGE_BACKEND=args.backend,
+                                       CHROMA_PERSIST_DIRECTORY=os.path.join(directory, "direct")), args)
+        results.append(dict(result, mode="direct"))
+        _report("direct x1", result)
+
+        socket_path = os.path.join(directory, "daemon.sock")
+        daemon = subprocess.Popen(
+            [sys.executable, "-m", "database.storage_daemon", "--socket", socket_path, "--backend", args.backend],
+            env=dict(os.environ, CHROMA_PERSIST_DIRECTORY=os.path.join(directory, "daemon"), **storage_env),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        try:
+            while not os.path.exists(socket_path):
+                if daemon.poll() is not None:
+                    raise RuntimeError("storage daemon exited on start")
+                time.sleep(0.1)
+
+            for process_count in [int(count) for count in args.processes.split(",")]:
+                result = run_processes(process_count, {
+                    "STORAGE_BACKEND": "daemon",
+                    "CHAT_STORAGE_BACKEND": "daemon",
+                    "STORAGE_DAEMON_SOCKET": socket_path
+                }, args)
+                results.append(dict(result, mode="daemon"))
+                _report(f"daemon x{process_count}", result)
+        finally:
+            daemon.terminate()
+            daemon.wait()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    path = write_results("storage_daemon", {
+        "backend": args.backend,
+        "threads": args.threads,
+        "messages_per_process": args.messages,
+        "results": results
+    })
+    print(f"Results written to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark the first page and request of a fresh server process with and without warm-up
+
+Every run starts a new process on a fresh database copy, so nothing is cached
+in memory. The process first loads the app's page once, the way a new
+session's first script run does, then sends requests: a request is the send
+path of the data layer (a chat write, both inbox updates and a history read).
+The first page, the first request and --requests more for the steady state
+are timed, in three modes:
+
+- cold: WARMUP_ENABLED=false, nothing is warmed up
+- first-load: started with streamlit run, so app.py warms up during the first page
+- serve: started with python -m utils.warmup --serve, so the warm-up runs to
+  completion before the first page and is reported as the startup time
+
+The warm-up step timings are reported too. Run from the repository root:
+
+    python -m benchmarks.bench_warmup --runs 3 --requests 50
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import datetime
+import statistics
+import subprocess
+from benchmarks.harness import summarize_samples, write_results
+
+# Page every session loads first
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+# Mode -> (WARMUP_ENABLED, warm up before the first page as --serve does)
+MODES = {
+    "cold": ("false", False),
+    "first-load": ("true", False),
+    "serve": ("true", True)
+}
+
+def run_worker(mode, requests):
+    """
+    Time the startup, the first page and the first and following requests of this process
+    Returns a dictionary with the warm-up status and the latencies in milliseconds
+    """
+    # A running server has imported Streamlit before its first session
+    from streamlit.testing.v1 import AppTest
+    from utils.warmup import warm_up, get_readiness
+
+    startup_ms = 0.0
+    if MODES[mode][1]:
+        start = time.perf_counter()
+        warm_up()
+        startup_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    AppTest.from_file(APP_SCRIPT, default_timeout=300).run()
+    first_page_ms = (time.perf_counter() - start) * 1000
+
+    from database.storage import get_chat_repository, get_inbox_repository
+    chats = get_chat_repository()
+    inbox = get_inbox_repository()
+
+    started_at = datetime.datetime(2025, 1, 1)
+    latencies = []
+    for i in range(requests + 1):
+        message_data = {
+            "sender": f"user{i % 10}@example.com",
+            "receiver": f"user{i % 10 + 10}@example.com",
+            "message": f"Benchmark message {i}",
+            "timestamp": (started_at + datetime.timedelta(seconds=i)).isoformat()
+        }
+
+        start = time.perf_counter()
+        chats.add_message(f"warmup-bench-{i}", message_data)
+        inbox.record_message(message_data)
+        chats.get_messages(message_data["sender"], message_data["receiver"], limit=50)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "readiness": get_readiness(),
+        "startup_ms": startup_ms,
+        "first_page_ms": first_page_ms,
+        "first_ms": latencies[0],
+        "steady_ms": latencies[1:]
+    }
+
+def run_process(mode, args, persist_directory):
+    env = dict(
+        os.environ, CHROMA_PERSIST_DIRECTORY=persist_directory, SEARCH_INDEX_JOURNAL="", WARMUP_ENABLED=MODES[mode][0]
+    )
+    command = [sys.executable, "-m", "benchmarks.bench_warmup", "--worker", mode, "--requests", str(args.requests)]
+
+    output = subprocess.run(command, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark first-request latency with and without warm-up")
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes per mode")
+    parser.add_argument("--requests", type=int, default=50, help="steady-state requests after the first")
+    parser.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.requests)))
+        return
+
+    results = {}
+    directory = tempfile.mkdtemp(prefix="bench_warmup_")
+    try:
+        for mode in MODES:
+            startup = []
+            first_page = []
+            first = []
+            steady = []
+            steps = {}
+            for run in range(args.runs):
+                result = run_process(mode, args, os.path.join(directory, f"{mode}-{run}"))
+                startup.append(result["startup_ms"])
+                first_page.append(result["first_page_ms"])
+                first.append(result["first_ms"])
+                steady.extend(result["steady_ms"])
+                for step in (result["readiness"] or {}).get("steps", []):
+                    steps.setdefault(step["name"], []).append(step["ms"])
+
+            results[mode] = {
+                "startup_ms": round(statistics.median(startup), 2),
+                "first_page_ms": round(statistics.median(first_page), 2),
+                "first_request_ms": round(statistics.median(first), 2),
+                "steady": summarize_samples(steady),
+                "warmup_steps_ms": {name: round(statistics.median(samples), 1) for name, samples in steps.items()}
+            }
+            print(f"{mode:<10} startup {results[mode]['startup_ms']:>8.2f} ms  "
+                  f"first page {results[mode]['first_page_ms']:>8.2f} ms  "
+                  f"first request {results[mode]['first_request_ms']:>8.2f} ms  "
+                  f"steady p50 {results[mode]['steady']['p50_ms']:>7.2f} ms")
+            for name, ms in results[mode]["warmup_steps_ms"].items():
+                print(f"           warm-up {name:<16} {ms:>8.1f} ms")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    path = write_results("warmup", {"runs": args.runs, "requests": args.requests, "results": results})
+    print(f"Results written to {path}")
+
+if __name__ == "__main__":
+    main()
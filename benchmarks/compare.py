@@ -0,0 +1,80 @@
+"""
+Compare two benchmark result files produced by benchmarks/harness.py
+
+Walks both JSON documents and prints every timing metric (keys ending in _ms)
+present in both, with the relative change. Run from the repository root:
+
+    python -m benchmarks.compare old/data_layer_memory.json new/data_layer_memory.json
+"""
+import sys
+import json
+import argparse
+
+def _flatten(value, prefix=""):
+    """
+    Flatten nested dictionaries and lists into {"path.to.metric": value}
+    List items are keyed by their "scale" or "backend" field when present
+    """
+    flat = {}
+
+    if isinstance(value, dict):
+        for key, item in value.items():
+            flat.update(_flatten(item, f"{prefix}.{key}" if prefix else key))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            label = index
+            if isinstance(item, dict):
+                label = item.get("scale", item.get("backend", index))
+            flat.update(_flatten(item, f"{prefix}[{label}]"))
+    else:
+        flat[prefix] = value
+
+    return flat
+
+def compare(old_results, new_results, metric_suffix="_ms"):
+    """
+    Compare two result payloads
+    Returns a list of (metric, old, new, percent change) tuples
+    """
+    old_flat = _flatten(old_results["results"])
+    new_flat = _flatten(new_results["results"])
+    rows = []
+
+    for metric in sorted(old_flat.keys() & new_flat.keys()):
+        if not metric.endswith(metric_suffix):
+            continue
+        old_value, new_value = old_flat[metric], new_flat[metric]
+        if not isinstance(old_value, (int, float)) or not isinstance(new_value, (int, float)):
+            continue
+        change = ((new_value - old_value) / old_value * 100) if old_value else None
+        rows.append((metric, old_value, new_value, change))
+
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--metric", default="_ms", help="only compare metrics with this suffix")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help="exit with status 1 if any metric regresses by more than this percentage")
+    args = parser.parse_args()
+
+    with open(args.old) as f:
+        old_results = json.load(f)
+    with open(args.new) as f:
+        new_results = json.load(f)
+
+    regressions = 0
+    for metric, old_value, new_value, change in compare(old_results, new_results, args.metric):
+        change_text = f"{change:+.1f}%" if change is not None else "n/a"
+        print(f"{metric:<70} {old_value:>12.4f} {new_value:>12.4f} {change_text:>9}")
+        if args.threshold is not None and change is not None and change > args.threshold:
+            regressions += 1
+
+    if regressions:
+        print(f"{regressions} metric(s) regressed by more than {args.threshold}%")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import platform
+import datetime
+import statistics
+
+# Directory where benchmark results are written
+RESULTS_DIRECTORY = os.getenv("BENCHMARK_RESULTS_DIRECTORY", os.path.join(os.path.dirname(__file__), "results"))
+
+def time_call(func, repeat=5, number=1):
+    """
+    Time a callable `repeat` times, running it `number` times per sample
+    Returns a dictionary of per-call timing statistics in milliseconds
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) * 1000 / number)
+
+    return {
+        "min_ms": round(min(samples), 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "mean_ms": round(statistics.mean(samples), 4),
+        "max_ms": round(max(samples), 4),
+        "repeat": repeat,
+        "number": number
+    }
+
+def percentile(ordered_samples, pct):
+    """
+    Return the nearest-rank percentile of an already sorted list of samples
+    """
+    index = min(len(ordered_samples) - 1, max(0, int(round(pct / 100 * len(ordered_samples))) - 1))
+    return ordered_samples[index]
+
+def summarize_samples(samples_ms):
+    """
+    Summarize per-call latencies in milliseconds
+    Returns a dictionary with count, mean, percentiles and throughput
+    """
+    ordered = sorted(samples_ms)
+    mean = statistics.mean(ordered)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(mean, 4),
+        "p50_ms": round(percentile(ordered, 50), 4),
+        "p95_ms": round(percentile(ordered, 95), 4),
+        "p99_ms": round(percentile(ordered, 99), 4),
+        "max_ms": round(ordered[-1], 4),
+        "ops_per_second": round(1000 / mean, 1) if mean else None
+    }
+
+def time_each(func, argument_list):
+    """
+    Call `func(*args)` once for every args tuple, timing each call
+    Returns the summary from summarize_samples
+    """
+    samples = []
+    for args in argument_list:
+        start = time.perf_counter()
+        func(*args)
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return summarize_samples(samples)
+
+def write_results(name, results):
+    """
+    Write benchmark results as JSON to RESULTS_DIRECTORY/<name>.json
+    Results are wrapped with enough environment information to diff runs
+    Returns the path of the written file
+    """
+    os.makedirs(RESULTS_DIRECTORY, exist_ok=True)
+    path = os.path.join(RESULTS_DIRECTORY, f"{name}.json")
+
+    payload = {
+        "benchmark": name,
+        "created_at": datetime.datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results
+    }
+
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+
+    return path
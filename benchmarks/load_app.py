@@ -0,0 +1,261 @@
+"""
+Headless multi-session load generator for app.py
+
+Drives N concurrent Streamlit sessions through the app with AppTest: login
+bootstrap, Find Connections, a random match and a loop of Send presses on the
+Chat page. AppTest never fires the pairing fragment's run_every timer, so a
+session waiting for a live partner reruns the page every PAIRING_POLL_SECONDS
+(untimed) until it is paired or falls back and the Chat page opens. Clerk, OpenAI moderation and Razorpay are replaced by local stubs
+with configurable latency, and storage defaults to the in-memory backend, so
+the numbers reflect the app's own rerun cost.
+
+Every rerun is timed; the report gives p50/p95/p99 rerun latency and reruns
+per second for each concurrency level, and the saturation point: the first
+level where throughput stops growing or p95 exceeds the latency objective.
+Run from the repository root:
+
+    python -m benchmarks.load_app --sessions 1,2,4,8,16,32 --messages 20
+"""
+import os
+import time
+import argparse
+import contextlib
+from unittest.mock import MagicMock
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from streamlit import config
+from streamlit.runtime import Runtime
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.testing.v1 import AppTest
+import streamlit.testing.v1.app_test
+import streamlit.testing.v1.local_script_runner
+from streamlit.testing.v1.util import build_mock_config_get_option
+import auth.clerk_auth
+import moderation.language_filter
+import payments.payment_gateway
+import utils.pairing
+import utils.rate_limit
+from database.storage import use_storage_backend
+from database.user_operations import create_user
+from utils.config import PAIRING_POLL_SECONDS
+from benchmarks.harness import summarize_samples, write_results
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+# Session state key holding the stub Clerk token of a simulated session
+TOKEN_KEY = "load_test_token"
+
+def _install_shared_runtime():
+    """
+    Make AppTest behave like one server process hosting many sessions
+    AppTest installs and removes a mock Runtime singleton around every run, which races
+    when sessions run in parallel threads, and compiles the script afresh for every run;
+    serve one shared mock runtime and one shared script cache instead, as a server would
+    Every run also patches and restores config.get_option to turn on global.appTest; a run
+    restoring it while another is still going loses that session's widget values (KeyError
+    '$$ID-...'), so the option is turned on once for the whole process instead
+    """
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+
+    script_cache = ScriptCache()
+    streamlit.testing.v1.app_test.ScriptCache = lambda: script_cache
+    streamlit.testing.v1.local_script_runner.ScriptCache = lambda: script_cache
+
+    config.get_option = build_mock_config_get_option({"global.appTest": True})
+    streamlit.testing.v1.app_test.patch_config_options = lambda overrides: contextlib.nullcontext()
+
+def _install_stubs(moderation_latency, clerk_latency):
+    """
+    Replace Clerk, OpenAI moderation and Razorpay with local stubs
+    The app re-imports these names on every rerun, so patching the modules is enough
+    """
+    def get_user_token():
+        return st.session_state.get(TOKEN_KEY)
+
+    def get_user_data(token):
+        time.sleep(clerk_latency)
+        return {
+            "id": token,
+            "email": f"{token}@load.test",
+            "name": f"Load User {token}",
+            "profile_image": "assets/placeholder.png"
+        }
+
+    def check_message_toxicity(message, sender_email=None, receiver_email=None, max_wait=None):
+        time.sleep(moderation_latency)
+        return False
+
+    auth.clerk_auth.get_user_token = get_user_token
+    auth.clerk_auth.get_user_data = get_user_data
+    auth.clerk_auth.verify_session = lambda token: True
+    moderation.language_filter.check_message_toxicity = check_message_toxicity
+    payments.payment_gateway.create_subscription = lambda user_email, plan_id: (None, "https://example.com/stub-payment")
+    payments.payment_gateway.verify_payment = lambda user_email: True
+
+def _seed_users(count, prefix):
+    """
+    Create paid users (no message quota) with emails <prefix><n>@load.test
+    """
+    for i in range(count):
+        create_user({
+            "name": f"Load User {prefix}{i}",
+            "email": f"{prefix}{i}@load.test",
+            "city": "Bangalore",
+            "skills": ["Python", "Docker", "Kubernetes"],
+            "auth_method": "clerk",
+            "subscription_status": "paid",
+            "message_count": 0,
+            "profile_image": "assets/placeholder.png"
+        })
+
+def _button(app, label):
+    return next(button for button in app.button if button.label == label)
+
+def _wait_for_chat(app, pairing_timeout):
+    """
+    Rerun a session waiting in the pairing pool until it reaches the Chat page
+    Each rerun runs the pairing fragment, as its run_every timer would in a browser
+    """
+    deadline = time.perf_counter() + pairing_timeout + PAIRING_POLL_SECONDS
+    while app.session_state.page != "Chat":
+        if app.exception:
+            return
+        if time.perf_counter() > deadline or not any(button.label == "Stop looking" for button in app.button):
+            raise RuntimeError(f"no match found: {[error.value for error in app.error]}")
+        time.sleep(PAIRING_POLL_SECONDS)
+        app.run()
+
+def run_session(token, messages, timeout, pairing_timeout, samples, errors):
+    """
+    Drive one session through login, matching and a Send loop
+    Rerun latencies are appended to `samples`, failures to `errors`
+    """
+    app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    app.session_state[TOKEN_KEY] = token
+
+    def timed(step):
+        start = time.perf_counter()
+        step()
+        samples.append((time.perf_counter() - start) * 1000)
+        if app.exception:
+            errors.append(app.exception[0].message)
+
+    try:
+        timed(app.run)
+        timed(lambda: app.button(key="nav_Find Connections").click().run())
+        timed(lambda: _button(app, "Find Random Match").click().run())
+        _wait_for_chat(app, pairing_timeout)
+        for i in range(messages):
+            app.text_input[0].input(f"Load test message {i} from {token}")
+            timed(lambda: _button(app, "Send").click().run())
+    except Exception as e:
+        errors.append(f"{type(e).__name__}: {e}")
+
+def run_level(session_count, args):
+    """
+    Run `session_count` sessions concurrently
+    Returns the latency summary and throughput for this concurrency level
+    """
+    prefix = f"s{session_count}-"
+    _seed_users(session_count, prefix)
+
+    samples = []
+    errors = []
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=session_count) as executor:
+        for i in range(session_count):
+            executor.submit(run_session, f"{prefix}{i}", args.messages, args.timeout, args.pairing_timeout, samples, errors)
+
+    elapsed = time.perf_counter() - started
+    summary = summarize_samples(samples) if samples else {}
+
+    return {
+        "sessions": session_count,
+        "reruns": len(samples),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "elapsed_seconds": round(elapsed, 3),
+        "reruns_per_second": round(len(samples) / elapsed, 2),
+        "latency": summary
+    }
+
+def find_saturation(levels, slo_ms, min_gain):
+    """
+    Return the first concurrency level where throughput grows by less than `min_gain`
+    over the previous level or p95 latency exceeds `slo_ms`, or None if none does
+    """
+    previous = None
+    for level in levels:
+        if level["latency"] and level["latency"]["p95_ms"] > slo_ms:
+            return level["sessions"]
+        if previous and level["reruns_per_second"] < previous["reruns_per_second"] * (1 + min_gain):
+            return level["sessions"]
+        previous = level
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless multi-session load test for app.py")
+    parser.add_argument("--sessions", default="1,2,4,8,16,32", help="comma-separated concurrency levels")
+    parser.add_argument("--messages", type=int, default=20, help="Send presses per session")
+    parser.add_argument("--partners", type=int, default=50, help="extra users available as matches")
+    parser.add_argument("--backend", default="memory", choices=["memory", "chroma"])
+    parser.add_argument("--moderation-latency-ms", type=float, default=150.0)
+    parser.add_argument("--clerk-latency-ms", type=float, default=100.0)
+    parser.add_argument("--slo-ms", type=float, default=500.0, help="p95 rerun latency objective")
+    parser.add_argument("--min-gain", type=float, default=0.1, help="throughput growth below this is saturation")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-rerun timeout in seconds")
+    parser.add_argument("--pairing-timeout", type=float, default=0.0,
+                        help="seconds a session waits in the live pairing pool before falling back")
+    parser.add_argument("--rate-limits", action="store_true",
+                        help="enforce send rate limits (off by default, since sessions send back to back)")
+    args = parser.parse_args()
+
+    use_storage_backend(args.backend)
+    utils.pairing.PAIRING_TIMEOUT_SECONDS = args.pairing_timeout
+    utils.rate_limit.set_enabled(args.rate_limits)
+    _install_shared_runtime()
+    _install_stubs(args.moderation_latency_ms / 1000, args.clerk_latency_ms / 1000)
+
+    # Give every level a pool of users to be matched with
+    _seed_users(args.partners, "partner-")
+
+    # One untimed session pays for module imports and script compilation
+    _seed_users(1, "warmup-")
+    warmup_errors = []
+    run_session("warmup-0", 1, args.timeout, args.pairing_timeout, [], warmup_errors)
+    if warmup_errors:
+        parser.exit(1, f"Warmup session failed: {warmup_errors[0]}\n")
+
+    levels = []
+    for session_count in [int(level) for level in args.sessions.split(",")]:
+        level = run_level(session_count, args)
+        levels.append(level)
+        latency = level["latency"]
+        print(f"{session_count:>4} sessions: {level['reruns_per_second']:>8.2f} reruns/s  "
+              f"p50 {latency.get('p50_ms', 0):>8.1f} ms  p95 {latency.get('p95_ms', 0):>8.1f} ms  "
+              f"p99 {latency.get('p99_ms', 0):>8.1f} ms  errors {level['errors']}")
+
+    saturation = find_saturation(levels, args.slo_ms, args.min_gain)
+    print(f"Saturation point: {saturation if saturation else 'not reached'}")
+
+    path = write_results("load_app", {
+        "backend": args.backend,
+        "messages_per_session": args.messages,
+        "moderation_latency_ms": args.moderation_latency_ms,
+        "clerk_latency_ms": args.clerk_latency_ms,
+        "slo_ms": args.slo_ms,
+        "levels": levels,
+        "saturation_sessions": saturation
+    })
+    print(f"Results written to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Seeded synthetic data for benchmarks
+
+Users are spread over Indian cities with a skewed (Zipf-like) distribution,
+conversations get power-law (Pareto) message counts, and a fraction of
+generated reports look like moderation hits. The same seed always produces
+the same dataset, so results are comparable between runs and releases.
+"""
+import random
+import datetime
+
+CITIES = [
+    "Bangalore", "Hyderabad", "Pune", "Chennai", "Mumbai", "Delhi", "Gurgaon", "Noida",
+    "Kolkata", "Ahmedabad", "Kochi", "Jaipur", "Indore", "Coimbatore", "Chandigarh", "Bhubaneswar"
+]
+
+SKILLS = [
+    "Python", "Java", "Javascript", "Typescript", "React", "Angular", "Node.Js", "Django",
+    "Spring", "Aws", "Azure", "Gcp", "Docker", "Kubernetes", "Sql", "Postgresql", "Mongodb",
+    "Redis", "Kafka", "Spark", "Machine Learning", "Data Science", "Devops", "Git", "Linux"
+]
+
+WORDS = [
+    "hey", "hi", "thanks", "project", "repo", "link", "meeting", "deploy", "review", "bug",
+    "release", "interview", "team", "startup", "remote", "office", "coffee", "weekend",
+    "python", "react", "cloud", "kubernetes", "pipeline", "design", "api", "database"
+]
+
+TOXIC_CATEGORIES = ["harassment", "hate", "profanity", "sexual", "violence"]
+
+BASE_TIME = datetime.datetime(2025, 1, 1)
+
+def _city_weights():
+    # Zipf-like: the first cities are much more popular than the last
+    return [1 / (rank + 1) for rank in range(len(CITIES))]
+
+def generate_users(count, seed=42):
+    """
+    Generate `count` user profiles
+    Returns a list of user data dictionaries
+    """
+    rng = random.Random(seed)
+    weights = _city_weights()
+    users = []
+
+    for i in range(count):
+        users.append({
+            "name": f"Synthetic User {i}",
+            "email": f"user{i}@synthetic.test",
+            "city": rng.choices(CITIES, weights=weights)[0],
+            "skills": rng.sample(SKILLS, rng.randint(3, 8)),
+            "auth_method": "clerk",
+            "subscription_status": "paid" if rng.random() < 0.1 else "free",
+            "message_count": 0,
+            "profile_image": ""
+        })
+
+    return users
+
+def generate_conversations(users, count, seed=42, alpha=1.5, max_messages=500):
+    """
+    Pick `count` distinct pairs of users and give each a power-law message count
+    Returns a list of (user1_email, user2_email, message_count) tuples
+    """
+    rng = random.Random(seed)
+    emails = [user["email"] for user in users]
+    pairs = set()
+    conversations = []
+
+    # Cap attempts so small user pools cannot loop forever
+    attempts = 0
+    while len(conversations) < count and attempts < count * 10:
+        attempts += 1
+        user1, user2 = rng.sample(emails, 2)
+        key = tuple(sorted((user1, user2)))
+        if key in pairs:
+            continue
+        pairs.add(key)
+        message_count = min(max_messages, int(rng.paretovariate(alpha)))
+        conversations.append((user1, user2, message_count))
+
+    return conversations
+
+def generate_message_text(rng, min_words=3, max_words=20):
+    """
+    Generate a short message made of common chat words
+    """
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words)))
+
+def generate_messages(conversations, seed=42):
+    """
+    Expand conversations into individual messages alternating between participants
+    Yields (sender_email, receiver_email, message, timestamp) tuples in time order per conversation
+    """
+    rng = random.Random(seed)
+
+    for index, (user1, user2, message_count) in enumerate(conversations):
+        timestamp = BASE_TIME + datetime.timedelta(minutes=index)
+        for i in range(message_count):
+            sender, receiver = (user1, user2) if rng.random() < 0.5 else (user2, user1)
+            timestamp += datetime.timedelta(seconds=rng.randint(1, 600))
+            yield sender, receiver, generate_message_text(rng), timestamp.isoformat()
+
+def generate_toxic_reports(users, count, seed=42):
+    """
+    Generate toxic message reports attributed to random users
+    Returns a list of report data dictionaries
+    """
+    rng = random.Random(seed)
+    reports = []
+
+    for i in range(count):
+        categories = {category: rng.random() < 0.3 for category in TOXIC_CATEGORIES}
+        reports.append({
+            "message": generate_message_text(rng),
+            "categories": categories,
+            "sender": rng.choice(users)["email"],
+            "timestamp": (BASE_TIME + datetime.timedelta(seconds=i * 37)).isoformat()
+        })
+
+    return reports
@@ -1,6 +1,13 @@
-from database.chat_operations import send_message as db_send_message
+import time
+from database.chat_operations import post_message as db_post_message
+from database.chat_operations import get_recent_messages as db_get_recent_messages
 from database.chat_operations import get_chat_history as db_get_chat_history
+from database.chat_operations import get_chat_history_page as db_get_chat_history_page
+from database.chat_operations import get_conversation_id, is_visible_to
+from moderation.moderation_queue import submit_message, get_moderation_mode
+from chat.message_hub import get_message_hub
 from database.user_operations import update_user
+from utils.config import CHAT_STORAGE_POLL_SECONDS
 import streamlit as st
 
 def initialize_chat(user_email, match_email):
@@ -17,14 +24,17 @@ def initialize_chat(user_email, match_email):
 
 def send_message(sender_email, receiver_email, message):
     """
-    Send a message and update the chat history
+    Send a message and append it to the session chat history
+    In async moderation mode the message is stored as pending and moderated in the background
     """
     # Store the message in the database
-    message_id = db_send_message(sender_email, receiver_email, message)
+    if get_moderation_mode() == "async":
+        message_id, message_data = submit_message(sender_email, receiver_email, message)
+    else:
+        message_id, message_data = db_post_message(sender_email, receiver_email, message)
     
-    # Update the chat history in session state
-    chat_history = db_get_chat_history(sender_email, receiver_email)
-    st.session_state.chat_messages = chat_history
+    # The session already holds the history; the sent message is its newest entry
+    st.session_state.chat_messages = st.session_state.chat_messages + [message_data]
     
     return message_id
 
@@ -33,3 +43,102 @@ def get_chat_history(user_email, match_email):
     Get the chat history between two users
     """
     return db_get_chat_history(user_email, match_email)
+
+def get_chat_history_page(user_email, match_email, before=None, limit=30):
+    """
+    Get one page of chat history between two users, older than `before`
+    Returns a tuple of (messages, has_older)
+    """
+    return db_get_chat_history_page(user_email, match_email, before=before, limit=limit)
+
+def subscribe_to_chat(user_email, match_email):
+    """
+    Subscribe the current session to new messages between two users
+    Any subscription to a different conversation is closed first
+    Returns the subscription
+    """
+    conversation_id = get_conversation_id(user_email, match_email)
+    subscription = st.session_state.get('chat_subscription')
+    
+    if subscription and subscription.conversation_id == conversation_id and not subscription.closed:
+        return subscription
+    
+    if subscription:
+        subscription.close()
+    
+    subscription = get_message_hub().subscribe(conversation_id)
+    st.session_state.chat_subscription = subscription
+    # The history was just read, so the first storage poll is one interval away
+    st.session_state.chat_match_email = match_email
+    st.session_state.chat_storage_polled_at = time.monotonic()
+    
+    return subscription
+
+def unsubscribe_from_chat():
+    """
+    Close the current session's chat subscription, if any
+    """
+    subscription = st.session_state.get('chat_subscription')
+    
+    if subscription:
+        subscription.close()
+        del st.session_state['chat_subscription']
+
+def _merge_messages(chat_messages, messages):
+    """
+    Merge messages into a copy of the session chat history
+    Messages already present (e.g. the user's own sends) are skipped, unless their
+    moderation status changed, in which case they are updated in place
+    Returns a tuple of (merged history, number of messages appended or updated)
+    """
+    chat_messages = list(chat_messages)
+    known = {(msg['sender'], msg['timestamp']): i for i, msg in enumerate(chat_messages)}
+    
+    changed = 0
+    appended = False
+    for msg in messages:
+        key = (msg['sender'], msg['timestamp'])
+        if key not in known:
+            known[key] = len(chat_messages)
+            chat_messages.append(msg)
+            changed += 1
+            appended = True
+        elif chat_messages[known[key]].get('status') != msg.get('status'):
+            chat_messages[known[key]] = msg
+            changed += 1
+    
+    # A message released late, or read from storage, may be older than the newest one shown
+    if appended:
+        chat_messages.sort(key=lambda msg: msg['timestamp'])
+    
+    return chat_messages, changed
+
+def pull_new_messages():
+    """
+    Merge messages published since the last call into the session chat history
+    Every CHAT_STORAGE_POLL_SECONDS the latest messages are also read from storage,
+    since the hub only carries messages sent through this server process
+    Returns the number of messages appended or updated
+    """
+    subscription = st.session_state.get('chat_subscription')
+    
+    if not subscription:
+        return 0
+    
+    user_email = st.session_state.user['email']
+    messages = [msg for msg in subscription.poll() if is_visible_to(msg, user_email)]
+    
+    now = time.monotonic()
+    if CHAT_STORAGE_POLL_SECONDS and now - st.session_state.get('chat_storage_polled_at', 0) >= CHAT_STORAGE_POLL_SECONDS:
+        st.session_state.chat_storage_polled_at = now
+        messages += db_get_recent_messages(user_email, st.session_state.chat_match_email)
+    
+    if not messages:
+        return 0
+    
+    chat_messages, changed = _merge_messages(st.session_state.chat_messages, messages)
+    
+    if changed:
+        st.session_state.chat_messages = chat_messages
+    
+    return changed
@@ -0,0 +1,93 @@
+import html
+import streamlit as st
+from chat.chat_manager import get_chat_history_page, pull_new_messages
+from database.chat_repository import STATUS_PENDING, STATUS_RETRACTED
+
+# Number of messages rendered at once, and fetched per "Load older" press
+CHAT_WINDOW_SIZE = 30
+
+# Seconds between checks of the session's message subscription
+CHAT_REFRESH_INTERVAL = 0.5
+
+def build_transcript_html(messages, current_user_email):
+    """
+    Build a single HTML block for a list of chat messages
+    Message text is escaped so user input is never interpreted as markup
+    Returns the HTML string
+    """
+    parts = ["<div class='chat-transcript'>"]
+
+    for msg in messages:
+        css_class = "chat-message-user" if msg['sender'] == current_user_email else "chat-message-other"
+        text = html.escape(msg['message'])
+
+        # Only the sender is shown their messages that are still in moderation
+        if msg.get('status') == STATUS_PENDING:
+            text += "<div class='chat-message-status'>Sending…</div>"
+        elif msg.get('status') == STATUS_RETRACTED:
+            text = f"<s>{text}</s><div class='chat-message-status'>Removed by moderation</div>"
+
+        parts.append(f"<div class='{css_class}'>{text}</div>")
+
+    parts.append("</div>")
+
+    return "".join(parts)
+
+def _reset_view(match_email, window_size):
+    """
+    Reset the windowing state when a different conversation is opened
+    """
+    st.session_state.chat_view_match = match_email
+    st.session_state.chat_window = window_size
+    st.session_state.chat_older_messages = []
+    st.session_state.chat_has_older = True
+
+def render_chat_view(user_email, match_email, window_size=CHAT_WINDOW_SIZE):
+    """
+    Render the chat transcript as one pre-escaped HTML block
+    Only the last `window_size` messages are sent to the browser; a "Load older"
+    control widens the window and pages further back through the history
+    """
+    if st.session_state.get('chat_view_match') != match_email:
+        _reset_view(match_email, window_size)
+
+    recent_messages = st.session_state.chat_messages
+    older_messages = st.session_state.chat_older_messages
+
+    # Drop any older page entries that the recent history has caught up with
+    if recent_messages and older_messages:
+        oldest_recent = recent_messages[0]['timestamp']
+        older_messages = [msg for msg in older_messages if msg['timestamp'] < oldest_recent]
+
+    messages = older_messages + recent_messages
+    visible_messages = messages[-st.session_state.chat_window:]
+    hidden_count = len(messages) - len(visible_messages)
+
+    # Offer older messages if some are loaded but hidden, or more may exist in storage
+    if messages and (hidden_count > 0 or st.session_state.chat_has_older):
+        if st.button("Load older messages", key="chat_load_older"):
+            if hidden_count < window_size and st.session_state.chat_has_older:
+                page, has_older = get_chat_history_page(
+                    user_email,
+                    match_email,
+                    before=messages[0]['timestamp'],
+                    limit=window_size
+                )
+                st.session_state.chat_older_messages = page + older_messages
+                st.session_state.chat_has_older = has_older
+
+            st.session_state.chat_window += window_size
+            st.rerun()
+
+    st.markdown(build_transcript_html(visible_messages, user_email), unsafe_allow_html=True)
+
+@st.fragment(run_every=CHAT_REFRESH_INTERVAL)
+def watch_for_new_messages():
+    """
+    Check the session's subscription in the background and rerun the app only
+    when the open conversation has received new messages
+    The check is in-memory; storage is only read every CHAT_STORAGE_POLL_SECONDS, for
+    messages sent through other server processes
+    """
+    if pull_new_messages():
+        st.rerun()
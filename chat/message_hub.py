@@ -0,0 +1,159 @@
+import time
+import weakref
+import threading
+from collections import deque
+
+# Maximum number of undelivered messages kept per subscriber (oldest are dropped first)
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Subscribers that have not polled for this many seconds are treated as disconnected
+SUBSCRIBER_IDLE_TIMEOUT = 300
+
+class Subscription:
+    """
+    A single session's subscription to one conversation
+    Messages are buffered in a bounded queue until the session polls for them
+    """
+
+    def __init__(self, hub, conversation_id, queue_size):
+        self.hub = hub
+        self.conversation_id = conversation_id
+        self.closed = False
+        self.dropped = 0
+        self.last_seen = time.monotonic()
+        self._queue = deque(maxlen=queue_size)
+        self._condition = threading.Condition()
+
+    def deliver(self, message):
+        """
+        Queue a message for this subscriber, dropping the oldest one if the queue is full
+        """
+        with self._condition:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(message)
+            self._condition.notify_all()
+
+    def poll(self):
+        """
+        Return all queued messages without blocking
+        """
+        with self._condition:
+            self.last_seen = time.monotonic()
+            messages = list(self._queue)
+            self._queue.clear()
+            return messages
+
+    def wait(self, timeout=None):
+        """
+        Block until at least one message is queued or the timeout expires
+        Returns the queued messages (possibly an empty list)
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._queue or self.closed, timeout=timeout)
+        return self.poll()
+
+    def is_idle(self, now, idle_timeout):
+        """
+        Check whether the subscriber has stopped polling
+        """
+        return now - self.last_seen > idle_timeout
+
+    def close(self):
+        """
+        Unsubscribe from the hub and wake up any waiting reader
+        """
+        self.hub.unsubscribe(self)
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+class MessageHub:
+    """
+    In-process publish/subscribe hub keyed by conversation ID
+    Subscriptions are held weakly, so sessions that are discarded without closing
+    their subscription are cleaned up automatically; idle ones are pruned on publish
+    """
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE, idle_timeout=SUBSCRIBER_IDLE_TIMEOUT):
+        self.queue_size = queue_size
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, conversation_id):
+        """
+        Subscribe to new messages in a conversation
+        Returns a Subscription
+        """
+        subscription = Subscription(self, conversation_id, self.queue_size)
+
+        with self._lock:
+            self._subscribers.setdefault(conversation_id, weakref.WeakSet()).add(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Remove a subscription from the hub
+        """
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.conversation_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.conversation_id]
+
+    def publish(self, conversation_id, message):
+        """
+        Deliver a message to every live subscriber of a conversation
+        Returns the number of subscribers the message was delivered to
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            subscribers = list(self._subscribers.get(conversation_id, ()))
+
+        delivered = 0
+        for subscription in subscribers:
+            if subscription.is_idle(now, self.idle_timeout):
+                subscription.close()
+                continue
+            subscription.deliver(message)
+            delivered += 1
+
+        return delivered
+
+    def prune(self):
+        """
+        Close all subscriptions that have been idle for longer than the idle timeout
+        Returns the number of subscriptions closed
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            subscriptions = [sub for subscribers in self._subscribers.values() for sub in subscribers]
+
+        idle = [sub for sub in subscriptions if sub.is_idle(now, self.idle_timeout)]
+        for subscription in idle:
+            subscription.close()
+
+        return len(idle)
+
+    def subscriber_count(self, conversation_id=None):
+        """
+        Count live subscribers, for one conversation or across the hub
+        """
+        with self._lock:
+            if conversation_id is not None:
+                return len(self._subscribers.get(conversation_id, ()))
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+# Process-wide hub shared by all Streamlit sessions
+_message_hub = MessageHub()
+
+def get_message_hub():
+    """
+    Return the process-wide message hub
+    """
+    return _message_hub
@@ -0,0 +1,260 @@
+"""
+Incremental analytics rollups for the admin dashboard
+
+Daily actives, messages per day and per city, signups and free-to-paid
+conversions are counted as they happen. send_message, create_user and
+update_user call the record_* functions below, which only bump counters in
+process memory. A background thread adds those to per-day buckets in the
+analytics repository every ANALYTICS_FLUSH_SECONDS, so the dashboard reads a
+few hundred pre-aggregated rows instead of scanning the users and chats. It
+is cached for one flush interval, so it lags behind by at most two. An
+active user is one who sent a message that day. Senders' cities are looked up at flush time, off the send path.
+Buckets start when the rollup is deployed; earlier history is not counted.
+Counters are read, added to and written back, so app processes sharing a
+Chroma server (CHROMA_MODE=http) must flush through the storage daemon;
+without it, analytics_enabled() turns the rollup off and says so once.
+To print the dashboard data:
+
+    python -m database.analytics --days 7
+"""
+import json
+import time
+import atexit
+import argparse
+import datetime
+import threading
+from database.storage import get_analytics_repository, get_user_repository
+from utils.config import ANALYTICS_ENABLED, ANALYTICS_FLUSH_SECONDS, ANALYTICS_DASHBOARD_DAYS
+
+# Metrics counted once per day; messages_by_city is also counted per day, with the city as dimension
+DAILY_METRICS = ("active_users", "messages", "signups", "conversions")
+
+# Days of seen markers kept, so a late message from yesterday does not count its sender twice
+_SEEN_RETENTION_DAYS = 2
+
+def day_number(moment):
+    """
+    Return the bucket of a date, datetime or ISO timestamp, an integer such as 20250131
+    """
+    if isinstance(moment, str):
+        return int(moment[:10].replace("-", ""))
+    return moment.year * 10000 + moment.month * 100 + moment.day
+
+class AnalyticsRollup:
+    """
+    Counters accumulated in process memory and flushed to the analytics repository
+
+    Recording only updates dictionaries under a lock. A flush swaps them out,
+    resolves senders into per-city counts and adds the result to the stored
+    buckets in one write, which also marks the senders seen for the day and
+    counts the new daily actives; if that fails, nothing is stored and the
+    increments are kept for the next flush.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._counts = {}
+        self._senders = {}
+        self._pruned_day = None
+
+    def _add(self, counts, metric, day, dimension="", amount=1):
+        key = (metric, day, dimension)
+        counts[key] = counts.get(key, 0) + amount
+
+    def record_message(self, sender_email, timestamp):
+        day = day_number(timestamp)
+        with self._lock:
+            self._add(self._counts, "messages", day)
+            self._senders[(day, sender_email)] = self._senders.get((day, sender_email), 0) + 1
+
+    def record_signup(self, city, moment):
+        with self._lock:
+            self._add(self._counts, "signups", day_number(moment), city or "")
+
+    def record_conversion(self, moment):
+        with self._lock:
+            self._add(self._counts, "conversions", day_number(moment))
+
+    def _count_senders(self, senders):
+        """
+        Turn (day, sender) message counts into messages per city
+        Returns a dictionary of counter increments
+        """
+        counts = {}
+        user_repository = get_user_repository()
+
+        cities = {}
+        for day, sender_email in senders:
+            if sender_email not in cities:
+                result = user_repository.get_user_by_email(sender_email)
+                cities[sender_email] = (result[1].get("city") if result else None) or "Unknown"
+
+        for (day, sender_email), messages in senders.items():
+            self._add(counts, "messages_by_city", day, cities[sender_email], messages)
+
+        return counts
+
+    def flush(self):
+        """
+        Add the counters accumulated since the last flush to the stored buckets
+        Returns the number of buckets updated
+        """
+        with self._flush_lock:
+            with self._lock:
+                counts, self._counts = self._counts, {}
+                senders, self._senders = self._senders, {}
+
+            stored = dict(counts)
+            try:
+                for key, amount in self._count_senders(senders).items():
+                    self._add(stored, *key, amount=amount)
+
+                # The repository remembers who was seen each day, across flushes and processes, and
+                # counts the new daily actives in the same write as the other increments
+                if stored or senders:
+                    get_analytics_repository().add_counts(
+                        [key + (amount,) for key, amount in stored.items()],
+                        seen=list(senders),
+                        seen_metric="active_users"
+                    )
+            except Exception:
+                # Nothing was stored, so put back the increments and the senders as they were
+                with self._lock:
+                    for key, amount in counts.items():
+                        self._add(self._counts, *key, amount=amount)
+                    for key, messages in senders.items():
+                        self._senders[key] = self._senders.get(key, 0) + messages
+                raise
+
+            today = datetime.date.today()
+            if self._pruned_day != today:
+                get_analytics_repository().prune_seen(day_number(today - datetime.timedelta(days=_SEEN_RETENTION_DAYS)))
+                self._pruned_day = today
+
+        return len(stored)
+
+_rollup = None
+_rollup_lock = threading.Lock()
+_analytics_enabled = None
+
+def analytics_enabled():
+    """
+    Check whether this process records analytics
+    ANALYTICS_ENABLED is ignored if several processes could add counts to the analytics store
+    at once and lose each other's increments
+    """
+    global _analytics_enabled
+
+    with _rollup_lock:
+        if _analytics_enabled is None:
+            _analytics_enabled = ANALYTICS_ENABLED
+            if _analytics_enabled and not get_analytics_repository().supports_multiple_writers():
+                print("ANALYTICS_ENABLED needs the storage daemon when app processes share a Chroma server; analytics are off")
+                _analytics_enabled = False
+
+        return _analytics_enabled
+
+def _flush_quietly(rollup):
+    try:
+        rollup.flush()
+    except Exception as e:
+        print(f"Error flushing analytics: {str(e)}")
+
+def _flush_loop(rollup):
+    while True:
+        time.sleep(ANALYTICS_FLUSH_SECONDS)
+        _flush_quietly(rollup)
+
+def get_analytics_rollup():
+    """
+    Return the process-wide rollup, starting its flush thread on first use
+    """
+    global _rollup
+
+    with _rollup_lock:
+        if _rollup is None:
+            _rollup = AnalyticsRollup()
+            threading.Thread(target=_flush_loop, args=(_rollup,), name="analytics-flush", daemon=True).start()
+            # Counters recorded since the last flush are written when the process exits
+            atexit.register(_flush_quietly, _rollup)
+        return _rollup
+
+def record_message(message_data):
+    """
+    Count a sent message for its day, its sender's city and the sender's daily activity
+    """
+    if analytics_enabled():
+        get_analytics_rollup().record_message(message_data["sender"], message_data["timestamp"])
+
+def record_signup(user_data):
+    """
+    Count a new user for today
+    """
+    if analytics_enabled():
+        get_analytics_rollup().record_signup(user_data.get("city"), datetime.datetime.now())
+
+def record_conversion():
+    """
+    Count a user moving from the free plan to a paid one today
+    """
+    if analytics_enabled():
+        get_analytics_rollup().record_conversion(datetime.datetime.now())
+
+# The buckets only change when a process flushes, so a dashboard is reused for one flush interval
+_dashboard_cache = {}
+_dashboard_lock = threading.Lock()
+
+def get_dashboard(days=ANALYTICS_DASHBOARD_DAYS, today=None):
+    """
+    Read the stored buckets of the last `days` days, up to and including `today`
+    Returns a dictionary with the days, a per-day series for every daily metric, messages per
+    city over the period, period totals with the conversion rate and the number of buckets read
+    """
+    today = today or datetime.date.today()
+
+    with _dashboard_lock:
+        cached = _dashboard_cache.get((days, today))
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+    day_numbers = [day_number(today - datetime.timedelta(days=offset)) for offset in range(days - 1, -1, -1)]
+    counters = get_analytics_repository().list_counters(day_numbers[0])
+
+    series = {metric: dict.fromkeys(day_numbers, 0) for metric in DAILY_METRICS}
+    cities = {}
+    for metric, day, dimension, value in counters:
+        if day not in series["messages"]:
+            continue
+        if metric == "messages_by_city":
+            cities[dimension] = cities.get(dimension, 0) + value
+        elif metric in series:
+            # Signups are stored per city; the daily series adds them up
+            series[metric][day] += value
+
+    totals = {metric: sum(series[metric].values()) for metric in ("messages", "signups", "conversions")}
+    totals["conversion_rate"] = totals["conversions"] / totals["signups"] if totals["signups"] else None
+
+    dashboard = {
+        "days": [f"{day // 10000:04d}-{day // 100 % 100:02d}-{day % 100:02d}" for day in day_numbers],
+        "series": {metric: list(values.values()) for metric, values in series.items()},
+        "messages_by_city": sorted(cities.items(), key=lambda item: item[1], reverse=True),
+        "totals": totals,
+        "buckets": len(counters)
+    }
+
+    with _dashboard_lock:
+        _dashboard_cache.clear()
+        _dashboard_cache[(days, today)] = (time.monotonic() + ANALYTICS_FLUSH_SECONDS, dashboard)
+
+    return dashboard
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the analytics dashboard data")
+    parser.add_argument("--days", type=int, default=ANALYTICS_DASHBOARD_DAYS)
+    args = parser.parse_args()
+
+    print(json.dumps(get_dashboard(args.days), indent=2))
+
+if __name__ == "__main__":
+    main()
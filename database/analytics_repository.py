@@ -0,0 +1,165 @@
+import threading
+from database.chroma_connection import get_collection
+from utils.config import CHROMA_MODE
+
+def _counter_id(metric, day, dimension):
+    return f"count|{metric}|{day}|{dimension}"
+
+def _seen_id(day, key):
+    return f"seen|{day}|{key}"
+
+class AnalyticsRepository:
+    """
+    Storage interface for pre-aggregated analytics counters
+    A counter is identified by a metric, a day (an integer such as 20250131) and a
+    dimension ("" for none); its value only ever grows by the increments added to it
+    """
+
+    def add_counts(self, counts, seen=(), seen_metric=None):
+        """
+        Add a list of (metric, day, dimension, amount) increments to the stored counters
+        `seen` is a list of (day, key) pairs, e.g. user emails; each key not seen on its day before
+        is marked seen and adds one to the (seen_metric, day, "") counter, in the same write, so
+        the markers and the counts are stored together or not at all
+        Returns the (day, key) pairs that had not been seen before
+        """
+        raise NotImplementedError
+
+    def supports_multiple_writers(self):
+        """
+        Check whether several processes can add counts to this store at once without losing increments
+        """
+        return False
+
+    def prune_seen(self, before_day):
+        """
+        Forget the keys seen on days before `before_day`
+        """
+        raise NotImplementedError
+
+    def list_counters(self, since_day):
+        """
+        Retrieve every counter of `since_day` and later
+        Returns a list of (metric, day, dimension, value) tuples
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Release any resources held by the repository
+        """
+
+class ChromaAnalyticsRepository(AnalyticsRepository):
+    """
+    Analytics repository backed by the ChromaDB analytics collection
+    Counters and seen markers are rows with deterministic IDs, so every update is a lookup by ID
+    """
+
+    def __init__(self):
+        # Serializes the read-modify-write of counters within this process only; processes
+        # sharing a Chroma server go through the storage daemon instead
+        self._lock = threading.Lock()
+
+    def _collection(self):
+        return get_collection("analytics")
+
+    def add_counts(self, counts, seen=(), seen_metric=None):
+        totals = {}
+        for metric, day, dimension, amount in counts:
+            key = (metric, day, dimension)
+            totals[key] = totals.get(key, 0) + amount
+        seen = list(dict.fromkeys((day, key) for day, key in seen))
+        if not totals and not seen:
+            return []
+
+        with self._lock:
+            collection = self._collection()
+
+            seen_ids = [_seen_id(day, key) for day, key in seen]
+            existing = set(collection.get(ids=seen_ids, include=[])["ids"]) if seen_ids else set()
+            new_seen = [pair for pair, row_id in zip(seen, seen_ids) if row_id not in existing]
+            for day, _ in new_seen:
+                key = (seen_metric, day, "")
+                totals[key] = totals.get(key, 0) + 1
+
+            ids = [_counter_id(*key) for key in totals]
+            results = collection.get(ids=ids, include=["metadatas"])
+            current = {row_id: metadata["value"] for row_id, metadata in zip(results["ids"], results["metadatas"])}
+
+            # One upsert, so the counters and the seen markers are written together; a flush
+            # holds far fewer rows than Chroma's batch limit. Rows are only ever fetched by ID or
+            # metadata, so a constant embedding spares the embedding model a call per write
+            ids += [_seen_id(day, key) for day, key in new_seen]
+            collection.upsert(
+                ids=ids,
+                documents=ids,
+                embeddings=[[1.0] for _ in ids],
+                metadatas=[
+                    {"kind": "count", "metric": metric, "day": day, "dimension": dimension,
+                     "value": current.get(_counter_id(metric, day, dimension), 0) + amount}
+                    for (metric, day, dimension), amount in totals.items()
+                ] + [{"kind": "seen", "day": day} for day, _ in new_seen]
+            )
+
+        return new_seen
+
+    def supports_multiple_writers(self):
+        # Only a Chroma server can be shared by several processes, and the read-modify-write
+        # above is serialized per process
+        return CHROMA_MODE != "http"
+
+    def prune_seen(self, before_day):
+        with self._lock:
+            self._collection().delete(where={"$and": [{"kind": "seen"}, {"day": {"$lt": before_day}}]})
+
+    def list_counters(self, since_day):
+        results = self._collection().get(
+            where={"$and": [{"kind": "count"}, {"day": {"$gte": since_day}}]},
+            include=["metadatas"]
+        )
+        return [
+            (metadata["metric"], metadata["day"], metadata["dimension"], metadata["value"])
+            for metadata in results["metadatas"]
+        ]
+
+class InMemoryAnalyticsRepository(AnalyticsRepository):
+    """
+    Analytics repository held in process memory, with the same semantics as the Chroma one
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._seen = {}
+
+    def add_counts(self, counts, seen=(), seen_metric=None):
+        with self._lock:
+            new_seen = []
+            for day, key in dict.fromkeys((day, key) for day, key in seen):
+                day_seen = self._seen.setdefault(day, set())
+                if key not in day_seen:
+                    day_seen.add(key)
+                    new_seen.append((day, key))
+
+            for metric, day, dimension, amount in list(counts) + [(seen_metric, day, "", 1) for day, _ in new_seen]:
+                key = (metric, day, dimension)
+                self._counters[key] = self._counters.get(key, 0) + amount
+
+        return new_seen
+
+    def supports_multiple_writers(self):
+        # Every process has its own counters
+        return True
+
+    def prune_seen(self, before_day):
+        with self._lock:
+            for day in [day for day in self._seen if day < before_day]:
+                del self._seen[day]
+
+    def list_counters(self, since_day):
+        with self._lock:
+            return [
+                (metric, day, dimension, value)
+                for (metric, day, dimension), value in self._counters.items()
+                if day >= since_day
+            ]
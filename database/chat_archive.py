@@ -0,0 +1,232 @@
+"""
+Tiered archival of idle conversations
+
+The archival job moves every conversation idle for longer than
+CHAT_ARCHIVE_IDLE_DAYS out of the hot chat store and into compressed segment
+files. In the hot store the conversation is replaced by a stub recording where
+its messages went. Reading the history of an archived conversation faults it
+back into the hot store first (see database/chat_operations.py). Run the job
+from the repository root:
+
+    python -m database.chat_archive --idle-days 30
+    python -m database.chat_archive --idle-days 30 --dry-run
+
+The append-only "log" chat backend cannot replace messages with a stub, so
+the job refuses to run against it.
+"""
+import os
+import gzip
+import json
+import zlib
+import argparse
+import datetime
+import threading
+from utils.config import CHAT_ARCHIVE_DIRECTORY, CHAT_ARCHIVE_IDLE_DAYS, CHAT_ARCHIVE_SEGMENT_BYTES
+from database.storage import get_chat_repository
+from database.chat_repository import get_conversation_id
+
+def _segment_name(sequence):
+    return f"segment-{sequence:08d}.jsonl.gz"
+
+class ChatArchive:
+    """
+    Append-only compressed segment files holding archived conversations
+
+    Each archived conversation is written as one gzip member of JSONL records
+    (message ID plus message data). The stub keeps the segment, offset and
+    length of that member, so faulting a conversation back in reads and
+    decompresses only that conversation.
+    """
+
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        sequences = [
+            int(name[len("segment-"):-len(".jsonl.gz")])
+            for name in os.listdir(directory)
+            if name.startswith("segment-") and name.endswith(".jsonl.gz")
+        ]
+        self._sequence = max(sequences, default=0)
+
+    def write(self, records):
+        """
+        Durably append a conversation's (message_id, message_data) records
+        Returns the location of the written member
+        """
+        lines = "".join(
+            json.dumps(dict(message_data, id=message_id), separators=(",", ":")) + "\n"
+            for message_id, message_data in records
+        )
+        member = gzip.compress(lines.encode("utf-8"))
+
+        with self._lock:
+            segment = _segment_name(self._sequence)
+            path = os.path.join(self.directory, segment)
+            if os.path.exists(path) and os.path.getsize(path) + len(member) > self.segment_bytes:
+                self._sequence += 1
+                segment = _segment_name(self._sequence)
+                path = os.path.join(self.directory, segment)
+
+            with open(path, "ab") as f:
+                offset = f.tell()
+                f.write(member)
+                f.flush()
+                os.fsync(f.fileno())
+
+        # The segment is named under the lock; a concurrent write may have rolled to the next one since
+        return {
+            "segment": segment,
+            "offset": offset,
+            "length": len(member),
+            "messages": len(records)
+        }
+
+    def read(self, location):
+        """
+        Read back the records of an archived conversation
+        Returns a list of (message_id, message_data) tuples
+        """
+        with open(os.path.join(self.directory, location["segment"]), "rb") as f:
+            f.seek(location["offset"])
+            member = f.read(location["length"])
+
+        records = []
+        for line in gzip.decompress(member).decode("utf-8").splitlines():
+            message_data = json.loads(line)
+            records.append((message_data.pop("id"), message_data))
+
+        return records
+
+    def iter_records(self, location, chunk_bytes=64 * 1024):
+        """
+        Stream the records of an archived conversation without decompressing it all at once
+        Yields (message_id, message_data) tuples in archive order
+        """
+        # wbits=31 decodes exactly one gzip member, so the members after it in the segment are not read
+        decompressor = zlib.decompressobj(wbits=31)
+        remaining = location["length"]
+        pending = b""
+
+        with open(os.path.join(self.directory, location["segment"]), "rb") as f:
+            f.seek(location["offset"])
+            while remaining and not decompressor.eof:
+                chunk = f.read(min(chunk_bytes, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+
+                lines = (pending + decompressor.decompress(chunk)).split(b"\n")
+                pending = lines.pop()
+                for line in lines:
+                    message_data = json.loads(line)
+                    yield message_data.pop("id"), message_data
+
+_archive = None
+_archive_lock = threading.Lock()
+
+# Conversations being restored, so concurrent readers fault each one in only once
+_restore_locks = {}
+
+def get_chat_archive():
+    """
+    Return the process-wide chat archive
+    """
+    global _archive
+
+    with _archive_lock:
+        if _archive is None:
+            _archive = ChatArchive(CHAT_ARCHIVE_DIRECTORY, CHAT_ARCHIVE_SEGMENT_BYTES)
+        return _archive
+
+def archive_conversation(user1_email, user2_email):
+    """
+    Move one conversation from the hot chat store into the archive
+    Messages already archived under an earlier stub are merged into the new member
+    Returns the number of messages now archived for the conversation
+    """
+    chat_repository = get_chat_repository()
+    # Fail before writing a segment member that no stub would ever point to
+    if not chat_repository.supports_archival():
+        raise NotImplementedError(f"{type(chat_repository).__name__} does not support archival")
+    archive = get_chat_archive()
+
+    records = chat_repository.export_conversation(user1_email, user2_email)
+    if not records:
+        return 0
+
+    previous = chat_repository.get_archive_stub(user1_email, user2_email)
+    archived_records = archive.read(previous) if previous else []
+
+    # The archive is synced before anything is removed from the hot store
+    location = archive.write(archived_records + records)
+    chat_repository.archive_conversation(
+        user1_email,
+        user2_email,
+        [message_id for message_id, _ in records],
+        location
+    )
+
+    return location["messages"]
+
+def restore_archived_conversation(user1_email, user2_email):
+    """
+    Fault an archived conversation back into the hot chat store
+    Returns True if the conversation was archived, False otherwise
+    """
+    chat_repository = get_chat_repository()
+
+    # Fast path: most conversations have no stub
+    if chat_repository.get_archive_stub(user1_email, user2_email) is None:
+        return False
+
+    conversation_id = get_conversation_id(user1_email, user2_email)
+    with _archive_lock:
+        lock = _restore_locks.setdefault(conversation_id, threading.Lock())
+
+    with lock:
+        location = chat_repository.get_archive_stub(user1_email, user2_email)
+        if location is not None:
+            records = get_chat_archive().read(location)
+            chat_repository.restore_conversation(user1_email, user2_email, records)
+
+    with _archive_lock:
+        _restore_locks.pop(conversation_id, None)
+
+    return True
+
+def archive_idle_conversations(idle_days=CHAT_ARCHIVE_IDLE_DAYS, now=None, dry_run=False):
+    """
+    Archive every conversation whose last message is older than `idle_days`
+    Returns a dictionary with the number of conversations and messages archived
+    """
+    now = now or datetime.datetime.now()
+    cutoff = (now - datetime.timedelta(days=idle_days)).isoformat()
+
+    stats = {"conversations": 0, "messages": 0}
+    for user1_email, user2_email, last_timestamp in get_chat_repository().get_conversation_activity().values():
+        if last_timestamp >= cutoff:
+            continue
+
+        stats["conversations"] += 1
+        if not dry_run:
+            stats["messages"] += archive_conversation(user1_email, user2_email)
+
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive idle conversations to compressed segment files")
+    parser.add_argument("--idle-days", type=float, default=CHAT_ARCHIVE_IDLE_DAYS)
+    parser.add_argument("--dry-run", action="store_true", help="count idle conversations without moving them")
+    args = parser.parse_args()
+
+    if not args.dry_run and not get_chat_repository().supports_archival():
+        parser.exit(1, "The chat store cannot replace messages with archive stubs, so conversations cannot be archived\n")
+
+    stats = archive_idle_conversations(args.idle_days, dry_run=args.dry_run)
+    print(json.dumps(stats))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+import os
+import json
+import time
+import zlib
+import bisect
+import struct
+import threading
+from array import array
+from database.chat_repository import ChatRepository, get_conversation_id
+
+# Every record is framed as (payload length, CRC32 of payload) followed by the JSON payload
+_HEADER = struct.Struct(">II")
+
+# Index entries pack the segment ID and the record offset into a single integer
+_OFFSET_BITS = 32
+_OFFSET_MASK = (1 << _OFFSET_BITS) - 1
+
+def _segment_name(partition, sequence):
+    return f"p{partition:03d}-{sequence:08d}.log"
+
+def _parse_segment_name(name):
+    """
+    Parse a segment file name into (partition, sequence), or None if it is not a segment
+    """
+    if not (name.startswith("p") and name.endswith(".log")):
+        return None
+
+    try:
+        partition, sequence = name[1:-4].split("-")
+        return int(partition), int(sequence)
+    except ValueError:
+        return None
+
+class LogChatRepository(ChatRepository):
+    """
+    Append-only, log-structured chat store
+
+    Messages are appended to segment files partitioned by a hash of the conversation ID.
+    An in-memory index maps each (sender, receiver) direction to the offsets of its records,
+    so reads touch only the records they return. Writers are made durable with a
+    group-committed fsync: a background thread syncs all dirty segments at most once per
+    commit window and wakes every writer covered by that sync.
+
+    On open, every segment is scanned to rebuild the index; a torn or corrupt tail left by
+    a crash is truncated at the last valid record.
+    """
+
+    def __init__(self, directory, partitions=16, segment_bytes=64 * 1024 * 1024,
+                 sync_mode="group", group_commit_ms=2.0):
+        if sync_mode not in ("group", "async"):
+            raise ValueError(f"Unknown chat log sync mode: {sync_mode}")
+
+        self.directory = directory
+        self.partitions = partitions
+        self.segment_bytes = segment_bytes
+        self.sync_mode = sync_mode
+        self.group_commit_interval = group_commit_ms / 1000
+
+        self._condition = threading.Condition()
+        self._segment_fds = []
+        self._active_segments = {}
+        self._active_sizes = {}
+        self._partition_sequences = {}
+        self._index = {}
+        self._sent_counts = {}
+        self._dirty_segments = set()
+        self._written_seq = 0
+        self._synced_seq = 0
+        self._closed = False
+        self.recovered_bytes_truncated = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+
+        self._sync_thread = threading.Thread(target=self._sync_loop, name="chat-log-sync", daemon=True)
+        self._sync_thread.start()
+
+    # Recovery
+
+    def _recover(self):
+        """
+        Open every segment in order, truncate torn tails and rebuild the in-memory index
+        """
+        segments = []
+        for name in os.listdir(self.directory):
+            parsed = _parse_segment_name(name)
+            if parsed:
+                segments.append((parsed, name))
+        segments.sort()
+
+        for (partition, sequence), name in segments:
+            fd = os.open(os.path.join(self.directory, name), os.O_RDWR | os.O_APPEND)
+            segment_id = len(self._segment_fds)
+            self._segment_fds.append(fd)
+
+            valid_size = self._scan_segment(segment_id, fd)
+            file_size = os.fstat(fd).st_size
+            if valid_size < file_size:
+                os.ftruncate(fd, valid_size)
+                os.fsync(fd)
+                self.recovered_bytes_truncated += file_size - valid_size
+
+            self._active_segments[partition] = segment_id
+            self._active_sizes[partition] = valid_size
+            self._partition_sequences[partition] = sequence
+
+    def _scan_segment(self, segment_id, fd):
+        """
+        Index all valid records in a segment
+        Returns the offset just past the last valid record
+        """
+        data = os.pread(fd, os.fstat(fd).st_size, 0)
+        offset = 0
+
+        while offset + _HEADER.size <= len(data):
+            length, checksum = _HEADER.unpack_from(data, offset)
+            start = offset + _HEADER.size
+            payload = data[start:start + length]
+
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                break
+
+            try:
+                record = json.loads(payload)
+            except ValueError:
+                break
+
+            self._index_record(segment_id, offset, record["sender"], record["receiver"])
+            offset = start + length
+
+        return offset
+
+    def _index_record(self, segment_id, offset, sender_email, receiver_email):
+        key = (sender_email, receiver_email)
+        locations = self._index.get(key)
+        if locations is None:
+            locations = self._index[key] = array("Q")
+        locations.append((segment_id << _OFFSET_BITS) | offset)
+        self._sent_counts[sender_email] = self._sent_counts.get(sender_email, 0) + 1
+
+    # Writes
+
+    def _segment_for(self, partition, record_size):
+        """
+        Return the active segment of a partition, rolling to a new one when it is full
+        Must be called with the condition lock held
+        """
+        segment_id = self._active_segments.get(partition)
+
+        if segment_id is None or self._active_sizes[partition] + record_size > self.segment_bytes:
+            sequence = self._partition_sequences.get(partition, 0) + 1
+            path = os.path.join(self.directory, _segment_name(partition, sequence))
+            fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+
+            segment_id = len(self._segment_fds)
+            self._segment_fds.append(fd)
+            self._active_segments[partition] = segment_id
+            self._active_sizes[partition] = 0
+            self._partition_sequences[partition] = sequence
+
+        return segment_id
+
+    def _encode(self, message_id, message_data):
+        """
+        Frame a record and pick its partition, outside the lock
+        Returns a tuple of (partition, frame, sender, receiver)
+        """
+        record = dict(message_data, id=message_id)
+        payload = json.dumps(record, separators=(",", ":")).encode("utf-8")
+        frame = _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+        conversation_id = get_conversation_id(message_data["sender"], message_data["receiver"])
+        partition = zlib.crc32(conversation_id.encode("utf-8")) % self.partitions
+
+        return partition, frame, message_data["sender"], message_data["receiver"]
+
+    def add_message(self, message_id, message_data):
+        self.add_messages([(message_id, message_data)])
+
+    def add_messages(self, records):
+        encoded = [self._encode(message_id, message_data) for message_id, message_data in records]
+        if not encoded:
+            return
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Chat log is closed")
+
+            for partition, frame, sender_email, receiver_email in encoded:
+                segment_id = self._segment_for(partition, len(frame))
+                offset = self._active_sizes[partition]
+                os.write(self._segment_fds[segment_id], frame)
+                self._active_sizes[partition] = offset + len(frame)
+
+                self._index_record(segment_id, offset, sender_email, receiver_email)
+                self._dirty_segments.add(segment_id)
+
+            self._written_seq += len(encoded)
+            sequence = self._written_seq
+            self._condition.notify_all()
+
+            # Wait for the group commit that covers these writes
+            if self.sync_mode == "group":
+                self._condition.wait_for(lambda: self._synced_seq >= sequence or self._closed)
+
+    def _sync_loop(self):
+        """
+        Background group-commit loop: fsync all dirty segments once per commit window
+        """
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._written_seq > self._synced_seq or self._closed)
+                if self._closed and self._written_seq == self._synced_seq:
+                    return
+
+            # Let concurrent writers join this commit
+            time.sleep(self.group_commit_interval)
+
+            with self._condition:
+                target_seq = self._written_seq
+                dirty_fds = [self._segment_fds[segment_id] for segment_id in self._dirty_segments]
+                self._dirty_segments.clear()
+
+            for fd in dirty_fds:
+                os.fsync(fd)
+
+            with self._condition:
+                self._synced_seq = max(self._synced_seq, target_seq)
+                self._condition.notify_all()
+
+    # Reads
+
+    def _read_entry(self, location):
+        fd = self._segment_fds[location >> _OFFSET_BITS]
+        offset = location & _OFFSET_MASK
+        length, _ = _HEADER.unpack(os.pread(fd, _HEADER.size, offset))
+        record = json.loads(os.pread(fd, length, offset + _HEADER.size))
+        return record.pop("id", None), record
+
+    def _read_record(self, location):
+        return self._read_entry(location)[1]
+
+    def get_messages(self, sender_email, receiver_email, limit=None, before=None):
+        with self._condition:
+            locations = self._index.get((sender_email, receiver_email))
+            end = len(locations) if locations else 0
+
+        # Records are appended in time order, so the cursor is found by bisecting the index
+        # and the newest messages before it are the ones just ahead of it
+        if before and end:
+            end = bisect.bisect_left(range(end), before, key=lambda i: self._read_record(locations[i])["timestamp"])
+        start = max(0, end - limit) if limit else 0
+
+        with self._condition:
+            locations = list(locations[start:end]) if end else []
+
+        messages = [self._read_record(location) for location in locations]
+        messages.sort(key=lambda x: x["timestamp"])
+
+        return messages
+
+    def get_message_page(self, sender_email, receiver_email, cursor, limit):
+        # Records are appended in time order and never moved, so the cursor is an offset into the index
+        offset = cursor or 0
+        with self._condition:
+            locations = self._index.get((sender_email, receiver_email))
+            locations = list(locations[offset:offset + limit]) if locations else []
+
+        records = [self._read_entry(location) for location in locations]
+        return records, offset + len(records) if len(records) == limit else None
+
+    def list_counterparts(self, user_email):
+        with self._condition:
+            return sorted({
+                receiver_email if sender_email == user_email else sender_email
+                for sender_email, receiver_email in self._index
+                if user_email in (sender_email, receiver_email)
+            })
+
+    def count_messages_sent(self, sender_email):
+        with self._condition:
+            return self._sent_counts.get(sender_email, 0)
+
+    def get_conversation_activity(self):
+        with self._condition:
+            # Records are appended in time order, so a direction's last record is its newest
+            last_locations = [(key, locations[-1]) for key, locations in self._index.items() if locations]
+
+        activity = {}
+        for (sender_email, receiver_email), location in last_locations:
+            last_timestamp = self._read_record(location)["timestamp"]
+            conversation_id = get_conversation_id(sender_email, receiver_email)
+            current = activity.get(conversation_id)
+            if current is None or last_timestamp > current[2]:
+                activity[conversation_id] = (sender_email, receiver_email, last_timestamp)
+
+        return activity
+
+    def export_conversation(self, user1_email, user2_email):
+        with self._condition:
+            locations = [
+                location
+                for key in ((user1_email, user2_email), (user2_email, user1_email))
+                for location in self._index.get(key, ())
+            ]
+
+        return [self._read_entry(location) for location in locations]
+
+    def close(self):
+        """
+        Flush outstanding writes, stop the sync thread and close all segments
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+
+        self._sync_thread.join()
+
+        for fd in self._segment_fds:
+            os.fsync(fd)
+            os.close(fd)
@@ -1,19 +1,16 @@
-import json
 import uuid
 import datetime
-from database.chroma_connection import get_chroma_client
+from database.chat_repository import get_conversation_id, STATUS_PENDING, STATUS_RETRACTED
+from database.storage import get_chat_repository, get_inbox_repository, get_search_index
+from database.chat_archive import restore_archived_conversation
+from database.analytics import record_message
+from chat.message_hub import get_message_hub
+from utils.tracing import traced
 
-def send_message(sender_email, receiver_email, message):
-    """
-    Store a chat message in the ChromaDB chats collection
-    Returns the message ID
-    """
-    client = get_chroma_client()
-    chats_collection = client.get_collection("chats")
-    
+def _new_message(sender_email, receiver_email, message):
     # Generate a unique ID for the message
     message_id = str(uuid.uuid4())
-    
+
     # Create message data
     timestamp = datetime.datetime.now().isoformat()
     message_data = {
@@ -22,84 +19,166 @@ def send_message(sender_email, receiver_email, message):
         "message": message,
         "timestamp": timestamp
     }
-    
+
+    return message_id, message_data
+
+@traced("db.chats.send_message")
+def send_message(sender_email, receiver_email, message):
+    """
+    Store a chat message in the configured chat storage backend
+    Returns the message ID
+    """
+    return post_message(sender_email, receiver_email, message)[0]
+
+def post_message(sender_email, receiver_email, message):
+    """
+    Store and deliver a chat message, like send_message
+    Returns a tuple of (message ID, message data)
+    """
+    message_id, message_data = _new_message(sender_email, receiver_email, message)
+
     # Store the message
-    chats_collection.add(
-        ids=[message_id],
-        documents=[json.dumps(message_data)],
-        metadatas=[{
-            "sender": sender_email,
-            "receiver": receiver_email,
-            "timestamp": timestamp
-        }]
-    )
-    
-    return message_id
+    get_chat_repository().add_message(message_id, message_data)
+
+    deliver_message(message_data)
+
+    return message_id, message_data
+
+def deliver_message(message_data):
+    """
+    Make a stored message visible: inboxes, search, analytics and open sessions
+    """
+    # Update both participants' inbox entries
+    get_inbox_repository().record_message(message_data)
+
+    # Make the message searchable by both participants
+    get_search_index().add_message(message_data)
+
+    # Count it in the analytics rollup (in memory; flushed in the background)
+    record_message(message_data)
+
+    # Notify sessions that have this conversation open
+    get_message_hub().publish(get_conversation_id(message_data["sender"], message_data["receiver"]), message_data)
+
+@traced("db.chats.send_pending_message")
+def send_pending_message(sender_email, receiver_email, message):
+    """
+    Store a chat message that still has to be moderated
+    Only the sender sees it until release_message or retract_message is called
+    Returns a tuple of (message ID, message data)
+    """
+    message_id, message_data = _new_message(sender_email, receiver_email, message)
+    message_data["status"] = STATUS_PENDING
+
+    get_chat_repository().add_message(message_id, message_data)
+
+    # Show the pending message in the sender's other open sessions
+    get_message_hub().publish(get_conversation_id(sender_email, receiver_email), message_data)
+
+    return message_id, message_data
+
+@traced("db.chats.release_message")
+def release_message(message_id, message_data):
+    """
+    Deliver a pending message that passed moderation
+    Returns the delivered message data
+    """
+    message_data = {key: value for key, value in message_data.items() if key != "status"}
+
+    get_chat_repository().replace_message(message_id, message_data)
+    deliver_message(message_data)
 
+    return message_data
+
+@traced("db.chats.retract_message")
+def retract_message(message_id, message_data):
+    """
+    Mark a pending message that failed moderation as retracted; it is never delivered
+    Returns the retracted message data
+    """
+    message_data = dict(message_data, status=STATUS_RETRACTED)
+
+    get_chat_repository().replace_message(message_id, message_data)
+
+    # Let the sender's open sessions show that the message was removed
+    get_message_hub().publish(get_conversation_id(message_data["sender"], message_data["receiver"]), message_data)
+
+    return message_data
+
+def is_visible_to(message_data, user_email):
+    """
+    Return whether a user may see a message
+    Messages in moderation (pending or retracted) are only shown to their sender
+    """
+    return not message_data.get("status") or message_data["sender"] == user_email
+
+@traced("db.chats.get_chat_history")
 def get_chat_history(user1_email, user2_email):
     """
-    Retrieve chat history between two users from the ChromaDB chats collection
-    Returns a list of messages sorted by timestamp
-    """
-    client = get_chroma_client()
-    chats_collection = client.get_collection("chats")
-    
-    # Query for messages between the two users (in both directions)
-    results1 = chats_collection.query(
-        query_texts=[""],
-        where={
-            "$and": [
-                {"sender": user1_email},
-                {"receiver": user2_email}
-            ]
-        },
-        limit=100
-    )
-    
-    results2 = chats_collection.query(
-        query_texts=[""],
-        where={
-            "$and": [
-                {"sender": user2_email},
-                {"receiver": user1_email}
-            ]
-        },
-        limit=100
-    )
-    
-    # Combine and parse the messages
-    messages = []
-    
-    if results1["ids"] and len(results1["ids"][0]) > 0:
-        for i, msg_id in enumerate(results1["ids"][0]):
-            message_data = json.loads(results1["documents"][0][i])
-            messages.append(message_data)
-    
-    if results2["ids"] and len(results2["ids"][0]) > 0:
-        for i, msg_id in enumerate(results2["ids"][0]):
-            message_data = json.loads(results2["documents"][0][i])
-            messages.append(message_data)
-    
+    Retrieve chat history between two users
+    Returns a list of messages sorted by timestamp (at most 100 per direction)
+    """
+    # Bring the conversation back from the archive if it was idle long enough to be moved there
+    restore_archived_conversation(user1_email, user2_email)
+
+    chat_repository = get_chat_repository()
+
+    # Fetch the most recent messages in both directions
+    messages = chat_repository.get_messages(user1_email, user2_email, limit=100)
+    messages += chat_repository.get_messages(user2_email, user1_email, limit=100)
+
+    # user1 is the viewer; the other side's messages in moderation are hidden
+    messages = [msg for msg in messages if is_visible_to(msg, user1_email)]
+
     # Sort messages by timestamp
     messages.sort(key=lambda x: x["timestamp"])
-    
+
+    return messages
+
+@traced("db.chats.get_recent_messages")
+def get_recent_messages(user1_email, user2_email, limit=20):
+    """
+    Retrieve the latest messages between two users that user1 may see, without restoring archives
+    Returns up to `limit` messages per direction sorted by timestamp
+    """
+    chat_repository = get_chat_repository()
+
+    messages = chat_repository.get_messages(user1_email, user2_email, limit=limit)
+    messages += chat_repository.get_messages(user2_email, user1_email, limit=limit)
+    messages = [msg for msg in messages if is_visible_to(msg, user1_email)]
+    messages.sort(key=lambda x: x["timestamp"])
+
     return messages
 
+@traced("db.chats.get_chat_history_page")
+def get_chat_history_page(user1_email, user2_email, before=None, limit=30):
+    """
+    Retrieve one page of chat history between two users
+    Only messages with a timestamp older than `before` are considered (all if None)
+    Returns a tuple of (up to `limit` most recent messages sorted by timestamp, has_older)
+    """
+    # Bring the conversation back from the archive if it was idle long enough to be moved there
+    restore_archived_conversation(user1_email, user2_email)
+
+    chat_repository = get_chat_repository()
+
+    # One message more than the page from each direction tells whether there are older ones
+    sent = chat_repository.get_messages(user1_email, user2_email, limit=limit + 1, before=before)
+    received = chat_repository.get_messages(user2_email, user1_email, limit=limit + 1, before=before)
+
+    # Keep only messages user1, the viewer, may see
+    messages = [msg for msg in sent + received if is_visible_to(msg, user1_email)]
+
+    # Sort messages by timestamp and cut the newest page; a full direction may have hidden older messages behind it
+    messages.sort(key=lambda x: x["timestamp"])
+    has_older = len(messages) > limit or len(sent) > limit or len(received) > limit
+
+    return messages[-limit:], has_older
+
+@traced("db.chats.count_user_messages")
 def count_user_messages(user_email):
     """
     Count the number of messages sent by a user
     Returns the message count
     """
-    client = get_chroma_client()
-    chats_collection = client.get_collection("chats")
-    
-    # Query for messages sent by the user
-    results = chats_collection.query(
-        query_texts=[""],
-        where={"sender": user_email}
-    )
-    
-    if results["ids"] and len(results["ids"][0]) > 0:
-        return len(results["ids"][0])
-    
-    return 0
+    return get_chat_repository().count_messages_sent(user_email)
@@ -0,0 +1,627 @@
+import datetime
+import threading
+from itertools import islice
+from database.chroma_connection import get_chat_shard, get_chat_write_shards, get_chat_shards
+from database.document_codec import encode_message, decode_message
+
+# Sender recorded on conversation archive stubs, which is never a real email
+ARCHIVE_STUB_SENDER = "__archive__"
+
+# Moderation status of a message stored before it was moderated (see moderation/moderation_queue.py);
+# both are shown to the sender only, and a message without a status is delivered
+STATUS_PENDING = "pending"
+STATUS_RETRACTED = "retracted"
+
+# Rows per Chroma call when moving whole conversations in or out
+_CHROMA_BATCH_SIZE = 1000
+
+# Smallest gap in seconds between two message timestamps; a page window this narrow is read whole
+_TS_RESOLUTION = 1e-6
+
+# A history page is cut from a window of at most this many times its size
+_WINDOW_FACTOR = 4
+
+def timestamp_value(timestamp):
+    """
+    Convert a message timestamp to the seconds stored in the numeric ts metadata field
+    Naive timestamps are read as UTC, so the value never steps back over a DST change
+    """
+    moment = datetime.datetime.fromisoformat(timestamp)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.timestamp()
+
+def get_conversation_id(user1_email, user2_email):
+    """
+    Build a stable ID for the conversation between two users
+    The ID is the same regardless of which user is passed first
+    """
+    return "|".join(sorted([user1_email, user2_email]))
+
+class ChatRepository:
+    """
+    Storage interface for chat messages
+    Message data is a dictionary with sender, receiver, message and timestamp keys
+    """
+
+    def add_message(self, message_id, message_data):
+        """
+        Store a single message
+        """
+        raise NotImplementedError
+
+    def add_messages(self, records):
+        """
+        Store a batch of (message_id, message_data) records
+        Backends override this when a batch is cheaper than one write per message
+        """
+        for message_id, message_data in records:
+            self.add_message(message_id, message_data)
+
+    def get_messages(self, sender_email, receiver_email, limit=None, before=None):
+        """
+        Retrieve messages sent from one user to another
+        Only messages with a timestamp older than `before` are considered (all if None)
+        Returns up to `limit` most recent messages (all if None) sorted by timestamp
+        """
+        raise NotImplementedError
+
+    def get_message_page(self, sender_email, receiver_email, cursor, limit):
+        """
+        Retrieve a page of up to `limit` messages sent from one user to another, in timestamp order
+        (more only when they all share one timestamp)
+        `cursor` is None for the first page and then the cursor returned with the previous page
+        Returns a tuple of (list of (message_id, message_data) tuples, cursor of the next page or
+        None after the last page); a page may be shorter than `limit`, even empty, before the last
+        """
+        raise NotImplementedError
+
+    def list_counterparts(self, user_email):
+        """
+        Find everyone a user has exchanged messages with, archived conversations included
+        Returns a sorted list of emails
+        """
+        raise NotImplementedError
+
+    def count_messages_sent(self, sender_email):
+        """
+        Count the messages sent by a user
+        """
+        raise NotImplementedError
+
+    def supports_replace(self):
+        """
+        Check whether stored messages can be overwritten with replace_message
+        """
+        return False
+
+    def replace_message(self, message_id, message_data):
+        """
+        Overwrite a stored message, e.g. to change its moderation status
+        Does nothing if the message is not stored
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support updating messages")
+
+    def list_messages_by_status(self, status):
+        """
+        Retrieve every stored message with a moderation status
+        Returns a list of (message_id, message_data) tuples
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support listing messages by status")
+
+    def supports_archival(self):
+        """
+        Check whether conversations can be moved out of the store with archive_conversation
+        """
+        return False
+
+    def get_conversation_activity(self):
+        """
+        Scan the store for the last message time of every conversation
+        Returns a dictionary of conversation ID to (user1_email, user2_email, last_timestamp)
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support archival")
+
+    def export_conversation(self, user1_email, user2_email):
+        """
+        Retrieve every stored message between two users, in both directions
+        Returns a list of (message_id, message_data) tuples
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support archival")
+
+    def archive_conversation(self, user1_email, user2_email, message_ids, location):
+        """
+        Replace archived messages with a stub recording where the archive keeps them
+        `location` is a flat dictionary of scalar values
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support archival")
+
+    def get_archive_stub(self, user1_email, user2_email):
+        """
+        Return the archive location recorded for a conversation, or None if it has none
+        """
+        return None
+
+    def list_archive_stubs(self):
+        """
+        Find every archived conversation
+        Returns a dictionary of conversation ID to archive location
+        """
+        return {}
+
+    def restore_conversation(self, user1_email, user2_email, records):
+        """
+        Store archived (message_id, message_data) records again and drop the stub
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support archival")
+
+    def close(self):
+        """
+        Release any resources held by the repository
+        """
+
+class ChromaChatRepository(ChatRepository):
+    """
+    Chat repository backed by the ChromaDB chat shard collections
+    A conversation's messages all live in one shard, so per-conversation calls touch only that shard
+    """
+
+    def _metadata(self, message_data):
+        metadata = {
+            "sender": message_data["sender"],
+            "receiver": message_data["receiver"],
+            "timestamp": message_data["timestamp"],
+            # Chroma filters numbers by range but not strings, so pages are read by this value
+            "ts": timestamp_value(message_data["timestamp"])
+        }
+        # Only messages in moderation carry a status, so they can be found without a scan
+        if message_data.get("status"):
+            metadata["status"] = message_data["status"]
+        return metadata
+
+    def _add_messages(self, collection, records):
+        collection.add(
+            ids=[message_id for message_id, _ in records],
+            documents=[encode_message(message_data) for _, message_data in records],
+            metadatas=[self._metadata(message_data) for _, message_data in records]
+        )
+
+    def add_message(self, message_id, message_data):
+        conversation_id = get_conversation_id(message_data["sender"], message_data["receiver"])
+        for collection in get_chat_write_shards(conversation_id):
+            self._add_messages(collection, [(message_id, message_data)])
+
+    def add_messages(self, records):
+        # Group the batch by shard so each shard embeds its part in one call
+        shards = {}
+        for message_id, message_data in records:
+            conversation_id = get_conversation_id(message_data["sender"], message_data["receiver"])
+            for collection in get_chat_write_shards(conversation_id):
+                shards.setdefault(collection.name, (collection, []))[1].append((message_id, message_data))
+
+        for collection, shard_records in shards.values():
+            for start in range(0, len(shard_records), _CHROMA_BATCH_SIZE):
+                self._add_messages(collection, shard_records[start:start + _CHROMA_BATCH_SIZE])
+
+    def get_messages(self, sender_email, receiver_email, limit=None, before=None):
+        collection = get_chat_shard(get_conversation_id(sender_email, receiver_email))
+        older = [{"sender": sender_email}, {"receiver": receiver_email}]
+        if before:
+            older.append({"ts": {"$lt": timestamp_value(before)}})
+
+        # Chroma has no ordering on metadata, so the messages are sorted here; when more than
+        # `limit` are older than the cursor, only a window of the newest of them is read
+        results = collection.get(
+            where={"$and": older},
+            limit=limit + 1 if limit else None,
+            include=["documents", "metadatas"]
+        )
+        if limit and len(results["ids"]) > limit:
+            end = timestamp_value(before or datetime.datetime.now().isoformat())
+            results = self._newest_window(collection, older, results["metadatas"], end, limit)
+
+        messages = [decode_message(document, sender_email, receiver_email) for document in results["documents"]]
+        messages.sort(key=lambda x: x["timestamp"])
+
+        return messages[-limit:] if limit else messages
+
+    def _newest_window(self, collection, older, sample, end, limit):
+        # Search on ts for a window ending at the cursor (or now) that holds between `limit` and
+        # _WINDOW_FACTOR times `limit` messages. Every call filtering on the direction costs about
+        # as much as the direction is long, so the first guess matters: twice the time the sample
+        # (mostly the first messages stored) spans. A window from the sample's oldest message holds
+        # all of it, so more than `limit`; one from the cursor holds nothing
+        sample_ts = [metadata["ts"] for metadata in sample]
+        low = min(sample_ts)
+        high = max([end] + [ts + _TS_RESOLUTION for ts in sample_ts])
+        start = max(low, high - 2 * (max(sample_ts) - low))
+
+        while high - low > _TS_RESOLUTION:
+            results = collection.get(
+                where={"$and": older + [{"ts": {"$gte": start}}]},
+                limit=_WINDOW_FACTOR * limit + 1,
+                include=["documents"]
+            )
+            count = len(results["ids"])
+            if count < limit:
+                # Too few: widen quickly, since the newest messages may be long before the cursor
+                high = start
+                start = max(low, high - (end - high) * 4) if end > high else (low + high) / 2
+            elif count > _WINDOW_FACTOR * limit:
+                low = start
+                start = (low + high) / 2
+            else:
+                return results
+
+        return collection.get(where={"$and": older + [{"ts": {"$gte": low}}]}, include=["documents"])
+
+    def _first_ts(self, collection, direction, limit):
+        # Ask for anything older than the oldest message seen so far until nothing is left
+        where = {"$and": direction}
+        first = None
+        while True:
+            results = collection.get(where=where, limit=limit, include=["metadatas"])
+            if not results["ids"]:
+                return first
+            # Messages stored before migration 0002 have no ts and would be skipped by every page
+            if any("ts" not in metadata for metadata in results["metadatas"]):
+                raise RuntimeError("Chat messages have no ts field; run python -m database.schema_migrations")
+            first = min(metadata["ts"] for metadata in results["metadatas"])
+            where = {"$and": direction + [{"ts": {"$lt": first}}]}
+
+    def get_message_page(self, sender_email, receiver_email, cursor, limit):
+        # Chroma cannot sort, and restores and reshards change the order rows come back in, so a
+        # page is a window of ts values holding at most `limit` messages, sorted here. The cursor
+        # is where the next window starts and how wide it should be, given how full this one was
+        collection = get_chat_shard(get_conversation_id(sender_email, receiver_email))
+        direction = [{"sender": sender_email}, {"receiver": receiver_email}]
+
+        if cursor is None:
+            start, span = self._first_ts(collection, direction, limit), None
+            if start is None:
+                return [], None
+        else:
+            start, span = cursor
+
+        # A window reaching past the present is as good as open-ended, and an open-ended one that fits ends the export
+        now = timestamp_value(datetime.datetime.now().isoformat())
+        end = start + span if span and start + span <= now else None
+
+        while True:
+            where = direction + [{"ts": {"$gte": start}}]
+            if end is not None:
+                where.append({"ts": {"$lt": end}})
+            # Messages sharing one timestamp cannot be split, so such a window is read however full it is
+            whole = end is not None and end - start <= _TS_RESOLUTION
+            results = collection.get(
+                where={"$and": where},
+                limit=None if whole else limit + 1,
+                include=["documents", "metadatas"]
+            )
+            if whole or len(results["ids"]) <= limit:
+                break
+
+            # Too full: halve the window, or close an open-ended one at the page's last timestamp
+            if end is None:
+                end = sorted(metadata["ts"] for metadata in results["metadatas"])[limit - 1]
+            else:
+                end = start + (end - start) / 2
+            end = max(end, start + _TS_RESOLUTION)
+
+        rows = sorted(
+            zip(results["metadatas"], results["ids"], results["documents"]),
+            key=lambda row: (row[0]["ts"], row[1])
+        )
+        page = [(message_id, decode_message(document, sender_email, receiver_email)) for _, message_id, document in rows]
+
+        if end is None:
+            return page, None
+        # Widen the next window while pages come back less than half full
+        span = end - start
+        return page, (end, span * 2 if len(page) < limit / 2 else span)
+
+    def list_counterparts(self, user_email):
+        counterparts = set()
+
+        for collection in get_chat_shards():
+            offset = 0
+
+            # Page through the user's message metadata, keeping only the other participant
+            while True:
+                results = collection.get(
+                    where={"$or": [{"sender": user_email}, {"receiver": user_email}]},
+                    limit=_CHROMA_BATCH_SIZE * 10,
+                    offset=offset,
+                    include=["metadatas"]
+                )
+                if not results["ids"]:
+                    break
+                offset += len(results["ids"])
+
+                for metadata in results["metadatas"]:
+                    counterparts.add(metadata["receiver"] if metadata["sender"] == user_email else metadata["sender"])
+
+            # Archive stubs name their conversation in the document
+            stubs = collection.get(
+                where={"sender": ARCHIVE_STUB_SENDER},
+                where_document={"$contains": user_email},
+                include=["documents"]
+            )
+            for conversation_id in stubs["documents"]:
+                participants = conversation_id.split("|")
+                if user_email in participants:
+                    counterparts.update(email for email in participants if email != user_email)
+
+        return sorted(counterparts)
+
+    def count_messages_sent(self, sender_email):
+        # A sender's conversations are spread over every shard
+        return sum(
+            len(collection.get(where={"sender": sender_email}, include=[])["ids"])
+            for collection in get_chat_shards()
+        )
+
+    def supports_replace(self):
+        return True
+
+    def supports_archival(self):
+        return True
+
+    def replace_message(self, message_id, message_data):
+        conversation_id = get_conversation_id(message_data["sender"], message_data["receiver"])
+
+        for collection in get_chat_write_shards(conversation_id):
+            # Chroma merges metadata on update; a None status removes the key
+            collection.update(
+                ids=[message_id],
+                documents=[encode_message(message_data)],
+                metadatas=[dict(self._metadata(message_data), status=message_data.get("status"))]
+            )
+
+    def list_messages_by_status(self, status):
+        records = []
+        for collection in get_chat_shards():
+            results = collection.get(where={"status": status}, include=["documents", "metadatas"])
+            records.extend(
+                (message_id, decode_message(document, metadata["sender"], metadata["receiver"]))
+                for message_id, document, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+            )
+        return records
+
+    def get_conversation_activity(self):
+        activity = {}
+
+        for collection in get_chat_shards():
+            offset = 0
+
+            # Page through the metadata only; documents are not needed
+            while True:
+                results = collection.get(limit=_CHROMA_BATCH_SIZE * 10, offset=offset, include=["metadatas"])
+                if not results["ids"]:
+                    break
+                offset += len(results["ids"])
+
+                for metadata in results["metadatas"]:
+                    if metadata["sender"] == ARCHIVE_STUB_SENDER:
+                        continue
+                    conversation_id = get_conversation_id(metadata["sender"], metadata["receiver"])
+                    current = activity.get(conversation_id)
+                    if current is None or metadata["timestamp"] > current[2]:
+                        activity[conversation_id] = (metadata["sender"], metadata["receiver"], metadata["timestamp"])
+
+        return activity
+
+    def export_conversation(self, user1_email, user2_email):
+        results = get_chat_shard(get_conversation_id(user1_email, user2_email)).get(
+            where={
+                "$or": [
+                    {"$and": [{"sender": user1_email}, {"receiver": user2_email}]},
+                    {"$and": [{"sender": user2_email}, {"receiver": user1_email}]}
+                ]
+            },
+            include=["documents", "metadatas"]
+        )
+
+        return [
+            (message_id, decode_message(document, metadata["sender"], metadata["receiver"]))
+            for message_id, document, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+        ]
+
+    def archive_conversation(self, user1_email, user2_email, message_ids, location):
+        conversation_id = get_conversation_id(user1_email, user2_email)
+
+        for collection in get_chat_write_shards(conversation_id):
+            # The stub is written before the messages are deleted, so a crash in between
+            # leaves duplicates (ignored on restore) rather than unreachable history
+            collection.upsert(
+                ids=[f"archive:{conversation_id}"],
+                documents=[conversation_id],
+                metadatas=[dict(location, sender=ARCHIVE_STUB_SENDER, receiver=conversation_id)]
+            )
+
+            for start in range(0, len(message_ids), _CHROMA_BATCH_SIZE):
+                collection.delete(ids=message_ids[start:start + _CHROMA_BATCH_SIZE])
+
+    def get_archive_stub(self, user1_email, user2_email):
+        conversation_id = get_conversation_id(user1_email, user2_email)
+        results = get_chat_shard(conversation_id).get(ids=[f"archive:{conversation_id}"], include=["metadatas"])
+
+        if not results["ids"]:
+            return None
+
+        location = dict(results["metadatas"][0])
+        del location["sender"], location["receiver"]
+        return location
+
+    def list_archive_stubs(self):
+        stubs = {}
+        for collection in get_chat_shards():
+            results = collection.get(where={"sender": ARCHIVE_STUB_SENDER}, include=["metadatas"])
+            for metadata in results["metadatas"]:
+                location = dict(metadata)
+                # Stubs record their conversation ID as the receiver
+                conversation_id = location.pop("receiver")
+                del location["sender"]
+                stubs[conversation_id] = location
+        return stubs
+
+    def restore_conversation(self, user1_email, user2_email, records):
+        conversation_id = get_conversation_id(user1_email, user2_email)
+
+        for collection in get_chat_write_shards(conversation_id):
+            for start in range(0, len(records), _CHROMA_BATCH_SIZE):
+                self._add_messages(collection, records[start:start + _CHROMA_BATCH_SIZE])
+
+            collection.delete(ids=[f"archive:{conversation_id}"])
+
+class InMemoryChatRepository(ChatRepository):
+    """
+    Chat repository held in process memory, with the same semantics as the Chroma one
+    Encoded documents are kept by message ID per (sender, receiver) direction in insertion order
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._message_ids = set()
+        self._directions = {}
+        self._sent_counts = {}
+        self._archive_stubs = {}
+
+    def add_message(self, message_id, message_data):
+        with self._lock:
+            # Chroma ignores adds for existing IDs, and so does this repository
+            if message_id in self._message_ids:
+                return
+            self._message_ids.add(message_id)
+
+            key = (message_data["sender"], message_data["receiver"])
+            self._directions.setdefault(key, {})[message_id] = encode_message(message_data)
+            self._sent_counts[message_data["sender"]] = self._sent_counts.get(message_data["sender"], 0) + 1
+
+    def get_messages(self, sender_email, receiver_email, limit=None, before=None):
+        with self._lock:
+            documents = list(self._directions.get((sender_email, receiver_email), {}).values())
+
+        messages = [decode_message(document, sender_email, receiver_email) for document in documents]
+        messages = [msg for msg in messages if not before or msg["timestamp"] < before]
+        messages.sort(key=lambda x: x["timestamp"])
+
+        return messages[-limit:] if limit else messages
+
+    def get_message_page(self, sender_email, receiver_email, cursor, limit):
+        # Directions are kept in timestamp order (see restore_conversation), so the cursor is an offset
+        offset = cursor or 0
+        with self._lock:
+            documents = self._directions.get((sender_email, receiver_email), {})
+            page = list(islice(documents.items(), offset, offset + limit))
+
+        records = [
+            (message_id, decode_message(document, sender_email, receiver_email))
+            for message_id, document in page
+        ]
+        return records, offset + len(page) if len(page) == limit else None
+
+    def list_counterparts(self, user_email):
+        with self._lock:
+            counterparts = {
+                receiver_email if sender_email == user_email else sender_email
+                for (sender_email, receiver_email), documents in self._directions.items()
+                if documents and user_email in (sender_email, receiver_email)
+            }
+            for conversation_id in self._archive_stubs:
+                participants = conversation_id.split("|")
+                if user_email in participants:
+                    counterparts.update(email for email in participants if email != user_email)
+
+        return sorted(counterparts)
+
+    def count_messages_sent(self, sender_email):
+        with self._lock:
+            return self._sent_counts.get(sender_email, 0)
+
+    def supports_replace(self):
+        return True
+
+    def supports_archival(self):
+        return True
+
+    def replace_message(self, message_id, message_data):
+        with self._lock:
+            documents = self._directions.get((message_data["sender"], message_data["receiver"]))
+            if documents and message_id in documents:
+                documents[message_id] = encode_message(message_data)
+
+    def list_messages_by_status(self, status):
+        with self._lock:
+            directions = [(key, list(documents.items())) for key, documents in self._directions.items()]
+
+        records = []
+        for (sender_email, receiver_email), documents in directions:
+            for message_id, document in documents:
+                message_data = decode_message(document, sender_email, receiver_email)
+                if message_data.get("status") == status:
+                    records.append((message_id, message_data))
+        return records
+
+    def get_conversation_activity(self):
+        with self._lock:
+            directions = [(key, list(documents.values())) for key, documents in self._directions.items()]
+
+        activity = {}
+        for (sender_email, receiver_email), documents in directions:
+            if not documents:
+                continue
+            last_timestamp = max(decode_message(document, sender_email, receiver_email)["timestamp"]
+                                 for document in documents)
+            conversation_id = get_conversation_id(sender_email, receiver_email)
+            current = activity.get(conversation_id)
+            if current is None or last_timestamp > current[2]:
+                activity[conversation_id] = (sender_email, receiver_email, last_timestamp)
+
+        return activity
+
+    def export_conversation(self, user1_email, user2_email):
+        records = []
+        with self._lock:
+            for sender_email, receiver_email in ((user1_email, user2_email), (user2_email, user1_email)):
+                for message_id, document in self._directions.get((sender_email, receiver_email), {}).items():
+                    records.append((message_id, decode_message(document, sender_email, receiver_email)))
+        return records
+
+    def archive_conversation(self, user1_email, user2_email, message_ids, location):
+        with self._lock:
+            self._archive_stubs[get_conversation_id(user1_email, user2_email)] = dict(location)
+
+            for message_id in message_ids:
+                for key in ((user1_email, user2_email), (user2_email, user1_email)):
+                    documents = self._directions.get(key)
+                    if documents and message_id in documents:
+                        del documents[message_id]
+                        self._message_ids.discard(message_id)
+                        self._sent_counts[key[0]] -= 1
+
+    def get_archive_stub(self, user1_email, user2_email):
+        with self._lock:
+            location = self._archive_stubs.get(get_conversation_id(user1_email, user2_email))
+            return dict(location) if location else None
+
+    def list_archive_stubs(self):
+        with self._lock:
+            return {conversation_id: dict(location) for conversation_id, location in self._archive_stubs.items()}
+
+    def restore_conversation(self, user1_email, user2_email, records):
+        for message_id, message_data in records:
+            self.add_message(message_id, message_data)
+
+        with self._lock:
+            self._archive_stubs.pop(get_conversation_id(user1_email, user2_email), None)
+
+            # Restored messages are older than the ones sent since archiving, so the directions
+            # are put back in timestamp order for get_message_page
+            for sender_email, receiver_email in ((user1_email, user2_email), (user2_email, user1_email)):
+                documents = self._directions.get((sender_email, receiver_email))
+                if documents:
+                    self._directions[(sender_email, receiver_email)] = dict(sorted(
+                        documents.items(),
+                        key=lambda item: (decode_message(item[1], sender_email, receiver_email)["timestamp"], item[0])
+                    ))
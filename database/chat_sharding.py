@@ -0,0 +1,153 @@
+"""
+Online resharding and statistics for the Chroma chat shards
+
+Resharding runs while the app keeps serving:
+
+1. The layout gets a target shard count. Within CHAT_LAYOUT_REFRESH_SECONDS
+   every process writes new messages to both the current and the target shards.
+2. Every message (and archive stub) already in the current shards is copied to
+   its target shard, with its stored embedding, in batches. Copies are upserts,
+   so messages written twice by step 1 are harmless and an interrupted reshard
+   can simply be run again.
+3. The layout switches to the target count, so reads move to the new shards.
+   After another refresh interval the old shards are no longer read and can
+   be dropped.
+
+Run it from the repository root:
+
+    python -m database.chat_sharding --stats
+    python -m database.chat_sharding --shards 8 --drop-old
+
+Do not archive conversations while a reshard is running.
+"""
+import json
+import time
+import argparse
+from database.chroma_connection import (
+    get_chroma_client, get_collection, get_chat_layout, set_chat_layout, get_chat_shards,
+    chat_shard_name, chat_shard_index
+)
+from database.chat_repository import ARCHIVE_STUB_SENDER, get_conversation_id
+from utils.config import CHAT_LAYOUT_REFRESH_SECONDS
+
+# Rows copied per Chroma call during a backfill
+BACKFILL_BATCH_SIZE = 1000
+
+def _row_conversation_id(metadata):
+    # An archive stub records its conversation ID as the receiver
+    if metadata["sender"] == ARCHIVE_STUB_SENDER:
+        return metadata["receiver"]
+    return get_conversation_id(metadata["sender"], metadata["receiver"])
+
+def backfill_shards(source_count, target_count, batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Copy every row of the `source_count` shards into its shard among `target_count` shards
+    Returns the number of rows copied
+    """
+    targets = [get_collection(chat_shard_name(index, target_count)) for index in range(target_count)]
+    copied = 0
+
+    for source in get_chat_shards(source_count):
+        offset = 0
+        while True:
+            results = source.get(limit=batch_size, offset=offset, include=["documents", "metadatas", "embeddings"])
+            if not results["ids"]:
+                break
+            offset += len(results["ids"])
+
+            batches = {}
+            for row in zip(results["ids"], results["documents"], results["metadatas"], results["embeddings"]):
+                index = chat_shard_index(_row_conversation_id(row[2]), target_count)
+                batches.setdefault(index, []).append(row)
+
+            for index, rows in batches.items():
+                targets[index].upsert(
+                    ids=[row[0] for row in rows],
+                    documents=[row[1] for row in rows],
+                    metadatas=[row[2] for row in rows],
+                    embeddings=[row[3] for row in rows]
+                )
+            copied += len(results["ids"])
+
+    return copied
+
+def drop_shards(shard_count):
+    """
+    Drop the collections of a layout that is no longer in use
+    The original chats collection is emptied rather than dropped
+    """
+    client = get_chroma_client()
+
+    for collection in get_chat_shards(shard_count):
+        if collection.name != "chats":
+            client.delete_collection(collection.name)
+            continue
+
+        while True:
+            ids = collection.get(limit=BACKFILL_BATCH_SIZE, include=[])["ids"]
+            if not ids:
+                break
+            collection.delete(ids=ids)
+
+def reshard(target_count, drop_old=False, wait_seconds=CHAT_LAYOUT_REFRESH_SECONDS):
+    """
+    Move the chat messages to `target_count` shards while the app keeps running
+    Resumes an interrupted reshard to the same count
+    Returns a dictionary with the old and new shard counts and the rows copied
+    """
+    layout = get_chat_layout(refresh=True)
+    source_count = layout["shards"]
+
+    if layout["target"] and layout["target"] != target_count:
+        raise ValueError(f"A reshard to {layout['target']} shards is already running; finish it first")
+    if source_count == target_count:
+        return {"from": source_count, "to": target_count, "copied": 0}
+
+    # Dual-write, and give every process time to notice before the existing rows are copied
+    set_chat_layout(source_count, target_count)
+    time.sleep(wait_seconds)
+
+    copied = backfill_shards(source_count, target_count)
+
+    # Move the reads; processes still on the old layout keep dual-writing until they refresh
+    set_chat_layout(target_count)
+
+    if drop_old:
+        time.sleep(wait_seconds)
+        drop_shards(source_count)
+
+    return {"from": source_count, "to": target_count, "copied": copied}
+
+def chat_shard_stats():
+    """
+    Count the rows of every chat shard in the current (and, mid-reshard, target) layout
+    Returns a dictionary with the layout, per-shard counts and the skew of the largest
+    shard over the mean
+    """
+    layout = get_chat_layout(refresh=True)
+    stats = {"layout": layout}
+
+    for key in ("shards", "target"):
+        if not layout[key]:
+            continue
+        counts = {collection.name: collection.count() for collection in get_chat_shards(layout[key])}
+        mean = sum(counts.values()) / len(counts)
+        stats[f"{key}_counts"] = counts
+        stats[f"{key}_skew"] = round(max(counts.values()) / mean, 3) if mean else 0.0
+
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Reshard the Chroma chat collections or show shard statistics")
+    parser.add_argument("--shards", type=int, help="reshard the chat messages to this many shards")
+    parser.add_argument("--drop-old", action="store_true", help="drop the old shards after resharding")
+    parser.add_argument("--stats", action="store_true", help="print per-shard row counts")
+    args = parser.parse_args()
+
+    if args.shards:
+        print(json.dumps(reshard(args.shards, drop_old=args.drop_old)))
+    if args.stats or not args.shards:
+        print(json.dumps(chat_shard_stats(), indent=2))
+
+if __name__ == "__main__":
+    main()
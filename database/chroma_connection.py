@@ -1,48 +1,254 @@
 import os
+import time
+import zlib
+import threading
 import chromadb
 from chromadb.config import Settings
+from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
+from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+from utils.tracing import traced
+from database.schema import COLLECTIONS, create_collection, apply_index_parameters
+from utils.config import (
+    CHROMA_MODE, CHROMA_HOST, CHROMA_PORT, CHROMA_SSL, CHROMA_AUTH_TOKEN,
+    CHROMA_HTTP_RETRIES, CHROMA_HTTP_MAX_CONNECTIONS,
+    CHAT_SHARDS, CHAT_LAYOUT_REFRESH_SECONDS
+)
 
+# One client per process and target; Chroma clients are safe to share between threads
+_clients = {}
+_clients_lock = threading.Lock()
+
+class SharedEmbeddingFunction(DefaultEmbeddingFunction):
+    """
+    Chroma's default embedding model, loaded once per process
+    DefaultEmbeddingFunction loads the ONNX model again for every call; this keeps
+    one loaded model that every collection of the process shares
+    """
+    _model = None
+    _model_lock = threading.Lock()
+
+    def __call__(self, input):
+        return self.load_model()(input)
+
+    @classmethod
+    def load_model(cls):
+        """
+        Return the process's model, creating it on first use
+        """
+        if cls._model is None:
+            with cls._model_lock:
+                if cls._model is None:
+                    # The instance opens its ONNX session and tokenizer on first use and keeps them
+                    cls._model = ONNXMiniLM_L6_V2()
+        return cls._model
+
+# Registered under Chroma's "default" name, so collections created before keep working
+EMBEDDING_FUNCTION = SharedEmbeddingFunction()
+
+@traced("db.chroma.get_chroma_client")
 def get_chroma_client():
     """
-    Initialize and return a ChromaDB client using the new configuration approach
+    Initialize and return a ChromaDB client for the configured CHROMA_MODE
+    "persistent" opens the local database directory in this process, "http" connects
+    to a shared Chroma server. The client is created (and its collections ensured)
+    once per process, then reused
     """
-    # Get the persistence directory from environment variables or use a default
-    persist_directory = os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_db")
-    
-    # Create the client with persistence using the new configuration approach
-    client = chromadb.PersistentClient(path=persist_directory)
-    
-    # Ensure collections exist
-    _ensure_collections(client)
-    
+    if CHROMA_MODE == "http":
+        target = ("http", CHROMA_HOST, CHROMA_PORT)
+    else:
+        # Get the persistence directory from environment variables or use a default
+        target = ("persistent", os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_db"))
+
+    client = _clients.get(target)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(target)
+            if client is None:
+                client = _create_http_client() if target[0] == "http" else chromadb.PersistentClient(path=target[1])
+
+                # Ensure collections exist
+                _ensure_collections(client)
+                _clients[target] = client
+
+    return client
+
+def _create_http_client():
+    """
+    Connect to the Chroma server at CHROMA_HOST:CHROMA_PORT
+    Requests share a keep-alive connection pool of CHROMA_HTTP_MAX_CONNECTIONS. Connecting
+    is retried CHROMA_HTTP_RETRIES times when the client is created; Chroma has no setting
+    for a request timeout or request retries, so a request waits for the server's answer
+    and is sent once
+    """
+    headers = {"Authorization": f"Bearer {CHROMA_AUTH_TOKEN}"} if CHROMA_AUTH_TOKEN else None
+    settings = Settings(
+        chroma_http_max_connections=CHROMA_HTTP_MAX_CONNECTIONS,
+        chroma_http_max_keepalive_connections=CHROMA_HTTP_MAX_CONNECTIONS
+    )
+
+    # The client checks the server on creation, so a server that is still starting is waited for
+    for attempt in range(CHROMA_HTTP_RETRIES + 1):
+        try:
+            client = chromadb.HttpClient(host=CHROMA_HOST, port=CHROMA_PORT, ssl=CHROMA_SSL, headers=headers, settings=settings)
+            break
+        except Exception:
+            if attempt == CHROMA_HTTP_RETRIES:
+                raise
+            time.sleep(0.5 * 2 ** attempt)
+
     return client
 
+def get_collection(name):
+    """
+    Return a collection of the process's client that embeds with the shared model
+    """
+    return _open_collection(get_chroma_client(), name)
+
+def _open_collection(client, name):
+    return client.get_collection(name, embedding_function=EMBEDDING_FUNCTION)
+
 def _ensure_collections(client):
     """
-    Ensure that all required collections exist in ChromaDB
+    Ensure that all collections of database/schema.py exist in ChromaDB
+    Missing collections are created with their index parameters; existing ones get
+    the parameters Chroma can change after creation
     """
     # Get existing collections
-    existing_collections = [col.name for col in client.list_collections()]
+    existing_collections = {col.name: col for col in client.list_collections()}
     
-    # Create users collection if it doesn't exist
-    if "users" not in existing_collections:
-        client.create_collection(
-            name="users",
-            metadata={"hnsw:space": "cosine"}
-        )
+    # Tune the collections that exist, chat shards included
+    for collection in existing_collections.values():
+        apply_index_parameters(collection)
     
-    # Create chats collection if it doesn't exist
-    if "chats" not in existing_collections:
-        client.create_collection(
-            name="chats",
-            metadata={"hnsw:space": "cosine"}
-        )
+    # Create the missing ones
+    for name in COLLECTIONS:
+        if name not in existing_collections:
+            create_collection(client, name, EMBEDDING_FUNCTION)
     
-    # Create toxic_reports collection if it doesn't exist
-    if "toxic_reports" not in existing_collections:
-        client.create_collection(
-            name="toxic_reports",
-            metadata={"hnsw:space": "cosine"}
-        )
+    # Create the collections of the recorded chat shard layout
+    _ensure_chat_layout(client)
     
     return client
+
+# Chat shards
+#
+# Chat messages are spread over shard collections by a hash of the conversation ID, so
+# a conversation lives in exactly one shard. The layout (the number of shards) is
+# stored in the database, so every process and replica routes the same way. While a
+# reshard is running the layout also has a target shard count: writes go to both the
+# current and the target shards, reads only to the current ones.
+
+CHAT_LAYOUT_COLLECTION = "chat_layout"
+_LAYOUT_ID = "layout"
+
+# (client, layout, expiry) of the layout this process last read
+_chat_layout_cache = (None, None, 0.0)
+_chat_layout_lock = threading.Lock()
+
+def chat_shard_name(index, shard_count):
+    """
+    Name the collection of one chat shard; a single shard is the original chats collection
+    """
+    if shard_count == 1:
+        return "chats"
+    return f"chats_{shard_count}_{index}"
+
+def chat_shard_index(conversation_id, shard_count):
+    """
+    Pick the shard of a conversation for a shard count
+    """
+    return zlib.crc32(conversation_id.encode("utf-8")) % shard_count
+
+def _ensure_chat_layout(client):
+    """
+    Record the initial layout and create the collections of the recorded layout
+    A new database gets CHAT_SHARDS shards; one that already has messages keeps the
+    single chats collection they are in, until it is resharded
+    """
+    layout_collection = _open_collection(client, CHAT_LAYOUT_COLLECTION)
+    results = layout_collection.get(ids=[_LAYOUT_ID], include=["metadatas"])
+
+    if results["ids"]:
+        layout = results["metadatas"][0]
+    else:
+        shard_count = 1 if _open_collection(client, "chats").count() else CHAT_SHARDS
+        layout = {"shards": shard_count, "target": 0}
+        _write_chat_layout(layout_collection, layout)
+
+    _create_chat_shards(client, layout["shards"])
+    if layout["target"]:
+        _create_chat_shards(client, layout["target"])
+
+def _create_chat_shards(client, shard_count):
+    for index in range(shard_count):
+        create_collection(client, chat_shard_name(index, shard_count), EMBEDDING_FUNCTION)
+
+def _write_chat_layout(layout_collection, layout):
+    # The layout is only ever fetched by ID, so a constant embedding is enough
+    layout_collection.upsert(
+        ids=[_LAYOUT_ID],
+        documents=[f"{layout['shards']}->{layout['target']}"],
+        embeddings=[[1.0]],
+        metadatas=[layout]
+    )
+
+def get_chat_layout(refresh=False):
+    """
+    Return the chat layout as a dictionary with shards (the shard count reads use) and
+    target (the shard count being filled by a reshard, or 0) keys
+    The layout is re-read every CHAT_LAYOUT_REFRESH_SECONDS, so every process sees a reshard
+    """
+    global _chat_layout_cache
+    client = get_chroma_client()
+
+    with _chat_layout_lock:
+        cached_client, layout, expires = _chat_layout_cache
+        if refresh or cached_client is not client or time.monotonic() >= expires:
+            results = _open_collection(client, CHAT_LAYOUT_COLLECTION).get(ids=[_LAYOUT_ID], include=["metadatas"])
+            layout = dict(results["metadatas"][0])
+            _chat_layout_cache = (client, layout, time.monotonic() + CHAT_LAYOUT_REFRESH_SECONDS)
+
+    return layout
+
+def set_chat_layout(shard_count, target=0):
+    """
+    Record a new chat layout, creating any shard collections it needs
+    """
+    client = get_chroma_client()
+    _create_chat_shards(client, shard_count)
+    if target:
+        _create_chat_shards(client, target)
+
+    _write_chat_layout(_open_collection(client, CHAT_LAYOUT_COLLECTION), {"shards": shard_count, "target": target})
+    get_chat_layout(refresh=True)
+
+def get_chat_shard(conversation_id):
+    """
+    Return the shard collection reads of a conversation go to
+    """
+    shard_count = get_chat_layout()["shards"]
+    return get_collection(chat_shard_name(chat_shard_index(conversation_id, shard_count), shard_count))
+
+def get_chat_write_shards(conversation_id):
+    """
+    Return the shard collections writes of a conversation go to: its current shard,
+    plus its target shard while a reshard is running
+    """
+    layout = get_chat_layout()
+    client = get_chroma_client()
+
+    shard_counts = [layout["shards"], layout["target"]] if layout["target"] else [layout["shards"]]
+    return [
+        _open_collection(client, chat_shard_name(chat_shard_index(conversation_id, shard_count), shard_count))
+        for shard_count in shard_counts
+    ]
+
+def get_chat_shards(shard_count=None):
+    """
+    Return every shard collection of a shard count (the current layout's if None)
+    """
+    if shard_count is None:
+        shard_count = get_chat_layout()["shards"]
+    client = get_chroma_client()
+
+    return [_open_collection(client, chat_shard_name(index, shard_count)) for index in range(shard_count)]
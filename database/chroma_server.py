@@ -0,0 +1,86 @@
+"""
+Local Chroma server for running the app in CHROMA_MODE=http
+
+Starts `chroma run` from the installed chromadb package and waits until it
+answers heartbeats. Run it from the repository root, then point one or more
+app replicas at it:
+
+    python -m database.chroma_server --path ./chroma_server_db --port 8000
+    CHROMA_MODE=http CHROMA_PORT=8000 python -m database.storage_daemon --backend chroma
+    CHROMA_MODE=http CHROMA_PORT=8000 streamlit run app.py --server.port 8501
+    CHROMA_MODE=http CHROMA_PORT=8000 streamlit run app.py --server.port 8502
+
+The replicas keep inbox unread counts and the message search index in the
+storage daemon, since neither can be shared through the server. Benchmarks and
+tests use start_chroma_server / stop_chroma_server directly.
+"""
+import sys
+import time
+import argparse
+import subprocess
+import httpx
+
+# Runs the `chroma` console script of the current interpreter, even when it is not on PATH
+_CHROMA_CLI = "from chromadb.cli.cli import app; app()"
+
+def wait_for_chroma_server(host, port, timeout=30):
+    """
+    Poll the server's heartbeat until it answers or `timeout` seconds pass
+    Returns True if the server is up
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://{host}:{port}/api/v2/heartbeat", timeout=1).status_code == 200:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+
+    return False
+
+def start_chroma_server(path, host="localhost", port=8000, timeout=30, log=subprocess.DEVNULL):
+    """
+    Start a Chroma server persisting to `path` in a child process
+    Returns the process once the server answers heartbeats
+    """
+    process = subprocess.Popen(
+        [sys.executable, "-c", _CHROMA_CLI, "run", "--path", path, "--host", host, "--port", str(port)],
+        stdout=log,
+        stderr=subprocess.STDOUT
+    )
+
+    if not wait_for_chroma_server(host, port, timeout):
+        stop_chroma_server(process)
+        raise RuntimeError(f"Chroma server on {host}:{port} did not start within {timeout} seconds")
+
+    return process
+
+def stop_chroma_server(process, timeout=10):
+    """
+    Stop a server started by start_chroma_server
+    """
+    process.terminate()
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local Chroma server for CHROMA_MODE=http")
+    parser.add_argument("--path", default="./chroma_server_db", help="directory the server persists to")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    process = start_chroma_server(args.path, args.host, args.port, log=None)
+    print(f"Chroma server running; start the app with CHROMA_MODE=http CHROMA_HOST={args.host} CHROMA_PORT={args.port}")
+
+    try:
+        process.wait()
+    except KeyboardInterrupt:
+        stop_chroma_server(process)
+
+if __name__ == "__main__":
+    main()
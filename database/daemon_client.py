@@ -0,0 +1,336 @@
+"""
+Repositories that forward every call to the storage daemon
+
+Selected with STORAGE_BACKEND=daemon. All repositories of a process share one
+connection to the daemon's socket: calls from different threads are written
+to it back to back without waiting for each other (pipelining), and a reader
+thread hands each response to the thread waiting for it.
+"""
+import socket
+import itertools
+import threading
+from database.user_repository import UserRepository
+from database.chat_repository import ChatRepository
+from database.report_repository import ReportRepository
+from database.inbox_repository import InboxRepository
+from database.analytics_repository import AnalyticsRepository
+from database.daemon_protocol import encode_frame, read_frame, STATUS_OK
+from utils.config import STORAGE_DAEMON_SOCKET, STORAGE_DAEMON_TIMEOUT_SECONDS
+
+# Errors re-raised as their own type; anything else becomes a StorageDaemonError
+_REMOTE_ERRORS = {
+    "ValueError": ValueError,
+    "KeyError": KeyError,
+    "NotImplementedError": NotImplementedError
+}
+
+class StorageDaemonError(RuntimeError):
+    """
+    The storage daemon could not be reached or failed to run a call
+    """
+
+class _PendingCall:
+    __slots__ = ("event", "payload")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.payload = None
+
+class DaemonConnection:
+    """
+    A pipelined connection to the storage daemon, shared by every thread of the process
+    """
+
+    def __init__(self, socket_path=STORAGE_DAEMON_SOCKET, timeout=STORAGE_DAEMON_TIMEOUT_SECONDS):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._request_ids = itertools.count(1)
+        self._pending = {}
+        self._sock = None
+
+    def _connect(self):
+        """
+        Open the socket and start its reader thread
+        Must be called with the lock held
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise StorageDaemonError(f"Storage daemon is not running on {self.socket_path}: {e}")
+
+        self._sock = sock
+        threading.Thread(target=self._read_loop, args=(sock,), name="storage-daemon-client", daemon=True).start()
+
+    def _read_loop(self, sock):
+        stream = sock.makefile("rb")
+        try:
+            while True:
+                frame = read_frame(stream)
+                if frame is None:
+                    break
+                request_id, payload = frame
+                with self._lock:
+                    pending = self._pending.pop(request_id, None)
+                if pending:
+                    pending.payload = payload
+                    pending.event.set()
+        except (OSError, ValueError):
+            pass
+        finally:
+            stream.close()
+            self._disconnect(sock)
+
+    def _disconnect(self, sock):
+        """
+        Drop a broken connection and fail every call still waiting on it
+        """
+        with self._lock:
+            if self._sock is not sock:
+                return
+            self._sock = None
+            pending_calls = list(self._pending.values())
+            self._pending.clear()
+
+        sock.close()
+        for pending in pending_calls:
+            pending.event.set()
+
+    def call(self, kind, method, *args):
+        """
+        Run a repository method in the daemon
+        Returns the method's result, with tuples arriving as lists
+        """
+        request_id = next(self._request_ids) & 0xFFFFFFFF
+        frame = encode_frame(request_id, [kind, method, args])
+        pending = _PendingCall()
+
+        with self._lock:
+            if self._sock is None:
+                self._connect()
+            sock = self._sock
+            self._pending[request_id] = pending
+
+        try:
+            with self._send_lock:
+                sock.sendall(frame)
+        except OSError as e:
+            self._disconnect(sock)
+            raise StorageDaemonError(f"Lost the connection to the storage daemon: {e}")
+
+        if not pending.event.wait(self.timeout):
+            with self._lock:
+                self._pending.pop(request_id, None)
+            raise StorageDaemonError(f"Storage daemon did not answer {kind}.{method} within {self.timeout} seconds")
+
+        if pending.payload is None:
+            raise StorageDaemonError("Lost the connection to the storage daemon")
+
+        status, result = pending.payload
+        if status == STATUS_OK:
+            return result
+
+        error_type, message = result
+        raise _REMOTE_ERRORS.get(error_type, StorageDaemonError)(message)
+
+    def close(self):
+        """
+        Close the connection; the next call reconnects
+        """
+        with self._lock:
+            sock = self._sock
+        if sock:
+            sock.shutdown(socket.SHUT_RDWR)
+
+_connection = None
+_connection_lock = threading.Lock()
+
+def get_daemon_connection():
+    """
+    Return the process-wide connection to the storage daemon
+    """
+    global _connection
+    with _connection_lock:
+        if _connection is None:
+            _connection = DaemonConnection()
+        return _connection
+
+class DaemonUserRepository(UserRepository):
+    """
+    User repository served by the storage daemon
+    """
+
+    def _call(self, method, *args):
+        return get_daemon_connection().call("users", method, *args)
+
+    def add_user(self, user_id, user_data):
+        self._call("add_user", user_id, user_data)
+
+    def get_user_by_email(self, email):
+        return self._call("get_user_by_email", email)
+
+    def replace_user(self, user_id, user_data):
+        self._call("replace_user", user_id, user_data)
+
+    def list_users(self):
+        return self._call("list_users")
+
+    def list_users_by_city(self, city):
+        return self._call("list_users_by_city", city)
+
+    def list_user_page(self, offset, limit):
+        return [tuple(record) for record in self._call("list_user_page", offset, limit)]
+
+    def replace_users(self, records):
+        self._call("replace_users", records)
+
+    def update_users(self, records):
+        self._call("update_users", records)
+
+class DaemonChatRepository(ChatRepository):
+    """
+    Chat repository served by the storage daemon
+    """
+
+    def _call(self, method, *args):
+        return get_daemon_connection().call("chats", method, *args)
+
+    def add_message(self, message_id, message_data):
+        self._call("add_message", message_id, message_data)
+
+    def add_messages(self, records):
+        self._call("add_messages", records)
+
+    def get_messages(self, sender_email, receiver_email, limit=None, before=None):
+        return self._call("get_messages", sender_email, receiver_email, limit, before)
+
+    def get_message_page(self, sender_email, receiver_email, cursor, limit):
+        records, cursor = self._call("get_message_page", sender_email, receiver_email, cursor, limit)
+        return [tuple(record) for record in records], cursor
+
+    def list_counterparts(self, user_email):
+        return self._call("list_counterparts", user_email)
+
+    def count_messages_sent(self, sender_email):
+        return self._call("count_messages_sent", sender_email)
+
+    def supports_replace(self):
+        # The daemon may store chats in a backend that cannot overwrite messages
+        return self._call("supports_replace")
+
+    def replace_message(self, message_id, message_data):
+        self._call("replace_message", message_id, message_data)
+
+    def list_messages_by_status(self, status):
+        return [tuple(record) for record in self._call("list_messages_by_status", status)]
+
+    def supports_archival(self):
+        return self._call("supports_archival")
+
+    def get_conversation_activity(self):
+        return {
+            conversation_id: tuple(activity)
+            for conversation_id, activity in self._call("get_conversation_activity").items()
+        }
+
+    def export_conversation(self, user1_email, user2_email):
+        return [tuple(record) for record in self._call("export_conversation", user1_email, user2_email)]
+
+    def archive_conversation(self, user1_email, user2_email, message_ids, location):
+        self._call("archive_conversation", user1_email, user2_email, message_ids, location)
+
+    def get_archive_stub(self, user1_email, user2_email):
+        return self._call("get_archive_stub", user1_email, user2_email)
+
+    def list_archive_stubs(self):
+        return self._call("list_archive_stubs")
+
+    def restore_conversation(self, user1_email, user2_email, records):
+        self._call("restore_conversation", user1_email, user2_email, records)
+
+class DaemonReportRepository(ReportRepository):
+    """
+    Toxic report repository served by the storage daemon
+    """
+
+    def _call(self, method, *args):
+        return get_daemon_connection().call("reports", method, *args)
+
+    def add_report(self, report_id, report_data):
+        self._call("add_report", report_id, report_data)
+
+    def list_reports(self):
+        return self._call("list_reports")
+
+    def list_reports_by_sender(self, sender_email, offset=0, limit=None):
+        return self._call("list_reports_by_sender", sender_email, offset, limit)
+
+class DaemonInboxRepository(InboxRepository):
+    """
+    Inbox repository served by the storage daemon
+    """
+
+    def _call(self, method, *args):
+        return get_daemon_connection().call("inbox", method, *args)
+
+    def record_message(self, message_data):
+        self._call("record_message", message_data)
+
+    def list_conversations(self, owner_email, limit=None):
+        return self._call("list_conversations", owner_email, limit)
+
+    def mark_read(self, owner_email, counterpart_email):
+        self._call("mark_read", owner_email, counterpart_email)
+
+    def supports_multiple_writers(self):
+        # The daemon applies every process's updates one at a time
+        return True
+
+class DaemonAnalyticsRepository(AnalyticsRepository):
+    """
+    Analytics repository served by the storage daemon
+    """
+
+    def _call(self, method, *args):
+        return get_daemon_connection().call("analytics", method, *args)
+
+    def add_counts(self, counts, seen=(), seen_metric=None):
+        return [tuple(pair) for pair in self._call("add_counts", counts, list(seen), seen_metric)]
+
+    def supports_multiple_writers(self):
+        # The daemon applies every process's counts one at a time
+        return True
+
+    def prune_seen(self, before_day):
+        self._call("prune_seen", before_day)
+
+    def list_counters(self, since_day):
+        return [tuple(counter) for counter in self._call("list_counters", since_day)]
+
+class DaemonSearchIndex:
+    """
+    Message search index served by the storage daemon, so every process searches the same index
+    """
+
+    def _call(self, method, *args):
+        return get_daemon_connection().call("search", method, *args)
+
+    def add_message(self, message_data):
+        self._call("add_message", message_data)
+
+    def search(self, user_email, query, limit=20):
+        return self._call("search", user_email, query, limit)
+
+    def clear(self):
+        self._call("clear")
+
+    def document_count(self):
+        return self._call("document_count")
+
+    def close(self):
+        """
+        Nothing to release; the connection is shared by the process
+        """
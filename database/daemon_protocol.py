@@ -0,0 +1,51 @@
+"""
+Wire format shared by the storage daemon and its clients
+
+Every message is a frame: an 8-byte header of payload length and request ID
+(both unsigned 32-bit, big-endian) followed by a compact JSON payload.
+
+    request:  [kind, method, args]        e.g. ["chats", "get_messages", ["a", "b", 50]]
+    response: [0, result] on success, [1, [error type, message]] on failure
+
+A response carries the ID of its request, so a client may send many requests
+before reading any response (pipelining) and responses may arrive in any order.
+"""
+import json
+import struct
+
+_HEADER = struct.Struct(">II")
+
+# Frames above this size are treated as a corrupt stream
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+def encode_frame(request_id, payload):
+    """
+    Serialize a payload into a frame
+    Returns the frame as bytes
+    """
+    body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if len(body) > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame of {len(body)} bytes exceeds the {MAX_FRAME_BYTES} byte limit")
+    return _HEADER.pack(len(body), request_id) + body
+
+def read_frame(stream):
+    """
+    Read one frame from a buffered binary stream
+    Returns a tuple of (request_id, payload), or None when the peer closed the connection
+    """
+    header = stream.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None
+
+    length, request_id = _HEADER.unpack(header)
+    if length > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame of {length} bytes exceeds the {MAX_FRAME_BYTES} byte limit")
+
+    body = stream.read(length)
+    if len(body) < length:
+        return None
+
+    return request_id, json.loads(body)
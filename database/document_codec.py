@@ -0,0 +1,131 @@
+"""
+Compact, versioned encoding of stored chat message and user documents
+
+Documents used to be full JSON objects. A compact document starts with a
+marker character and a one-character version, so both kinds can be read
+side by side and existing JSON rows stay readable until they are migrated
+(see database/migrate_documents.py).
+
+Version 1:
+  chat message  -> MARKER "1" timestamp SEP extras SEP message
+      The sender and receiver are not stored: every read already knows them
+      from the query or the metadata. Extras is a compact JSON object of any
+      other keys, or empty.
+  user          -> MARKER "1" JSON array [mask, value, ..., extras?]
+      The keys of USER_FIELDS present in the profile are flagged in the mask
+      and their values follow in that order, without repeating key names. A
+      trailing object holds any other keys.
+"""
+import json
+
+# Legacy documents are JSON objects and always start with "{"
+MARKER = "\x1e"
+SEPARATOR = "\x1f"
+CODEC_VERSION = "1"
+
+# Profile keys stored positionally in version 1 user documents
+USER_FIELDS = (
+    "name",
+    "email",
+    "city",
+    "skills",
+    "auth_method",
+    "subscription_status",
+    "message_count",
+    "profile_image"
+)
+
+_MESSAGE_KEYS = ("sender", "receiver", "message", "timestamp")
+_COMPACT = (",", ":")
+
+def is_legacy(document):
+    """
+    Check whether a document is in the original JSON encoding
+    """
+    return not document.startswith(MARKER)
+
+def encode_message(message_data):
+    """
+    Encode a chat message dictionary as a version 1 document
+    """
+    extras = {key: value for key, value in message_data.items() if key not in _MESSAGE_KEYS}
+    encoded_extras = json.dumps(extras, separators=_COMPACT) if extras else ""
+
+    # json.dumps escapes control characters, so only the message may contain SEPARATOR
+    return f"{MARKER}{CODEC_VERSION}{message_data['timestamp']}{SEPARATOR}{encoded_extras}{SEPARATOR}{message_data['message']}"
+
+def decode_message(document, sender_email, receiver_email):
+    """
+    Decode a chat message document of any version
+    Returns the message dictionary
+    """
+    if is_legacy(document):
+        return json.loads(document)
+
+    version = document[1]
+    if version != "1":
+        raise ValueError(f"Unknown chat document version {version!r}")
+
+    timestamp, encoded_extras, message = document[2:].split(SEPARATOR, 2)
+
+    message_data = {
+        "sender": sender_email,
+        "receiver": receiver_email,
+        "message": message,
+        "timestamp": timestamp
+    }
+    if encoded_extras:
+        message_data.update(json.loads(encoded_extras))
+
+    return message_data
+
+_mask_cache = {}
+
+def _mask_keys(mask):
+    """
+    Return the USER_FIELDS keys flagged in a mask, in order
+    """
+    keys = _mask_cache.get(mask)
+    if keys is None:
+        keys = tuple(key for bit, key in enumerate(USER_FIELDS) if mask & (1 << bit))
+        _mask_cache[mask] = keys
+    return keys
+
+def encode_user(user_data):
+    """
+    Encode a user profile dictionary as a version 1 document
+    """
+    mask = 0
+    values = [0]
+    for bit, key in enumerate(USER_FIELDS):
+        if key in user_data:
+            mask |= 1 << bit
+            values.append(user_data[key])
+    values[0] = mask
+
+    extras = {key: value for key, value in user_data.items() if key not in USER_FIELDS}
+    if extras:
+        values.append(extras)
+
+    return MARKER + CODEC_VERSION + json.dumps(values, separators=_COMPACT)
+
+def decode_user(document):
+    """
+    Decode a user document of any version
+    Returns the user profile dictionary
+    """
+    if is_legacy(document):
+        return json.loads(document)
+
+    version = document[1]
+    if version != "1":
+        raise ValueError(f"Unknown user document version {version!r}")
+
+    values = json.loads(document[2:])
+    keys = _mask_keys(values[0])
+
+    user_data = dict(zip(keys, values[1:]))
+    if len(values) > len(keys) + 1:
+        user_data.update(values[-1])
+
+    return user_data
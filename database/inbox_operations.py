@@ -0,0 +1,21 @@
+from database.storage import get_inbox_repository
+from utils.tracing import traced
+
+# Maximum number of conversations shown in the inbox
+INBOX_SIZE = 50
+
+@traced("db.inbox.get_inbox")
+def get_inbox(user_email, limit=INBOX_SIZE):
+    """
+    Retrieve a user's recent conversations
+    Returns a list of entries with counterpart, last_message, last_sender,
+    last_timestamp and unread keys, most recently active first
+    """
+    return get_inbox_repository().list_conversations(user_email, limit=limit)
+
+@traced("db.inbox.mark_conversation_read")
+def mark_conversation_read(user_email, counterpart_email):
+    """
+    Mark every message from a counterpart as read in a user's inbox
+    """
+    get_inbox_repository().mark_read(user_email, counterpart_email)
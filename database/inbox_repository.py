@@ -0,0 +1,160 @@
+import threading
+from database.chroma_connection import get_collection
+from utils.config import CHROMA_MODE
+
+# Characters of the last message kept as the inbox preview
+PREVIEW_LENGTH = 80
+
+def _preview(message):
+    return message if len(message) <= PREVIEW_LENGTH else message[:PREVIEW_LENGTH - 1] + "…"
+
+class InboxRepository:
+    """
+    Storage interface for per-user inboxes
+    An inbox holds one entry per counterpart: a dictionary with counterpart,
+    last_message (a preview), last_sender, last_timestamp and unread keys
+    """
+
+    def record_message(self, message_data):
+        """
+        Update the sender's and the receiver's entries for a newly sent message
+        """
+        raise NotImplementedError
+
+    def list_conversations(self, owner_email, limit=None):
+        """
+        Retrieve a user's inbox entries
+        Returns up to `limit` entries (all if None), most recently active first
+        """
+        raise NotImplementedError
+
+    def mark_read(self, owner_email, counterpart_email):
+        """
+        Reset the unread count of one inbox entry
+        """
+        raise NotImplementedError
+
+    def supports_multiple_writers(self):
+        """
+        Check whether several processes can record messages in this store at once without losing unread counts
+        """
+        return False
+
+    def close(self):
+        """
+        Release any resources held by the repository
+        """
+
+class ChromaInboxRepository(InboxRepository):
+    """
+    Inbox repository backed by the ChromaDB inbox collection
+    Each entry is a row with the ID "<owner>|<counterpart>", so every update is a lookup by ID
+    """
+
+    def __init__(self):
+        # Serializes the read-modify-write of unread counts within this process only; processes
+        # sharing a Chroma server go through the storage daemon instead
+        self._lock = threading.Lock()
+
+    def _collection(self):
+        return get_collection("inbox")
+
+    def _upsert(self, collection, rows):
+        # Entries are only ever fetched by ID or owner, so a constant embedding spares the
+        # embedding model a call per write
+        collection.upsert(
+            ids=[f"{metadata['owner']}|{metadata['counterpart']}" for metadata in rows],
+            documents=[metadata["last_message"] for metadata in rows],
+            embeddings=[[1.0] for _ in rows],
+            metadatas=rows
+        )
+
+    def record_message(self, message_data):
+        sender_email = message_data["sender"]
+        receiver_email = message_data["receiver"]
+        receiver_row = f"{receiver_email}|{sender_email}"
+
+        with self._lock:
+            collection = self._collection()
+            results = collection.get(ids=[receiver_row], include=["metadatas"])
+            unread = results["metadatas"][0]["unread"] if results["ids"] else 0
+
+            last = {
+                "last_message": _preview(message_data["message"]),
+                "last_sender": sender_email,
+                "last_timestamp": message_data["timestamp"]
+            }
+
+            # Sending a message implies the sender has read the conversation
+            self._upsert(collection, [
+                dict(last, owner=sender_email, counterpart=receiver_email, unread=0),
+                dict(last, owner=receiver_email, counterpart=sender_email, unread=unread + 1)
+            ])
+
+    def list_conversations(self, owner_email, limit=None):
+        results = self._collection().get(where={"owner": owner_email}, include=["metadatas"])
+
+        entries = [
+            {key: value for key, value in metadata.items() if key != "owner"}
+            for metadata in results["metadatas"]
+        ]
+        entries.sort(key=lambda entry: entry["last_timestamp"], reverse=True)
+
+        return entries[:limit] if limit else entries
+
+    def mark_read(self, owner_email, counterpart_email):
+        with self._lock:
+            collection = self._collection()
+            results = collection.get(ids=[f"{owner_email}|{counterpart_email}"], include=["metadatas"])
+
+            # Skip the write when there is nothing to reset, which is the common case
+            if results["ids"] and results["metadatas"][0]["unread"]:
+                self._upsert(collection, [dict(results["metadatas"][0], unread=0)])
+
+    def supports_multiple_writers(self):
+        # Only a Chroma server can be shared by several processes, and the read-modify-write
+        # above is serialized per process
+        return CHROMA_MODE != "http"
+
+class InMemoryInboxRepository(InboxRepository):
+    """
+    Inbox repository held in process memory, with the same semantics as the Chroma one
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inboxes = {}
+
+    def record_message(self, message_data):
+        sender_email = message_data["sender"]
+        receiver_email = message_data["receiver"]
+        last = {
+            "last_message": _preview(message_data["message"]),
+            "last_sender": sender_email,
+            "last_timestamp": message_data["timestamp"]
+        }
+
+        with self._lock:
+            receiver_inbox = self._inboxes.setdefault(receiver_email, {})
+            unread = receiver_inbox[sender_email]["unread"] if sender_email in receiver_inbox else 0
+
+            self._inboxes.setdefault(sender_email, {})[receiver_email] = dict(last, counterpart=receiver_email, unread=0)
+            receiver_inbox[sender_email] = dict(last, counterpart=sender_email, unread=unread + 1)
+
+    def list_conversations(self, owner_email, limit=None):
+        with self._lock:
+            entries = [dict(entry) for entry in self._inboxes.get(owner_email, {}).values()]
+
+        entries.sort(key=lambda entry: entry["last_timestamp"], reverse=True)
+
+        return entries[:limit] if limit else entries
+
+    def mark_read(self, owner_email, counterpart_email):
+        with self._lock:
+            entry = self._inboxes.get(owner_email, {}).get(counterpart_email)
+            if entry:
+                entry["unread"] = 0
+
+    def supports_multiple_writers(self):
+        # Every process has its own inboxes
+        return True
@@ -0,0 +1,104 @@
+"""
+Rewrite legacy JSON documents in ChromaDB with the compact encoding
+
+Reads of JSON documents keep working without this migration. It only makes
+the database smaller and reads faster. It is safe to interrupt and rerun,
+because documents that are already compact are skipped. Run from the
+repository root:
+
+    python -m database.migrate_documents --dry-run
+    python -m database.migrate_documents --vacuum
+"""
+import os
+import json
+import sqlite3
+import argparse
+from database.chroma_connection import get_collection, get_chat_shards
+from database.chat_repository import ARCHIVE_STUB_SENDER
+from database.document_codec import is_legacy, encode_message, decode_message, encode_user, decode_user
+from utils.config import CHROMA_MODE
+
+def reencode_chat(document, metadata):
+    """
+    Re-encode a stored chat message document with the current codec
+    """
+    return encode_message(decode_message(document, metadata["sender"], metadata["receiver"]))
+
+def reencode_user(document, metadata):
+    """
+    Re-encode a stored user document with the current codec
+    """
+    return encode_user(decode_user(document))
+
+_COLLECTIONS = {
+    "chats": reencode_chat,
+    "users": reencode_user
+}
+
+def migrate_collection(collection, reencode, batch_size=500, dry_run=False):
+    """
+    Re-encode every legacy document of a collection in batches
+    Returns a dictionary with the number of documents scanned and migrated and the bytes saved
+    """
+    stats = {"scanned": 0, "migrated": 0, "bytes_before": 0, "bytes_after": 0}
+    offset = 0
+
+    while True:
+        results = collection.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+        if not results["ids"]:
+            break
+        offset += len(results["ids"])
+
+        ids = []
+        documents = []
+        for record_id, document, metadata in zip(results["ids"], results["documents"], results["metadatas"]):
+            stats["scanned"] += 1
+            # Archive stubs are not message documents
+            if not is_legacy(document) or metadata.get("sender") == ARCHIVE_STUB_SENDER:
+                continue
+
+            encoded = reencode(document, metadata)
+            ids.append(record_id)
+            documents.append(encoded)
+            stats["bytes_before"] += len(document.encode("utf-8"))
+            stats["bytes_after"] += len(encoded.encode("utf-8"))
+
+        stats["migrated"] += len(ids)
+        if ids and not dry_run:
+            collection.update(ids=ids, documents=documents)
+
+    return stats
+
+def vacuum(persist_directory):
+    """
+    Compact chroma.sqlite3 so the space freed by shorter documents is returned to the OS
+    """
+    connection = sqlite3.connect(os.path.join(persist_directory, "chroma.sqlite3"))
+    try:
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate ChromaDB documents to the compact encoding")
+    parser.add_argument("--collections", default="chats,users", help="comma-separated collections to migrate")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    parser.add_argument("--vacuum", action="store_true", help="compact chroma.sqlite3 afterwards")
+    args = parser.parse_args()
+
+    for name in args.collections.split(","):
+        # Chat messages are spread over the chat shards
+        collections = get_chat_shards() if name == "chats" else [get_collection(name)]
+        for collection in collections:
+            stats = migrate_collection(collection, _COLLECTIONS[name], args.batch_size, args.dry_run)
+            print(f"{collection.name}: {json.dumps(stats)}")
+
+    if args.vacuum and not args.dry_run:
+        if CHROMA_MODE == "http":
+            print("--vacuum skipped: the database file belongs to the Chroma server")
+        else:
+            vacuum(os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_db"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import json
+import threading
+from itertools import islice
+from database.chroma_connection import get_collection
+
+class ReportRepository:
+    """
+    Storage interface for toxic message reports
+    """
+
+    def add_report(self, report_id, report_data):
+        """
+        Store a single report
+        """
+        raise NotImplementedError
+
+    def list_reports(self):
+        """
+        Retrieve all reports
+        """
+        raise NotImplementedError
+
+    def list_reports_by_sender(self, sender_email, offset=0, limit=None):
+        """
+        Retrieve up to `limit` reports of messages a user sent (all if None), starting at `offset`
+        Reports stored before senders were recorded are not attributed to anyone
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Release any resources held by the repository
+        """
+
+class ChromaReportRepository(ReportRepository):
+    """
+    Report repository backed by the ChromaDB toxic_reports collection
+    """
+
+    def _collection(self):
+        return get_collection("toxic_reports")
+
+    def add_report(self, report_id, report_data):
+        self._collection().add(
+            ids=[report_id],
+            documents=[json.dumps(report_data)],
+            metadatas=[{"timestamp": report_data["timestamp"], "sender": report_data.get("sender") or ""}]
+        )
+
+    def list_reports(self):
+        results = self._collection().get(include=["documents"])
+        return [json.loads(document) for document in results["documents"]]
+
+    def list_reports_by_sender(self, sender_email, offset=0, limit=None):
+        results = self._collection().get(where={"sender": sender_email}, offset=offset, limit=limit,
+                                         include=["documents"])
+        return [json.loads(document) for document in results["documents"]]
+
+class InMemoryReportRepository(ReportRepository):
+    """
+    Report repository held in process memory
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents = {}
+        self._senders = {}
+
+    def add_report(self, report_id, report_data):
+        with self._lock:
+            # Chroma ignores adds for existing IDs, and so does this repository
+            if report_id in self._documents:
+                return
+            self._documents[report_id] = json.dumps(report_data)
+            self._senders[report_id] = report_data.get("sender")
+
+    def list_reports(self):
+        with self._lock:
+            documents = list(self._documents.values())
+        return [json.loads(document) for document in documents]
+
+    def list_reports_by_sender(self, sender_email, offset=0, limit=None):
+        with self._lock:
+            documents = list(islice(
+                (document for report_id, document in self._documents.items() if self._senders[report_id] == sender_email),
+                offset,
+                offset + limit if limit else None
+            ))
+        return [json.loads(document) for document in documents]
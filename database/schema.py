@@ -0,0 +1,98 @@
+"""
+Declarative schema of the Chroma collections
+
+Every collection the app uses is listed in COLLECTIONS with the HNSW index it
+is created with; the parameters come from utils/config.py. Chat shards
+(database/chat_sharding.py) all share the chats index. Chroma fixes the
+distance space, M and construction_ef when a collection is created, so those
+only take effect for new collections; ef_search and sync_threshold are
+applied to existing collections on startup too, and are used by every
+process that loads the index after that. Chroma has no index batch size
+setting (it drops a batch_size key without an error), so none is set here.
+Versioned data migrations live in database/schema_migrations.py.
+"""
+from utils.config import (
+    HNSW_M, HNSW_CONSTRUCTION_EF, HNSW_SEARCH_EF, HNSW_SYNC_THRESHOLD,
+    USERS_HNSW_M, USERS_HNSW_CONSTRUCTION_EF, USERS_HNSW_SEARCH_EF, CHATS_HNSW_SYNC_THRESHOLD
+)
+
+# Chroma parameters that can be changed on an existing collection
+MUTABLE_HNSW_PARAMETERS = ("ef_search", "sync_threshold")
+
+def hnsw_index(m=HNSW_M, construction_ef=HNSW_CONSTRUCTION_EF, search_ef=HNSW_SEARCH_EF,
+               sync_threshold=HNSW_SYNC_THRESHOLD):
+    """
+    Describe an HNSW index in Chroma's configuration format
+    Returns the "hnsw" configuration dictionary
+    """
+    return {
+        "space": "cosine",
+        "max_neighbors": m,
+        "ef_construction": construction_ef,
+        "ef_search": search_ef,
+        "sync_threshold": sync_threshold
+    }
+
+DEFAULT_INDEX = hnsw_index()
+USERS_INDEX = hnsw_index(m=USERS_HNSW_M, construction_ef=USERS_HNSW_CONSTRUCTION_EF, search_ef=USERS_HNSW_SEARCH_EF)
+CHATS_INDEX = hnsw_index(sync_threshold=CHATS_HNSW_SYNC_THRESHOLD)
+
+# Collections every database has, in the order they are created
+COLLECTIONS = {
+    "users": USERS_INDEX,
+    "chats": CHATS_INDEX,
+    "toxic_reports": DEFAULT_INDEX,
+    "inbox": DEFAULT_INDEX,
+    "chat_layout": DEFAULT_INDEX,
+    "analytics": DEFAULT_INDEX,
+    "schema_migrations": DEFAULT_INDEX
+}
+
+def collection_index(name):
+    """
+    Return the HNSW index parameters a collection should have
+    """
+    if name in COLLECTIONS:
+        return COLLECTIONS[name]
+    # Chat shards are named chats_<count>_<index>
+    if name.startswith("chats_"):
+        return CHATS_INDEX
+    return DEFAULT_INDEX
+
+def create_collection(client, name, embedding_function):
+    """
+    Create a collection with its index parameters, or open it if it already exists
+    """
+    return client.get_or_create_collection(
+        name=name,
+        configuration={"hnsw": collection_index(name)},
+        embedding_function=embedding_function
+    )
+
+def index_drift(collection):
+    """
+    Compare a collection's HNSW index with the schema
+    Returns a dictionary of parameter -> (current, wanted) for the parameters that differ;
+    parameters Chroma does not report are left out
+    """
+    current = (collection.configuration_json or {}).get("hnsw") or {}
+    return {
+        parameter: (current[parameter], wanted)
+        for parameter, wanted in collection_index(collection.name).items()
+        if parameter in current and current[parameter] != wanted
+    }
+
+def apply_index_parameters(collection):
+    """
+    Bring the mutable index parameters of an existing collection in line with the schema
+    Returns the parameters that were changed
+    """
+    changes = {
+        parameter: wanted
+        for parameter, (current, wanted) in index_drift(collection).items()
+        if parameter in MUTABLE_HNSW_PARAMETERS
+    }
+    if changes:
+        collection.modify(configuration={"hnsw": changes})
+
+    return changes
@@ -0,0 +1,145 @@
+"""
+Versioned migrations of the Chroma data, each run once and recorded
+
+A migration is a function with a version and a description in MIGRATIONS.
+Applied versions are recorded in the schema_migrations collection, so every
+migration runs once per database however many processes or deploys run this
+module; they run in version order and stop at the first failure. Add a
+migration whenever the stored format changes, never edit one that has
+shipped. Run it from the repository root as a deploy step:
+
+    python -m database.schema_migrations --status
+    python -m database.schema_migrations
+"""
+import json
+import time
+import argparse
+import datetime
+from database.chroma_connection import get_collection, get_chat_shards, get_chroma_client
+from database.migrate_documents import migrate_collection, reencode_chat, reencode_user
+from database.schema import COLLECTIONS, index_drift
+from database.chat_repository import ARCHIVE_STUB_SENDER, timestamp_value
+
+MIGRATIONS_COLLECTION = "schema_migrations"
+
+def _compact_documents():
+    # Legacy JSON documents are still readable, so this only saves space and read time
+    stats = migrate_collection(get_collection("users"), reencode_user)
+    for collection in get_chat_shards():
+        shard_stats = migrate_collection(collection, reencode_chat)
+        stats = {key: stats[key] + shard_stats[key] for key in stats}
+    return stats
+
+def _add_message_ts(batch_size=1000):
+    # Export pages filter on ts, so a message without it would be left out of exports
+    updated = 0
+    for collection in get_chat_shards():
+        offset = 0
+        while True:
+            results = collection.get(limit=batch_size, offset=offset, include=["metadatas"])
+            if not results["ids"]:
+                break
+            offset += len(results["ids"])
+
+            missing = [
+                (message_id, metadata) for message_id, metadata in zip(results["ids"], results["metadatas"])
+                if metadata["sender"] != ARCHIVE_STUB_SENDER and "ts" not in metadata
+            ]
+            if missing:
+                # Chroma merges metadata on update, so only ts is sent
+                collection.update(
+                    ids=[message_id for message_id, _ in missing],
+                    metadatas=[{"ts": timestamp_value(metadata["timestamp"])} for _, metadata in missing]
+                )
+                updated += len(missing)
+    return {"updated": updated}
+
+# (version, description, migration) in the order they run
+MIGRATIONS = [
+    ("0001", "Re-encode legacy JSON user and chat documents with the compact codec", _compact_documents),
+    ("0002", "Add the numeric ts field that chat messages are paged by", _add_message_ts)
+]
+
+def applied_migrations():
+    """
+    Read the migrations recorded in the database
+    Returns a dictionary of version -> record with the description, applied_at and duration_ms
+    """
+    results = get_collection(MIGRATIONS_COLLECTION).get(include=["metadatas"])
+    return dict(zip(results["ids"], results["metadatas"]))
+
+def pending_migrations():
+    """
+    Return the (version, description, migration) entries not applied yet, in order
+    """
+    applied = applied_migrations()
+    return [migration for migration in MIGRATIONS if migration[0] not in applied]
+
+def _record_migration(version, description, duration_ms, result):
+    # Fetched by ID only, so a constant embedding is enough
+    get_collection(MIGRATIONS_COLLECTION).upsert(
+        ids=[version],
+        documents=[description],
+        embeddings=[[1.0]],
+        metadatas=[{
+            "description": description,
+            "applied_at": datetime.datetime.now().isoformat(),
+            "duration_ms": round(duration_ms, 1),
+            "result": json.dumps(result)
+        }]
+    )
+
+def run_migrations():
+    """
+    Apply every pending migration in version order, recording each one as it finishes
+    Returns a list of dictionaries with the version, milliseconds and result of each
+    """
+    applied = []
+    for version, description, migration in pending_migrations():
+        start = time.perf_counter()
+        result = migration()
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        _record_migration(version, description, duration_ms, result)
+        applied.append({"version": version, "ms": round(duration_ms, 1), "result": result})
+
+    return applied
+
+def schema_status():
+    """
+    Describe the collections and migrations of the database
+    Returns a dictionary with each collection's row count, HNSW parameters and drift from the
+    schema, the applied migrations and the versions still pending
+    """
+    collections = {}
+    for collection in get_chroma_client().list_collections():
+        collections[collection.name] = {
+            "count": collection.count(),
+            "hnsw": (collection.configuration_json or {}).get("hnsw"),
+            "drift": index_drift(collection),
+            "in_schema": collection.name in COLLECTIONS or collection.name.startswith("chats_")
+        }
+
+    return {
+        "collections": collections,
+        "applied": applied_migrations(),
+        "pending": [version for version, _, _ in pending_migrations()]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations or show the schema status")
+    parser.add_argument("--status", action="store_true", help="show collections, drift and migrations without migrating")
+    args = parser.parse_args()
+
+    if args.status:
+        print(json.dumps(schema_status(), indent=2))
+        return
+
+    applied = run_migrations()
+    for migration in applied:
+        print(f"{migration['version']}: {migration['ms']:.1f} ms {json.dumps(migration['result'])}")
+    if not applied:
+        print("No pending migrations")
+
+if __name__ == "__main__":
+    main()
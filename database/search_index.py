@@ -0,0 +1,189 @@
+"""
+Inverted index for full-text search over chat messages
+
+Every message is tokenized once, when it is sent, and indexed under both
+participants. A query only touches the postings of the user searching, so
+its cost depends on that user's history rather than on the whole corpus.
+
+The index lives in process memory. With a persistent chat backend it is
+backed by a journal of indexed messages (SEARCH_INDEX_JOURNAL) that is
+replayed on start. The journal can be rebuilt from the chat store, which also
+indexes history sent before the index existed:
+
+    python -m database.search_operations --rebuild
+"""
+import os
+import re
+import sys
+import json
+import math
+import heapq
+import threading
+from array import array
+from database.chat_repository import get_conversation_id
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words too common to narrow a search down
+STOPWORDS = frozenset([
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "i", "if", "in", "is",
+    "it", "me", "my", "of", "on", "or", "so", "that", "the", "this", "to", "was", "we",
+    "with", "you"
+])
+
+def tokenize(text):
+    """
+    Split text into lowercase alphanumeric tokens, dropping stopwords
+    Returns a list of tokens (repeated tokens are kept)
+    """
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+class MessageSearchIndex:
+    """
+    Per-participant inverted index over message text
+
+    Documents are numbered in the order they are indexed and their fields are
+    kept in parallel lists. Postings map (participant, token) to an array of
+    document numbers, with a number repeated once per occurrence of the token,
+    so accumulating over postings yields term frequencies directly.
+    """
+
+    def __init__(self, journal_path=None):
+        self.journal_path = journal_path
+        self._lock = threading.Lock()
+        self._senders = []
+        self._receivers = []
+        self._timestamps = []
+        self._texts = []
+        self._postings = {}
+        self._document_counts = {}
+        self._journal = None
+
+        if journal_path:
+            self._replay()
+            directory = os.path.dirname(journal_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._journal = open(journal_path, "a", encoding="utf-8")
+
+    def _replay(self):
+        if not os.path.exists(self.journal_path):
+            return
+
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    message_data = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash is skipped
+                    continue
+                self._index(message_data)
+
+    def _index(self, message_data):
+        document = len(self._texts)
+        sender_email = sys.intern(message_data["sender"])
+        receiver_email = sys.intern(message_data["receiver"])
+
+        self._senders.append(sender_email)
+        self._receivers.append(receiver_email)
+        self._timestamps.append(message_data["timestamp"])
+        self._texts.append(message_data["message"])
+
+        tokens = tokenize(message_data["message"])
+        for owner in {sender_email, receiver_email}:
+            self._document_counts[owner] = self._document_counts.get(owner, 0) + 1
+            owner_postings = self._postings.setdefault(owner, {})
+            for token in tokens:
+                postings = owner_postings.get(token)
+                if postings is None:
+                    postings = owner_postings[token] = array("I")
+                postings.append(document)
+
+    def add_message(self, message_data):
+        """
+        Index a message for both of its participants
+        """
+        with self._lock:
+            self._index(message_data)
+            if self._journal:
+                self._journal.write(json.dumps({
+                    "sender": message_data["sender"],
+                    "receiver": message_data["receiver"],
+                    "message": message_data["message"],
+                    "timestamp": message_data["timestamp"]
+                }, separators=(",", ":")) + "\n")
+                self._journal.flush()
+
+    def search(self, user_email, query, limit=20):
+        """
+        Search the messages a user sent or received
+        Documents are scored by summed TF-IDF over the query tokens, ties going to newer messages
+        Returns up to `limit` hits as dictionaries with conversation_id, counterpart,
+        sender, message, timestamp and score keys
+        """
+        tokens = set(tokenize(query))
+        if not tokens:
+            return []
+
+        with self._lock:
+            owner_postings = self._postings.get(user_email)
+            if not owner_postings:
+                return []
+
+            document_count = self._document_counts[user_email]
+            scores = {}
+            for token in tokens:
+                postings = owner_postings.get(token)
+                if not postings:
+                    continue
+                idf = math.log(1 + document_count / len(postings))
+                for document in postings:
+                    scores[document] = scores.get(document, 0.0) + idf
+
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+
+            hits = []
+            for document, score in best:
+                sender_email = self._senders[document]
+                receiver_email = self._receivers[document]
+                hits.append({
+                    "conversation_id": get_conversation_id(sender_email, receiver_email),
+                    "counterpart": receiver_email if sender_email == user_email else sender_email,
+                    "sender": sender_email,
+                    "message": self._texts[document],
+                    "timestamp": self._timestamps[document],
+                    "score": round(score, 4)
+                })
+
+        return hits
+
+    def clear(self):
+        """
+        Drop every indexed message and truncate the journal
+        """
+        with self._lock:
+            self._senders = []
+            self._receivers = []
+            self._timestamps = []
+            self._texts = []
+            self._postings = {}
+            self._document_counts = {}
+            if self._journal:
+                self._journal.close()
+                self._journal = open(self.journal_path, "w", encoding="utf-8")
+
+    def document_count(self):
+        """
+        Return the number of indexed messages
+        """
+        with self._lock:
+            return len(self._texts)
+
+    def close(self):
+        """
+        Close the journal
+        """
+        with self._lock:
+            if self._journal:
+                self._journal.close()
+                self._journal = None
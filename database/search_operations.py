@@ -0,0 +1,57 @@
+import argparse
+from database.storage import get_chat_repository, get_search_index
+from database.chat_archive import get_chat_archive
+from utils.tracing import traced
+
+@traced("db.search.search_messages")
+def search_messages(user_email, query, limit=20):
+    """
+    Search the messages a user sent or received
+    Returns a list of ranked hits with conversation_id, counterpart, sender,
+    message, timestamp and score keys
+    """
+    return get_search_index().search(user_email, query, limit=limit)
+
+def rebuild_search_index():
+    """
+    Rebuild the search index and its journal from every delivered message, hot and archived
+    Returns the number of messages indexed
+    """
+    chat_repository = get_chat_repository()
+    archive = get_chat_archive()
+
+    # Collect everything first so the index is only cleared once the scan succeeded
+    records = {}
+    for user1_email, user2_email, _ in chat_repository.get_conversation_activity().values():
+        records.update(chat_repository.export_conversation(user1_email, user2_email))
+
+    # Archived messages are read from their segment without restoring the conversation;
+    # keying by message ID drops any left in the hot store by an interrupted archival
+    for location in chat_repository.list_archive_stubs().values():
+        records.update(archive.iter_records(location))
+
+    # Messages still in moderation or retracted were never delivered, so they are not searchable
+    messages = sorted(
+        (message_data for message_data in records.values() if not message_data.get("status")),
+        key=lambda message_data: message_data["timestamp"]
+    )
+
+    search_index = get_search_index()
+    search_index.clear()
+    for message_data in messages:
+        search_index.add_message(message_data)
+
+    return len(messages)
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the chat message search index")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the index from the chat store")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        print(f"Indexed {rebuild_search_index()} messages")
+    else:
+        print(f"{get_search_index().document_count()} messages indexed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import threading
+from utils.config import (
+    STORAGE_BACKEND,
+    CHAT_STORAGE_BACKEND,
+    CHAT_LOG_DIRECTORY,
+    CHAT_LOG_PARTITIONS,
+    CHAT_LOG_SEGMENT_BYTES,
+    CHAT_LOG_SYNC_MODE,
+    CHAT_LOG_GROUP_COMMIT_MS,
+    SEARCH_INDEX_JOURNAL,
+    CHROMA_MODE
+)
+from database.chroma_connection import get_chroma_client
+from database.user_repository import ChromaUserRepository, InMemoryUserRepository
+from database.chat_repository import ChromaChatRepository, InMemoryChatRepository
+from database.report_repository import ChromaReportRepository, InMemoryReportRepository
+from database.inbox_repository import ChromaInboxRepository, InMemoryInboxRepository
+from database.analytics_repository import ChromaAnalyticsRepository, InMemoryAnalyticsRepository
+from database.search_index import MessageSearchIndex
+from database.chat_log import LogChatRepository
+from database.daemon_client import (
+    DaemonUserRepository, DaemonChatRepository, DaemonReportRepository,
+    DaemonInboxRepository, DaemonSearchIndex, DaemonAnalyticsRepository
+)
+
+# Backend selected for each kind of repository
+_backends = {
+    "users": STORAGE_BACKEND,
+    "chats": CHAT_STORAGE_BACKEND,
+    "reports": STORAGE_BACKEND,
+    "inbox": STORAGE_BACKEND,
+    "search": CHAT_STORAGE_BACKEND,
+    "analytics": STORAGE_BACKEND
+}
+
+# Repositories are created once per process and shared by all sessions
+_repositories = {}
+_lock = threading.Lock()
+
+# True in the storage daemon, which keeps the state app processes must share
+_serving_daemon = False
+
+def _create_log_chat_repository():
+    return LogChatRepository(
+        CHAT_LOG_DIRECTORY,
+        partitions=CHAT_LOG_PARTITIONS,
+        segment_bytes=CHAT_LOG_SEGMENT_BYTES,
+        sync_mode=CHAT_LOG_SYNC_MODE,
+        group_commit_ms=CHAT_LOG_GROUP_COMMIT_MS
+    )
+
+def _create_journaled_search_index():
+    return MessageSearchIndex(SEARCH_INDEX_JOURNAL or None)
+
+def _create_chroma_search_index():
+    # A process's index only holds the messages it sent, so processes sharing a Chroma server
+    # search the storage daemon's single index
+    if CHROMA_MODE == "http" and not _serving_daemon:
+        return DaemonSearchIndex()
+    return _create_journaled_search_index()
+
+def _create_chroma_inbox_repository():
+    # Unread counts are read, added to and written back, so processes sharing a Chroma server
+    # update them through the storage daemon
+    repository = ChromaInboxRepository()
+    if repository.supports_multiple_writers() or _serving_daemon:
+        return repository
+    return DaemonInboxRepository()
+
+# Factories for each (kind, backend) combination
+_factories = {
+    ("users", "chroma"): ChromaUserRepository,
+    ("users", "memory"): InMemoryUserRepository,
+    ("users", "daemon"): DaemonUserRepository,
+    ("chats", "chroma"): ChromaChatRepository,
+    ("chats", "memory"): InMemoryChatRepository,
+    ("chats", "log"): _create_log_chat_repository,
+    ("chats", "daemon"): DaemonChatRepository,
+    ("reports", "chroma"): ChromaReportRepository,
+    ("reports", "memory"): InMemoryReportRepository,
+    ("reports", "daemon"): DaemonReportRepository,
+    ("inbox", "chroma"): _create_chroma_inbox_repository,
+    ("inbox", "memory"): InMemoryInboxRepository,
+    ("inbox", "daemon"): DaemonInboxRepository,
+    # The search index follows the chat backend: journaled when chats persist
+    ("search", "chroma"): _create_chroma_search_index,
+    ("search", "log"): _create_journaled_search_index,
+    ("search", "memory"): MessageSearchIndex,
+    # With the daemon, every process searches the daemon's single index
+    ("search", "daemon"): DaemonSearchIndex,
+    ("analytics", "chroma"): ChromaAnalyticsRepository,
+    ("analytics", "memory"): InMemoryAnalyticsRepository,
+    ("analytics", "daemon"): DaemonAnalyticsRepository
+}
+
+def _get_repository(kind):
+    with _lock:
+        if kind not in _repositories:
+            factory = _factories.get((kind, _backends[kind]))
+            if factory is None:
+                raise ValueError(f"Unknown {kind} storage backend: {_backends[kind]}")
+            _repositories[kind] = factory()
+        return _repositories[kind]
+
+def get_user_repository():
+    """
+    Return the process-wide user repository
+    """
+    return _get_repository("users")
+
+def get_chat_repository():
+    """
+    Return the process-wide chat repository
+    """
+    return _get_repository("chats")
+
+def get_report_repository():
+    """
+    Return the process-wide toxic report repository
+    """
+    return _get_repository("reports")
+
+def get_inbox_repository():
+    """
+    Return the process-wide inbox repository
+    """
+    return _get_repository("inbox")
+
+def get_search_index():
+    """
+    Return the process-wide message search index
+    """
+    return _get_repository("search")
+
+def get_analytics_repository():
+    """
+    Return the process-wide analytics counter repository
+    """
+    return _get_repository("analytics")
+
+def uses_backend(backend):
+    """
+    Check whether any repository is stored with `backend`
+    """
+    return backend in _backends.values()
+
+def initialize_storage():
+    """
+    Create every repository up front so the first request does not pay for it
+    """
+    # Open ChromaDB and create its collections if any repository uses it
+    if uses_backend("chroma"):
+        get_chroma_client()
+
+    for kind in _backends:
+        _get_repository(kind)
+
+def use_storage_backend(backend, chat_backend=None, serving_daemon=False):
+    """
+    Switch the storage backend for all repositories, e.g. to "memory" in tests and benchmarks
+    Chats use `chat_backend` if given; existing repositories are closed and discarded
+    The storage daemon passes `serving_daemon`, so it keeps shared state itself instead of
+    sending it to a daemon when Chroma is shared
+    """
+    global _serving_daemon
+
+    with _lock:
+        _serving_daemon = serving_daemon
+        for repository in _repositories.values():
+            repository.close()
+        _repositories.clear()
+
+        _backends["users"] = backend
+        _backends["chats"] = chat_backend or backend
+        _backends["reports"] = backend
+        _backends["inbox"] = backend
+        _backends["search"] = chat_backend or backend
+        _backends["analytics"] = backend
@@ -0,0 +1,264 @@
+"""
+Single-writer storage daemon for running several app processes on one box
+
+One daemon process owns the storage (e.g. chroma_db/) and serves the
+repositories of database/storage.py over a Unix-domain socket, using the
+framing of database/daemon_protocol.py. App processes select it with
+STORAGE_BACKEND=daemon and get drop-in repositories from
+database/daemon_client.py.
+
+All writes go through one writer thread. It drains every queued write at
+once (up to STORAGE_DAEMON_BATCH_SIZE) and stores runs of chat messages with
+a single batched call, so concurrent senders share one embedding and one
+SQLite transaction. Reads run on a small thread pool next to it. Start it
+from the repository root before the app processes:
+
+    python -m database.storage_daemon --backend chroma
+"""
+import os
+import queue
+import socket
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from database.storage import (
+    use_storage_backend, get_user_repository, get_chat_repository, get_report_repository,
+    get_inbox_repository, get_search_index, get_analytics_repository
+)
+from database.daemon_protocol import encode_frame, read_frame, STATUS_OK, STATUS_ERROR
+from utils.config import (
+    STORAGE_BACKEND, CHAT_STORAGE_BACKEND, STORAGE_DAEMON_SOCKET,
+    STORAGE_DAEMON_BATCH_SIZE, STORAGE_DAEMON_READ_THREADS
+)
+
+# Repository behind each kind of request
+_REPOSITORIES = {
+    "users": get_user_repository,
+    "chats": get_chat_repository,
+    "reports": get_report_repository,
+    "inbox": get_inbox_repository,
+    "search": get_search_index,
+    "analytics": get_analytics_repository
+}
+
+# Methods that change data; they run in order on the writer thread
+_WRITES = {
+    "users": {"add_user", "replace_user", "replace_users", "update_users"},
+    "chats": {"add_message", "add_messages", "replace_message", "archive_conversation", "restore_conversation"},
+    "reports": {"add_report"},
+    "inbox": {"record_message", "mark_read"},
+    "search": {"add_message", "clear"},
+    "analytics": {"add_counts", "prune_seen"}
+}
+
+# Methods that only read; they run on the reader pool
+_READS = {
+    "users": {"get_user_by_email", "list_users", "list_users_by_city", "list_user_page"},
+    "chats": {"get_messages", "get_message_page", "list_counterparts", "count_messages_sent", "supports_replace",
+              "supports_archival", "list_messages_by_status", "get_conversation_activity", "export_conversation", "get_archive_stub",
+              "list_archive_stubs"},
+    "reports": {"list_reports", "list_reports_by_sender"},
+    "inbox": {"list_conversations"},
+    "search": {"search", "document_count"},
+    "analytics": {"list_counters"}
+}
+
+class _Connection:
+    """
+    A client connection; responses from the writer and the readers share its send lock
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.stream = sock.makefile("rb")
+        self._send_lock = threading.Lock()
+
+    def send(self, frames):
+        try:
+            with self._send_lock:
+                self.sock.sendall(b"".join(frames))
+        except OSError:
+            # The client went away; its reader thread cleans up
+            pass
+
+def _response_frame(request_id, payload):
+    try:
+        return encode_frame(request_id, payload)
+    except (TypeError, ValueError) as e:
+        # A result that cannot be sent is reported to the caller instead
+        return encode_frame(request_id, [STATUS_ERROR, [type(e).__name__, str(e)]])
+
+def _execute(kind, method, args):
+    """
+    Run one repository call
+    Returns the response payload
+    """
+    try:
+        return [STATUS_OK, getattr(_REPOSITORIES[kind](), method)(*args)]
+    except Exception as e:
+        return [STATUS_ERROR, [type(e).__name__, str(e)]]
+
+class StorageDaemon:
+    """
+    Serves the process's repositories to clients on a Unix-domain socket
+    """
+
+    def __init__(self, socket_path=STORAGE_DAEMON_SOCKET, batch_size=STORAGE_DAEMON_BATCH_SIZE,
+                 read_threads=STORAGE_DAEMON_READ_THREADS):
+        self.socket_path = socket_path
+        self.batch_size = batch_size
+        self._writes = queue.Queue()
+        self._readers = ThreadPoolExecutor(max_workers=read_threads, thread_name_prefix="storage-daemon-read")
+        self._listener = None
+        self._writer = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """
+        Bind the socket and start serving in background threads
+        """
+        if os.path.exists(self.socket_path):
+            # A socket left behind by a daemon that did not shut down cleanly
+            os.unlink(self.socket_path)
+        directory = os.path.dirname(self.socket_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self._listener.listen(128)
+
+        self._writer = threading.Thread(target=self._write_loop, name="storage-daemon-writer", daemon=True)
+        self._writer.start()
+        threading.Thread(target=self._accept_loop, name="storage-daemon-accept", daemon=True).start()
+
+    def stop(self):
+        """
+        Stop accepting requests, finish queued writes and remove the socket
+        """
+        self._stopped.set()
+        if self._listener:
+            self._listener.close()
+        self._writes.put(None)
+        if self._writer:
+            self._writer.join()
+        self._readers.shutdown(wait=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def _accept_loop(self):
+        while not self._stopped.is_set():
+            try:
+                sock, _ = self._listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._read_loop, args=(_Connection(sock),), daemon=True).start()
+
+    def _read_loop(self, connection):
+        """
+        Read pipelined requests from one client and dispatch them without waiting for results
+        """
+        try:
+            while True:
+                frame = read_frame(connection.stream)
+                if frame is None:
+                    break
+
+                request_id, (kind, method, args) = frame
+                if method in _WRITES.get(kind, ()):
+                    self._writes.put((connection, request_id, kind, method, args))
+                elif method in _READS.get(kind, ()):
+                    self._readers.submit(self._read, connection, request_id, kind, method, args)
+                else:
+                    connection.send([_response_frame(request_id, [STATUS_ERROR, ["ValueError", f"Unknown operation: {kind}.{method}"]])])
+        except (OSError, TypeError, ValueError, RuntimeError):
+            # A broken stream, or the daemon is stopping
+            pass
+        finally:
+            connection.stream.close()
+            connection.sock.close()
+
+    def _read(self, connection, request_id, kind, method, args):
+        connection.send([_response_frame(request_id, _execute(kind, method, args))])
+
+    def _write_loop(self):
+        """
+        The single writer: take everything queued, store it, then answer each client once
+        """
+        while True:
+            request = self._writes.get()
+            if request is None:
+                return
+
+            batch = [request]
+            while len(batch) < self.batch_size:
+                try:
+                    request = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._writes.put(None)
+                    break
+                batch.append(request)
+
+            responses = {}
+            for connection, request_id, payload in self._apply(batch):
+                responses.setdefault(connection, []).append(_response_frame(request_id, payload))
+            for connection, frames in responses.items():
+                connection.send(frames)
+
+    def _apply(self, batch):
+        """
+        Run a batch of writes in order, merging runs of chat messages into one add_messages call
+        Yields (connection, request_id, payload) for every request
+        """
+        index = 0
+        while index < len(batch):
+            connection, request_id, kind, method, args = batch[index]
+
+            if (kind, method) != ("chats", "add_message"):
+                yield connection, request_id, _execute(kind, method, args)
+                index += 1
+                continue
+
+            run_end = index
+            while run_end < len(batch) and batch[run_end][2:4] == ("chats", "add_message"):
+                run_end += 1
+            run = batch[index:run_end]
+
+            payload = _execute("chats", "add_messages", [[args for _, _, _, _, args in run]])
+            if payload[0] == STATUS_OK:
+                for connection, request_id, _, _, _ in run:
+                    yield connection, request_id, [STATUS_OK, None]
+            else:
+                # Retry one by one so a bad message only fails its own request
+                for connection, request_id, _, _, args in run:
+                    yield connection, request_id, _execute("chats", "add_message", args)
+
+            index = run_end
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the app's storage to several processes over a Unix socket")
+    parser.add_argument("--socket", default=STORAGE_DAEMON_SOCKET, help="path of the Unix-domain socket")
+    parser.add_argument("--backend", default=STORAGE_BACKEND if STORAGE_BACKEND != "daemon" else "chroma",
+                        help="storage backend the daemon owns")
+    parser.add_argument("--chat-backend", default=CHAT_STORAGE_BACKEND if CHAT_STORAGE_BACKEND != "daemon" else None,
+                        help="chat backend, if different")
+    args = parser.parse_args()
+
+    use_storage_backend(args.backend, args.chat_backend, serving_daemon=True)
+
+    daemon = StorageDaemon(args.socket)
+    daemon.start()
+    print(f"Storage daemon serving {args.backend} storage on {args.socket}; start the app with STORAGE_BACKEND=daemon")
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        daemon.stop()
+        # Switching backends closes the repositories, which flushes the chat log
+        use_storage_backend(args.backend, args.chat_backend, serving_daemon=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Streaming export of everything stored about one user
+
+An export holds the user's profile, every conversation they took part in
+(archived ones included, read straight from the archive without restoring
+them) and the toxic reports of messages they sent. Messages and reports are
+read a page at a time and written out as they arrive, so memory stays flat
+however long the history is. Within a conversation, archived messages come
+first, then the hot ones with both directions merged by timestamp. Run from
+the repository root:
+
+    python -m database.user_export alice@example.com --output alice.zip
+    python -m database.user_export alice@example.com --output alice.jsonl --format jsonl
+
+A zip holds profile.json, conversations/<counterpart>.jsonl, reports.jsonl and
+manifest.json; a JSONL export is one {"type", "counterpart", "data"} record per
+line, ending with the manifest.
+"""
+import io
+import json
+import heapq
+import itertools
+import zipfile
+import argparse
+import datetime
+from utils.config import EXPORT_PAGE_SIZE
+from database.storage import get_user_repository, get_chat_repository, get_report_repository
+from database.chat_archive import get_chat_archive
+from database.chat_operations import is_visible_to
+
+# Bumped whenever the layout of an export changes
+EXPORT_FORMAT_VERSION = 1
+
+def _dumps(record):
+    return json.dumps(record, separators=(",", ":"))
+
+def _iter_direction(chat_repository, sender_email, receiver_email, page_size):
+    cursor = None
+    while True:
+        page, cursor = chat_repository.get_message_page(sender_email, receiver_email, cursor, page_size)
+        for message_id, message_data in page:
+            yield dict(message_data, id=message_id)
+        if cursor is None:
+            return
+
+def iter_conversation(user_email, counterpart_email, page_size=EXPORT_PAGE_SIZE):
+    """
+    Stream every message between two users, archived ones first
+    Yields message dictionaries with id, sender, receiver, message and timestamp keys
+    (and status, for the user's own messages that are still in moderation)
+    """
+    chat_repository = get_chat_repository()
+
+    # The counterpart's messages in moderation were never delivered to the user
+    location = chat_repository.get_archive_stub(user_email, counterpart_email)
+    if location is not None:
+        for message_id, message_data in get_chat_archive().iter_records(location):
+            if is_visible_to(message_data, user_email):
+                yield dict(message_data, id=message_id)
+
+    # Each direction is paged in timestamp order, so merging keeps the conversation in time order
+    messages = heapq.merge(
+        _iter_direction(chat_repository, user_email, counterpart_email, page_size),
+        _iter_direction(chat_repository, counterpart_email, user_email, page_size),
+        key=lambda message: message["timestamp"]
+    )
+    yield from (message for message in messages if is_visible_to(message, user_email))
+
+def iter_reports(user_email, page_size=EXPORT_PAGE_SIZE):
+    """
+    Stream the toxic reports of messages a user sent
+    Yields report dictionaries
+    """
+    report_repository = get_report_repository()
+
+    offset = 0
+    while True:
+        page = report_repository.list_reports_by_sender(user_email, offset, page_size)
+        yield from page
+        if len(page) < page_size:
+            return
+        offset += len(page)
+
+def iter_user_export(user_email, page_size=EXPORT_PAGE_SIZE):
+    """
+    Stream everything stored about a user
+    Yields (type, counterpart, data) tuples: the profile first, then every message grouped by
+    conversation, then the reports; counterpart is None except for messages
+    Yields nothing if there is no user with this email
+    """
+    result = get_user_repository().get_user_by_email(user_email)
+    if not result:
+        return
+
+    _, user_data = result
+    yield "profile", None, user_data
+
+    for counterpart_email in get_chat_repository().list_counterparts(user_email):
+        for message in iter_conversation(user_email, counterpart_email, page_size):
+            yield "message", counterpart_email, message
+
+    for report in iter_reports(user_email, page_size):
+        yield "report", None, report
+
+def _new_manifest(user_email):
+    return {
+        "format_version": EXPORT_FORMAT_VERSION,
+        "user": user_email,
+        "exported_at": datetime.datetime.now().isoformat(),
+        "conversations": {},
+        "messages": 0,
+        "reports": 0
+    }
+
+def _count(manifest, record_type, counterpart_email):
+    if record_type == "message":
+        manifest["conversations"][counterpart_email] = manifest["conversations"].get(counterpart_email, 0) + 1
+        manifest["messages"] += 1
+    elif record_type == "report":
+        manifest["reports"] += 1
+
+def _entry_name(record_type, counterpart_email):
+    if record_type == "profile":
+        return "profile.json"
+    if record_type == "report":
+        return "reports.jsonl"
+    return f"conversations/{counterpart_email.replace('/', '_')}.jsonl"
+
+def _open_export(user_email, page_size):
+    # Look the user up before anything is written, so a missing user leaves no file behind
+    records = iter_user_export(user_email, page_size)
+    first = next(records, None)
+    if first is None:
+        return None
+    return itertools.chain([first], records)
+
+def write_export_zip(user_email, path, page_size=EXPORT_PAGE_SIZE):
+    """
+    Write a user's export to a zip archive, one entry per conversation
+    Returns the manifest, or None if there is no user with this email
+    """
+    records = _open_export(user_email, page_size)
+    if records is None:
+        return None
+
+    manifest = _new_manifest(user_email)
+    entry_name = None
+    entry = None
+
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        try:
+            for record_type, counterpart_email, data in records:
+                # Records arrive grouped by entry, so each entry is opened once and streamed into
+                name = _entry_name(record_type, counterpart_email)
+                if name != entry_name:
+                    if entry is not None:
+                        entry.close()
+                    entry_name = name
+                    entry = io.TextIOWrapper(archive.open(name, "w", force_zip64=True), encoding="utf-8")
+
+                entry.write(_dumps(data) + "\n")
+                _count(manifest, record_type, counterpart_email)
+        finally:
+            if entry is not None:
+                entry.close()
+
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+
+    return manifest
+
+def write_export_jsonl(user_email, path, page_size=EXPORT_PAGE_SIZE):
+    """
+    Write a user's export to a JSONL file, one record per line and the manifest last
+    Returns the manifest, or None if there is no user with this email
+    """
+    records = _open_export(user_email, page_size)
+    if records is None:
+        return None
+
+    manifest = _new_manifest(user_email)
+
+    with open(path, "w", encoding="utf-8") as f:
+        for record_type, counterpart_email, data in records:
+            f.write(_dumps({"type": record_type, "counterpart": counterpart_email, "data": data}) + "\n")
+            _count(manifest, record_type, counterpart_email)
+
+        f.write(_dumps({"type": "manifest", "counterpart": None, "data": manifest}) + "\n")
+
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a user's profile, conversations and reports")
+    parser.add_argument("email", help="email of the user to export")
+    parser.add_argument("--output", required=True, help="file to write the export to")
+    parser.add_argument("--format", choices=("zip", "jsonl"), default="zip")
+    parser.add_argument("--page-size", type=int, default=EXPORT_PAGE_SIZE, help="messages read per storage call")
+    args = parser.parse_args()
+
+    write_export = write_export_zip if args.format == "zip" else write_export_jsonl
+    manifest = write_export(args.email, args.output, args.page_size)
+    if manifest is None:
+        parser.exit(1, f"No user with email {args.email}\n")
+
+    print(f"Exported {manifest['messages']} messages in {len(manifest['conversations'])} conversations "
+          f"and {manifest['reports']} reports to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import itertools
+import threading
+from database.chroma_connection import get_collection
+from database.document_codec import encode_user, decode_user
+
+def _user_metadata(user_data):
+    """
+    Build the metadata stored alongside a user document
+    """
+    return {
+        "email": user_data["email"],
+        "name": user_data["name"],
+        "city": user_data["city"],
+        "subscription_status": user_data.get("subscription_status", "free"),
+        "message_count": user_data.get("message_count", 0)
+    }
+
+class UserRepository:
+    """
+    Storage interface for user profiles
+    Every read returns fresh dictionaries, so callers may modify them freely
+    """
+
+    def add_user(self, user_id, user_data):
+        """
+        Store a new user
+        """
+        raise NotImplementedError
+
+    def get_user_by_email(self, email):
+        """
+        Retrieve a user by email
+        Returns a tuple of (user_id, user_data) or None if not found
+        """
+        raise NotImplementedError
+
+    def replace_user(self, user_id, user_data):
+        """
+        Overwrite a stored user's data
+        """
+        raise NotImplementedError
+
+    def list_users(self):
+        """
+        Retrieve all users
+        """
+        raise NotImplementedError
+
+    def list_users_by_city(self, city):
+        """
+        Retrieve all users in a city
+        """
+        raise NotImplementedError
+
+    def list_user_page(self, offset, limit):
+        """
+        Retrieve up to `limit` users starting at `offset`, in a stable order
+        Returns a list of (user_id, user_data) tuples
+        """
+        raise NotImplementedError
+
+    def replace_users(self, records):
+        """
+        Overwrite several stored users, given as (user_id, user_data) tuples
+        """
+        for user_id, user_data in records:
+            self.replace_user(user_id, user_data)
+
+    def update_users(self, records):
+        """
+        Merge fields into several stored users, given as (user_id, fields) tuples
+        Each user is read when it is written, so other fields changed in the meantime are kept;
+        users that no longer exist are skipped
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Release any resources held by the repository
+        """
+
+class ChromaUserRepository(UserRepository):
+    """
+    User repository backed by the ChromaDB users collection
+    """
+
+    def _collection(self):
+        return get_collection("users")
+
+    def add_user(self, user_id, user_data):
+        self._collection().add(
+            ids=[user_id],
+            documents=[encode_user(user_data)],
+            metadatas=[_user_metadata(user_data)]
+        )
+
+    def get_user_by_email(self, email):
+        results = self._collection().get(
+            where={"email": email},
+            limit=1,
+            include=["documents"]
+        )
+
+        if results["ids"]:
+            return results["ids"][0], decode_user(results["documents"][0])
+
+        return None
+
+    def replace_user(self, user_id, user_data):
+        self._collection().update(
+            ids=[user_id],
+            documents=[encode_user(user_data)],
+            metadatas=[_user_metadata(user_data)]
+        )
+
+    def list_users(self):
+        results = self._collection().get(include=["documents"])
+        return [decode_user(document) for document in results["documents"]]
+
+    def list_users_by_city(self, city):
+        results = self._collection().get(
+            where={"city": city},
+            include=["documents"]
+        )
+        return [decode_user(document) for document in results["documents"]]
+
+    def list_user_page(self, offset, limit):
+        results = self._collection().get(limit=limit, offset=offset, include=["documents"])
+        return [(user_id, decode_user(document)) for user_id, document in zip(results["ids"], results["documents"])]
+
+    def replace_users(self, records):
+        if not records:
+            return
+
+        self._collection().update(
+            ids=[user_id for user_id, _ in records],
+            documents=[encode_user(user_data) for _, user_data in records],
+            metadatas=[_user_metadata(user_data) for _, user_data in records]
+        )
+
+    def update_users(self, records):
+        if not records:
+            return
+
+        collection = self._collection()
+        results = collection.get(ids=[user_id for user_id, _ in records], include=["documents"])
+        current = dict(zip(results["ids"], results["documents"]))
+
+        self.replace_users([
+            (user_id, dict(decode_user(current[user_id]), **fields))
+            for user_id, fields in records
+            if user_id in current
+        ])
+
+class InMemoryUserRepository(UserRepository):
+    """
+    User repository held in process memory, with the same semantics as the Chroma one
+    Encoded documents are kept in insertion order, with email and city indexes
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents = {}
+        self._cities = {}
+        self._email_index = {}
+        self._city_index = {}
+
+    def add_user(self, user_id, user_data):
+        with self._lock:
+            # Chroma ignores adds for existing IDs, and so does this repository
+            if user_id in self._documents:
+                return
+
+            self._documents[user_id] = encode_user(user_data)
+            self._cities[user_id] = user_data["city"]
+            self._email_index.setdefault(user_data["email"], user_id)
+            self._city_index.setdefault(user_data["city"], {})[user_id] = None
+
+    def get_user_by_email(self, email):
+        with self._lock:
+            user_id = self._email_index.get(email)
+            if user_id is None:
+                return None
+            return user_id, decode_user(self._documents[user_id])
+
+    def _replace_locked(self, user_id, user_data):
+        old_data = decode_user(self._documents[user_id])
+
+        # Keep the email and city indexes in step with the new document
+        if old_data["email"] != user_data["email"]:
+            if self._email_index.get(old_data["email"]) == user_id:
+                del self._email_index[old_data["email"]]
+            self._email_index.setdefault(user_data["email"], user_id)
+
+        if self._cities[user_id] != user_data["city"]:
+            del self._city_index[self._cities[user_id]][user_id]
+            self._city_index.setdefault(user_data["city"], {})[user_id] = None
+            self._cities[user_id] = user_data["city"]
+
+        self._documents[user_id] = encode_user(user_data)
+
+    def replace_user(self, user_id, user_data):
+        with self._lock:
+            self._replace_locked(user_id, user_data)
+
+    def update_users(self, records):
+        with self._lock:
+            for user_id, fields in records:
+                if user_id in self._documents:
+                    self._replace_locked(user_id, dict(decode_user(self._documents[user_id]), **fields))
+
+    def list_users(self):
+        with self._lock:
+            documents = list(self._documents.values())
+        return [decode_user(document) for document in documents]
+
+    def list_users_by_city(self, city):
+        with self._lock:
+            documents = [self._documents[user_id] for user_id in self._city_index.get(city, ())]
+        return [decode_user(document) for document in documents]
+
+    def list_user_page(self, offset, limit):
+        with self._lock:
+            records = list(itertools.islice(self._documents.items(), offset, offset + limit))
+        return [(user_id, decode_user(document)) for user_id, document in records]
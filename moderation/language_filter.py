@@ -1,27 +1,47 @@
 import os
-import json
-import requests
 import uuid
-from database.chroma_connection import get_chroma_client
+from database.storage import get_report_repository
+from utils.tracing import span, traced, record_response
+from utils.rate_limit import acquire_moderation_call
+from utils.http import get_http_session
 
-def check_message_toxicity(message):
+class ModerationBusyError(Exception):
+    """
+    Raised when the moderation API ceiling is reached; the message was not checked
+    """
+
+    def __init__(self, retry_after):
+        super().__init__(f"Moderation is busy; retry in {retry_after:.1f} seconds")
+        self.retry_after = retry_after
+
+@traced("moderation.check_message_toxicity")
+def check_message_toxicity(message, sender_email=None, receiver_email=None, max_wait=None):
     """
     Check if a message contains toxic or offensive content
     Returns True if toxic, False otherwise
+    Reports of toxic messages record the sender and receiver when they are given
+    Over the process-wide moderation ceiling, waits up to `max_wait` seconds
+    (MODERATION_MAX_WAIT_SECONDS if None) and then raises ModerationBusyError
     
     This implementation uses OpenAI's moderation API, but you could also use:
     - Perspective API from Google
     - A local model with LangChain
     - A custom toxicity detection model
     """
+    # Use OpenAI's moderation API
+    api_key = os.getenv("OPENAI_API_KEY")
+    
+    if not api_key:
+        # Fallback to a simple keyword-based check if no API key is available
+        return _simple_toxicity_check(message, sender_email, receiver_email)
+    
+    # Over the process-wide ceiling the message waits for the API; the keyword list is no
+    # substitute, or a burst of traffic would switch real moderation off for everyone
+    retry_after = acquire_moderation_call() if max_wait is None else acquire_moderation_call(max_wait)
+    if retry_after:
+        raise ModerationBusyError(retry_after)
+    
     try:
-        # Use OpenAI's moderation API
-        api_key = os.getenv("OPENAI_API_KEY")
-        
-        if not api_key:
-            # Fallback to a simple keyword-based check if no API key is available
-            return _simple_toxicity_check(message)
-        
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {api_key}"
@@ -31,11 +51,13 @@ def check_message_toxicity(message):
             "input": message
         }
         
-        response = requests.post(
-            "https://api.openai.com/v1/moderations",
-            headers=headers,
-            json=payload
-        )
+        with span("http.openai.moderations", method="POST", request_bytes=len(message)) as http_span:
+            response = get_http_session().post(
+                "https://api.openai.com/v1/moderations",
+                headers=headers,
+                json=payload
+            )
+            record_response(http_span, response)
         
         if response.status_code == 200:
             result = response.json()
@@ -45,18 +67,18 @@ def check_message_toxicity(message):
             
             # If toxic, store the report
             if is_toxic:
-                _store_toxic_report(message, result["results"][0]["categories"])
+                _store_toxic_report(message, result["results"][0]["categories"], sender_email, receiver_email)
             
             return is_toxic
         else:
             # Fallback to simple check if API call fails
-            return _simple_toxicity_check(message)
+            return _simple_toxicity_check(message, sender_email, receiver_email)
     
     except Exception as e:
         # Fallback to simple check if any error occurs
-        return _simple_toxicity_check(message)
+        return _simple_toxicity_check(message, sender_email, receiver_email)
 
-def _simple_toxicity_check(message):
+def _simple_toxicity_check(message, sender_email=None, receiver_email=None):
     """
     A simple keyword-based toxicity check
     This is a fallback method and not as accurate as using an AI model
@@ -72,18 +94,16 @@ def _simple_toxicity_check(message):
     for word in offensive_words:
         if word in message_lower:
             # Store the report
-            _store_toxic_report(message, {"profanity": True})
+            _store_toxic_report(message, {"profanity": True}, sender_email, receiver_email)
             return True
     
     return False
 
-def _store_toxic_report(message, categories):
+@traced("moderation.store_toxic_report")
+def _store_toxic_report(message, categories, sender_email=None, receiver_email=None):
     """
-    Store a report of a toxic message in the ChromaDB toxic_reports collection
+    Store a report of a toxic message in the toxic reports repository
     """
-    client = get_chroma_client()
-    toxic_reports_collection = client.get_collection("toxic_reports")
-    
     # Generate a unique ID for the report
     report_id = str(uuid.uuid4())
     
@@ -91,12 +111,10 @@ def _store_toxic_report(message, categories):
     report_data = {
         "message": message,
         "categories": categories,
+        "sender": sender_email,
+        "receiver": receiver_email,
         "timestamp": str(uuid.uuid1())  # Use timestamp for sorting
     }
     
     # Store the report
-    toxic_reports_collection.add(
-        ids=[report_id],
-        documents=[json.dumps(report_data)],
-        metadatas=[{"timestamp": report_data["timestamp"]}]
-    )
+    get_report_repository().add_report(report_id, report_data)
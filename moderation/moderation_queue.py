@@ -0,0 +1,248 @@
+"""
+Optimistic sending with moderation in the background
+
+With MODERATION_MODE=async the Send button no longer waits for the
+moderation API. submit_message() stores the message as pending, which only
+its sender sees, and hands it to a pool of MODERATION_WORKERS threads. A
+worker checks it with check_message_toxicity(); a clean message is released
+(delivered to the receiver, inboxes, search and analytics), a toxic one is
+reported and retracted, so the sender sees it removed and the receiver
+never sees it. Storage errors are retried up to MODERATION_MAX_ATTEMPTS
+times; after that the message stays pending.
+
+Queued messages are lost if the process exits, but they are still stored as
+pending. To moderate every pending message again and print the lag metrics:
+
+    python -m moderation.moderation_queue --recover
+
+Run it from one process only (e.g. after a deploy), so a message is not
+released twice. Releasing and retracting overwrite the stored message, which
+the append-only "log" chat backend cannot do; with it, get_moderation_mode()
+falls back to sync moderation and says so once.
+"""
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from database.storage import get_chat_repository
+from database.chat_repository import STATUS_PENDING
+from database.chat_operations import send_pending_message, release_message, retract_message
+from moderation.language_filter import check_message_toxicity, ModerationBusyError
+from utils.config import MODERATION_MODE, MODERATION_WORKERS, MODERATION_MAX_ATTEMPTS
+
+MODERATION_MODES = ("sync", "async")
+
+# Most recent moderated messages the lag percentiles are computed over
+_LAG_SAMPLES = 1000
+
+# Seconds before the first retry of a failed release or retraction; doubled on each attempt
+_RETRY_DELAY = 0.5
+
+def _percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {"p50": None, "p95": None, "max": None}
+    return {
+        "p50": round(values[len(values) // 2], 1),
+        "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))], 1),
+        "max": round(values[-1], 1)
+    }
+
+class ModerationQueue:
+    """
+    A pool of worker threads that moderates pending messages in submission order
+
+    Every message is timed from submission to release or retraction: the time it
+    waited for a worker, the time the toxicity check took and the total lag,
+    which is how long the receiver waits for a clean message on top of a send.
+    """
+
+    def __init__(self, workers=MODERATION_WORKERS, max_attempts=MODERATION_MAX_ATTEMPTS):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._lags = deque(maxlen=_LAG_SAMPLES)
+        self._counts = {"released": 0, "retracted": 0, "failed": 0}
+
+    def start(self):
+        """
+        Start the worker threads, if they are not running yet
+        """
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"moderation-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, message_id, message_data):
+        """
+        Queue a stored pending message for moderation
+        """
+        self.start()
+        self._queue.put((message_id, message_data, time.perf_counter()))
+
+    def join(self):
+        """
+        Wait until every queued message has been moderated
+        """
+        self._queue.join()
+
+    def _work(self):
+        while True:
+            message_id, message_data, submitted = self._queue.get()
+            try:
+                self._moderate(message_id, message_data, submitted)
+            except Exception as e:
+                print(f"Error moderating message {message_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _moderate(self, message_id, message_data, submitted):
+        started = time.perf_counter()
+
+        # Toxic messages are reported by the check itself, so it runs once whatever happens next;
+        # over the moderation API ceiling the message waits its turn (the wait counts as check time)
+        while True:
+            try:
+                is_toxic = check_message_toxicity(
+                    message_data["message"], message_data["sender"], message_data["receiver"]
+                )
+                break
+            except ModerationBusyError as e:
+                time.sleep(e.retry_after)
+        checked = time.perf_counter()
+
+        outcome = "retracted" if is_toxic else "released"
+        for attempt in range(self.max_attempts):
+            try:
+                if is_toxic:
+                    retract_message(message_id, message_data)
+                else:
+                    release_message(message_id, message_data)
+                break
+            except Exception as e:
+                if attempt == self.max_attempts - 1:
+                    # Left pending in storage; moderation_queue --recover picks it up again
+                    outcome = "failed"
+                    print(f"Error finishing moderation of message {message_id}: {str(e)}")
+                else:
+                    time.sleep(_RETRY_DELAY * 2 ** attempt)
+
+        finished = time.perf_counter()
+
+        with self._lock:
+            self._counts[outcome] += 1
+            if outcome != "failed":
+                self._lags.append((
+                    (started - submitted) * 1000,
+                    (checked - started) * 1000,
+                    (finished - submitted) * 1000
+                ))
+
+    def stats(self):
+        """
+        Summarize the moderated messages
+        Returns a dictionary with the outcome counts, the queue depth and p50/p95/max
+        milliseconds of the wait for a worker, the toxicity check and the total lag
+        """
+        with self._lock:
+            lags = list(self._lags)
+            counts = dict(self._counts)
+
+        return dict(
+            counts,
+            queued=self._queue.qsize(),
+            workers=len(self._threads),
+            wait_ms=_percentiles([lag[0] for lag in lags]),
+            check_ms=_percentiles([lag[1] for lag in lags]),
+            lag_ms=_percentiles([lag[2] for lag in lags])
+        )
+
+_moderation_queue = None
+_moderation_queue_lock = threading.Lock()
+_moderation_mode = None
+
+def get_moderation_mode():
+    """
+    Return the moderation mode this process uses, "sync" or "async"
+    MODERATION_MODE=async falls back to "sync" if the chat store cannot overwrite messages,
+    since a pending message could then never be released
+    """
+    global _moderation_mode
+
+    with _moderation_queue_lock:
+        if _moderation_mode is None:
+            if MODERATION_MODE not in MODERATION_MODES:
+                raise ValueError(f"Unknown moderation mode: {MODERATION_MODE}")
+
+            _moderation_mode = MODERATION_MODE
+            if _moderation_mode == "async" and not get_chat_repository().supports_replace():
+                print("MODERATION_MODE=async needs a chat store that can update messages; using sync moderation")
+                _moderation_mode = "sync"
+
+        return _moderation_mode
+
+def get_moderation_queue():
+    """
+    Return the process-wide moderation queue; its workers start on the first submission
+    """
+    global _moderation_queue
+
+    with _moderation_queue_lock:
+        if _moderation_queue is None:
+            _moderation_queue = ModerationQueue()
+        return _moderation_queue
+
+def submit_message(sender_email, receiver_email, message):
+    """
+    Store a message as pending and queue it for moderation
+    Returns a tuple of (message ID, message data)
+    """
+    chat_repository = get_chat_repository()
+    # Fail before storing anything rather than leave a message pending for good
+    if not chat_repository.supports_replace():
+        raise NotImplementedError(f"{type(chat_repository).__name__} cannot release moderated messages")
+
+    message_id, message_data = send_pending_message(sender_email, receiver_email, message)
+    get_moderation_queue().submit(message_id, message_data)
+    return message_id, message_data
+
+def recover_pending_messages():
+    """
+    Queue every message still pending in storage for moderation
+    Returns the number of messages queued
+    """
+    records = get_chat_repository().list_messages_by_status(STATUS_PENDING)
+    moderation_queue = get_moderation_queue()
+    for message_id, message_data in records:
+        moderation_queue.submit(message_id, message_data)
+    return len(records)
+
+def get_moderation_stats():
+    """
+    Return the moderation lag metrics of this process (see ModerationQueue.stats)
+    """
+    return get_moderation_queue().stats()
+
+def main():
+    parser = argparse.ArgumentParser(description="Moderate messages left pending in storage")
+    parser.add_argument("--recover", action="store_true", help="moderate every pending message again")
+    args = parser.parse_args()
+
+    if not args.recover:
+        parser.exit(1, "Nothing to do; pass --recover to moderate the pending messages\n")
+    if not get_chat_repository().supports_replace():
+        parser.exit(1, "The chat store cannot update messages, so pending messages cannot be moderated\n")
+
+    print(f"Moderating {recover_pending_messages()} pending messages")
+    get_moderation_queue().join()
+    print(json.dumps(get_moderation_stats(), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import os
 import uuid
 import razorpay
 from database.user_operations import update_user
+from utils.tracing import span, traced
 
 def get_subscription_plans():
     """
@@ -35,6 +36,7 @@ def get_subscription_plans():
         }
     }
 
+@traced("payments.create_subscription")
 def create_subscription(user_email, plan_id):
     """
     Create a subscription using Razorpay
@@ -71,7 +73,8 @@ def create_subscription(user_email, plan_id):
             }
         }
         
-        subscription = client.subscription.create(subscription_data)
+        with span("http.razorpay.subscription_create", method="POST"):
+            subscription = client.subscription.create(subscription_data)
         
         # Get the payment link
         payment_link = subscription.get('short_url')
@@ -90,6 +93,7 @@ def create_subscription(user_email, plan_id):
         # Return a dummy payment link for demo purposes
         return None, f"https://example.com/dummy-payment/{uuid.uuid4()}"
 
+@traced("payments.verify_payment")
 def verify_payment(user_email):
     """
     Verify a payment for a user
@@ -119,7 +123,8 @@ def verify_payment(user_email):
         subscription_id = user_data['subscription_id']
         
         # Fetch subscription details
-        subscription = client.subscription.fetch(subscription_id)
+        with span("http.razorpay.subscription_fetch", method="GET"):
+            subscription = client.subscription.fetch(subscription_id)
         
         # Check if subscription is active
         if subscription.get('status') == 'active':
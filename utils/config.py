@@ -17,6 +17,35 @@ RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET")
 
 # ChromaDB configuration
 CHROMA_PERSIST_DIRECTORY = os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_db")
+# "persistent" opens CHROMA_PERSIST_DIRECTORY in this process; "http" connects to a Chroma server
+# at CHROMA_HOST:CHROMA_PORT, which lets several app replicas share one database; they then
+# update inboxes and search messages through the storage daemon (database/storage_daemon.py)
+CHROMA_MODE = os.getenv("CHROMA_MODE", "persistent").lower()
+CHROMA_HOST = os.getenv("CHROMA_HOST", "localhost")
+CHROMA_PORT = int(os.getenv("CHROMA_PORT", "8000"))
+CHROMA_SSL = os.getenv("CHROMA_SSL", "false").lower() in ("1", "true", "yes")
+CHROMA_AUTH_TOKEN = os.getenv("CHROMA_AUTH_TOKEN")
+# Attempts to reach the server when the app starts, and the HTTP client's connection pool size
+CHROMA_HTTP_RETRIES = int(os.getenv("CHROMA_HTTP_RETRIES", "3"))
+CHROMA_HTTP_MAX_CONNECTIONS = int(os.getenv("CHROMA_HTTP_MAX_CONNECTIONS", "20"))
+# Chat messages are spread over CHAT_SHARDS collections by conversation; this only applies to a
+# new database; change an existing one with python -m database.chat_sharding --shards N
+CHAT_SHARDS = int(os.getenv("CHAT_SHARDS", "1"))
+# Seconds a process keeps using the shard layout it read, so a reshard is seen within this time
+CHAT_LAYOUT_REFRESH_SECONDS = float(os.getenv("CHAT_LAYOUT_REFRESH_SECONDS", "5"))
+# HNSW index parameters of the collections (see database/schema.py). HNSW_M and
+# HNSW_CONSTRUCTION_EF only apply when a collection is created; search_ef and the sync
+# threshold are also applied to existing collections when the app starts
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_CONSTRUCTION_EF = int(os.getenv("HNSW_CONSTRUCTION_EF", "100"))
+HNSW_SEARCH_EF = int(os.getenv("HNSW_SEARCH_EF", "100"))
+HNSW_SYNC_THRESHOLD = int(os.getenv("HNSW_SYNC_THRESHOLD", "1000"))
+# The users collection serves similarity search over profiles; its parameters default to the above
+USERS_HNSW_M = int(os.getenv("USERS_HNSW_M", str(HNSW_M)))
+USERS_HNSW_CONSTRUCTION_EF = int(os.getenv("USERS_HNSW_CONSTRUCTION_EF", str(HNSW_CONSTRUCTION_EF)))
+USERS_HNSW_SEARCH_EF = int(os.getenv("USERS_HNSW_SEARCH_EF", str(HNSW_SEARCH_EF)))
+# Chat shards take every message write, so they can sync their index in larger steps
+CHATS_HNSW_SYNC_THRESHOLD = int(os.getenv("CHATS_HNSW_SYNC_THRESHOLD", str(HNSW_SYNC_THRESHOLD)))
 
 # Application configuration
 MAX_FREE_MESSAGES = 50
@@ -37,3 +66,129 @@ SUBSCRIPTION_PLANS = {
         "duration_days": 365
     }
 }
+
+# Storage configuration
+# "chroma" persists data in ChromaDB, "memory" keeps it in process memory (tests and benchmarks),
+# "daemon" forwards every call to the storage daemon (several app processes on one box)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "chroma")
+
+# Chat storage configuration
+# Chats use STORAGE_BACKEND unless overridden; "log" stores them in an append-only segment log
+CHAT_STORAGE_BACKEND = os.getenv("CHAT_STORAGE_BACKEND", STORAGE_BACKEND)
+CHAT_LOG_DIRECTORY = os.getenv("CHAT_LOG_DIRECTORY", "./chat_log")
+CHAT_LOG_PARTITIONS = int(os.getenv("CHAT_LOG_PARTITIONS", "16"))
+CHAT_LOG_SEGMENT_BYTES = int(os.getenv("CHAT_LOG_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+# "group" waits for a shared fsync before returning, "async" returns before the fsync
+CHAT_LOG_SYNC_MODE = os.getenv("CHAT_LOG_SYNC_MODE", "group")
+CHAT_LOG_GROUP_COMMIT_MS = float(os.getenv("CHAT_LOG_GROUP_COMMIT_MS", "2"))
+
+# Tracing configuration
+# When enabled, DB and outbound HTTP calls are recorded as spans per Streamlit rerun
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes")
+TRACE_FILE = os.getenv("TRACE_FILE", "./traces/spans.jsonl")
+
+# Profiling configuration
+# "cpu" wraps every script run in cProfile, "memory" in tracemalloc, "both" in both; "off" disables
+PROFILE_MODE = os.getenv("PROFILE_MODE", "off").lower()
+PROFILE_DIRECTORY = os.getenv("PROFILE_DIRECTORY", "./profiles")
+# Older profiles of a page are deleted once it has more than this many
+PROFILE_MAX_FILES_PER_PAGE = int(os.getenv("PROFILE_MAX_FILES_PER_PAGE", "50"))
+
+# Chat archive configuration
+# Conversations idle for longer than CHAT_ARCHIVE_IDLE_DAYS are moved to compressed segment files
+CHAT_ARCHIVE_DIRECTORY = os.getenv("CHAT_ARCHIVE_DIRECTORY", "./chat_archive")
+CHAT_ARCHIVE_IDLE_DAYS = float(os.getenv("CHAT_ARCHIVE_IDLE_DAYS", "30"))
+CHAT_ARCHIVE_SEGMENT_BYTES = int(os.getenv("CHAT_ARCHIVE_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+
+# User data export configuration (python -m database.user_export)
+# Messages and reports read per storage call; an export holds about one page per direction in memory
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "500"))
+
+# Search index configuration
+# Journal replayed into the in-memory message search index on start; empty keeps the index in memory only
+SEARCH_INDEX_JOURNAL = os.getenv("SEARCH_INDEX_JOURNAL", "./search_index/journal.jsonl")
+
+# Matching configuration
+# Each user's last MATCH_HISTORY_SIZE partners are avoided by the random matchers
+MATCH_HISTORY_SIZE = int(os.getenv("MATCH_HISTORY_SIZE", "20"))
+# Match histories of the least recently active users are dropped beyond this many users
+MATCH_HISTORY_MAX_USERS = int(os.getenv("MATCH_HISTORY_MAX_USERS", "10000"))
+# Random draws tried before falling back to the least recently seen candidate
+MATCH_SAMPLE_ATTEMPTS = int(os.getenv("MATCH_SAMPLE_ATTEMPTS", "8"))
+
+# Live pairing configuration
+# Seconds a user waits in a pairing pool before falling back to a stored profile
+PAIRING_TIMEOUT_SECONDS = float(os.getenv("PAIRING_TIMEOUT_SECONDS", "10"))
+# Seconds between checks of a waiting user's ticket; the page stays usable while it waits
+PAIRING_POLL_SECONDS = float(os.getenv("PAIRING_POLL_SECONDS", "1"))
+
+# Presence configuration
+# A user counts as online for PRESENCE_TTL_SECONDS after their last heartbeat
+PRESENCE_TTL_SECONDS = float(os.getenv("PRESENCE_TTL_SECONDS", "60"))
+# Granularity of presence expiry; a presence may outlive its TTL by up to one tick
+PRESENCE_TICK_SECONDS = float(os.getenv("PRESENCE_TICK_SECONDS", "5"))
+# Open browser tabs heartbeat this often, so presence does not lapse while a user reads
+PRESENCE_HEARTBEAT_SECONDS = float(os.getenv("PRESENCE_HEARTBEAT_SECONDS", "20"))
+
+# Live chat configuration
+# Open chats also re-read the latest messages from storage this often, so messages sent through
+# another server process (whose message hub they do not share) still arrive; 0 disables it
+CHAT_STORAGE_POLL_SECONDS = float(os.getenv("CHAT_STORAGE_POLL_SECONDS", "5"))
+
+# Rate limiting configuration
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# Token buckets: a burst of *_BURST messages, refilled at *_RATE per second; a rate of 0 disables a limit
+SEND_RATE_PER_USER = float(os.getenv("SEND_RATE_PER_USER", "1"))
+SEND_BURST_PER_USER = int(os.getenv("SEND_BURST_PER_USER", "5"))
+SEND_RATE_PER_CONVERSATION = float(os.getenv("SEND_RATE_PER_CONVERSATION", "2"))
+SEND_BURST_PER_CONVERSATION = int(os.getenv("SEND_BURST_PER_CONVERSATION", "10"))
+# Process-wide ceiling on moderation API calls; a message over it waits for the API, it is never
+# checked with the local keyword list instead
+MODERATION_RATE_LIMIT = float(os.getenv("MODERATION_RATE_LIMIT", "20"))
+MODERATION_BURST = int(os.getenv("MODERATION_BURST", "40"))
+# Seconds a send waits for a moderation call before the user is asked to retry
+MODERATION_MAX_WAIT_SECONDS = float(os.getenv("MODERATION_MAX_WAIT_SECONDS", "2"))
+# Buckets of the least recently active keys are dropped beyond this many per limiter
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+# Storage daemon configuration
+# Unix-domain socket shared by the daemon (python -m database.storage_daemon) and STORAGE_BACKEND=daemon
+STORAGE_DAEMON_SOCKET = os.getenv("STORAGE_DAEMON_SOCKET", "./storage_daemon.sock")
+# Most queued writes the daemon's writer applies in one pass
+STORAGE_DAEMON_BATCH_SIZE = int(os.getenv("STORAGE_DAEMON_BATCH_SIZE", "256"))
+STORAGE_DAEMON_READ_THREADS = int(os.getenv("STORAGE_DAEMON_READ_THREADS", "4"))
+# Seconds a client waits for the daemon to answer a call
+STORAGE_DAEMON_TIMEOUT_SECONDS = float(os.getenv("STORAGE_DAEMON_TIMEOUT_SECONDS", "30"))
+
+# Profile re-verification configuration (python -m auth.reverify_profiles)
+# Progress file that lets an interrupted run resume where it stopped
+REVERIFY_CHECKPOINT_FILE = os.getenv("REVERIFY_CHECKPOINT_FILE", "./reverify_profiles.checkpoint.json")
+# Profiles read, scored and written back per batch
+REVERIFY_BATCH_SIZE = int(os.getenv("REVERIFY_BATCH_SIZE", "500"))
+
+# Warm-up configuration
+# Run utils/warmup.py on the first page load of a server process not started with
+# python -m utils.warmup --serve (which warms it up before it accepts requests)
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+# Seconds the warm-up waits for each API host while opening its connection
+WARMUP_HTTP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_HTTP_TIMEOUT_SECONDS", "3"))
+# Keep-alive connections kept per API host by the shared HTTP session
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+
+# Analytics configuration (see database/analytics.py)
+# With CHROMA_MODE=http, analytics are only recorded when the storage daemon is used
+ANALYTICS_ENABLED = os.getenv("ANALYTICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Counters are kept in memory and added to the stored buckets this often
+ANALYTICS_FLUSH_SECONDS = float(os.getenv("ANALYTICS_FLUSH_SECONDS", "10"))
+# Days shown on the admin dashboard
+ANALYTICS_DASHBOARD_DAYS = int(os.getenv("ANALYTICS_DASHBOARD_DAYS", "30"))
+# Comma-separated emails of the users who can open the admin dashboard
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+
+# Moderation pipeline configuration (see moderation/moderation_queue.py)
+# "sync" checks a message before it is stored; "async" stores it as pending and moderates it in the background
+# (only with a chat store that can update messages; with the "log" chat backend it falls back to "sync")
+MODERATION_MODE = os.getenv("MODERATION_MODE", "sync").lower()
+MODERATION_WORKERS = int(os.getenv("MODERATION_WORKERS", "4"))
+# Attempts at releasing or retracting a message before it is left pending for --recover
+MODERATION_MAX_ATTEMPTS = int(os.getenv("MODERATION_MAX_ATTEMPTS", "3"))
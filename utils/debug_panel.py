@@ -0,0 +1,67 @@
+import streamlit as st
+from utils.tracing import get_last_trace
+from utils.warmup import get_readiness
+from moderation.moderation_queue import get_moderation_stats
+
+def render_trace_panel(session_id):
+    """
+    Render the spans of the session's previous rerun in a collapsible sidebar panel
+    The current rerun is still running when the sidebar is drawn, so the panel
+    always shows the last finished one
+    """
+    trace = get_last_trace(session_id)
+
+    with st.sidebar.expander("Debug: request tracing", expanded=False):
+        if not trace:
+            st.caption("No finished rerun traced yet")
+            return
+
+        st.caption(f"Last rerun on {trace['page']}: {trace['duration_ms']:.1f} ms, {len(trace['spans'])} spans")
+
+        # Totals per span name, slowest first
+        summary = sorted(trace["summary"].items(), key=lambda item: item[1]["total_ms"], reverse=True)
+        st.text("\n".join(
+            f"{entry['total_ms']:>9.1f} ms  x{entry['count']:<3} {entry['payload']:>7}  {name}"
+            for name, entry in summary
+        ))
+
+        # Individual spans in the order they finished
+        st.text("\n".join(
+            f"+{span['offset_ms']:>8.1f} ms  {span['duration_ms']:>8.1f} ms  {span['name']}"
+            + (f" ({span['error']})" if span["error"] else "")
+            for span in trace["spans"]
+        ))
+
+def render_warmup_panel():
+    """
+    Render the warm-up status of this server process in a collapsible sidebar panel
+    """
+    readiness = get_readiness()
+
+    with st.sidebar.expander("Debug: warm-up", expanded=False):
+        if readiness["state"] == "ready":
+            st.caption(f"Ready after {readiness['total_ms']:.1f} ms")
+        else:
+            st.caption(f"Warm-up {readiness['state']}")
+
+        st.text("\n".join(
+            f"{step['ms']:>9.1f} ms  {step['name']}"
+            + (f" ({step['error']})" if not step["ok"] else "")
+            + (f" {step['detail']}" if "detail" in step else "")
+            for step in readiness["steps"]
+        ))
+
+def render_moderation_panel():
+    """
+    Render the background moderation lag of this server process in a collapsible sidebar panel
+    """
+    stats = get_moderation_stats()
+
+    with st.sidebar.expander("Debug: moderation", expanded=False):
+        st.caption(f"{stats['released']} released, {stats['retracted']} retracted, {stats['failed']} failed, "
+                   f"{stats['queued']} queued on {stats['workers']} workers")
+
+        st.text("\n".join(
+            f"{name:<6} p50 {values['p50']} ms  p95 {values['p95']} ms  max {values['max']} ms"
+            for name, values in (("wait", stats["wait_ms"]), ("check", stats["check_ms"]), ("lag", stats["lag_ms"]))
+        ))
@@ -0,0 +1,40 @@
+"""
+Process-wide HTTP session for the external APIs (Clerk, OpenAI, LinkedIn)
+
+Every call goes through one requests.Session, so calls to the same host reuse
+keep-alive connections instead of paying for a new TCP and TLS handshake each
+time. utils/warmup.py opens the first connections when the process starts.
+"""
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from utils.config import HTTP_POOL_MAXSIZE
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_http_session():
+    """
+    Return the process-wide HTTP session; it is safe to share between threads
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_MAXSIZE, pool_maxsize=HTTP_POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+def open_connection(url, timeout):
+    """
+    Open a pooled connection to the host of `url` with a HEAD request
+    Any response counts, since only the connection is wanted
+    Returns the milliseconds it took
+    """
+    start = time.perf_counter()
+    get_http_session().head(url, timeout=timeout)
+    return (time.perf_counter() - start) * 1000
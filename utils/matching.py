@@ -1,34 +1,166 @@
 import random
-from database.user_operations import get_all_users, get_users_by_city
+import threading
+from collections import deque, OrderedDict
+from database.user_operations import get_all_users, get_users_by_city, get_user_by_email
+from utils.presence import get_presence_tracker
+from utils.config import MATCH_HISTORY_SIZE, MATCH_HISTORY_MAX_USERS, MATCH_SAMPLE_ATTEMPTS
+
+class SeenMatches:
+    """
+    Memory-bounded record of each user's recent match partners
+    Every user has a ring buffer of their last `history_size` partners; only the
+    `max_users` most recently active users are tracked
+    """
+
+    def __init__(self, history_size=MATCH_HISTORY_SIZE, max_users=MATCH_HISTORY_MAX_USERS):
+        self.history_size = history_size
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._histories = OrderedDict()
+
+    def record(self, user_email, match_email):
+        """
+        Remember that a user was matched with a partner
+        """
+        with self._lock:
+            history = self._histories.get(user_email)
+            if history is None:
+                history = self._histories[user_email] = deque(maxlen=self.history_size)
+            else:
+                self._histories.move_to_end(user_email)
+
+            if match_email in history:
+                history.remove(match_email)
+            history.append(match_email)
+
+            while len(self._histories) > self.max_users:
+                self._histories.popitem(last=False)
+
+    def recency(self, user_email, match_email):
+        """
+        Rank how recently a partner was matched: 0 if not among the recent partners,
+        otherwise a higher number for a more recent match
+        """
+        with self._lock:
+            history = self._histories.get(user_email)
+            if not history or match_email not in history:
+                return 0
+            return history.index(match_email) + 1
+
+_seen_matches = SeenMatches()
+
+# Pools up to this size are checked exhaustively instead of sampled
+_EXACT_POOL_SIZE = 64
+
+def _sample_unseen(current_user_email, candidates):
+    """
+    Pick a random candidate the user was not recently matched with
+    Small pools are checked in full; larger ones get MATCH_SAMPLE_ATTEMPTS random draws.
+    If every candidate looked at was a recent partner, the one matched longest ago
+    is used, so the cost stays bounded however exhausted the pool is
+    Returns the chosen candidate
+    """
+    if len(candidates) <= _EXACT_POOL_SIZE:
+        draws = random.sample(candidates, len(candidates))
+    else:
+        draws = (random.choice(candidates) for _ in range(MATCH_SAMPLE_ATTEMPTS))
+
+    best = None
+    best_recency = None
+
+    for candidate in draws:
+        recency = _seen_matches.recency(current_user_email, candidate["email"])
+        if recency == 0:
+            best = candidate
+            break
+        if best_recency is None or recency < best_recency:
+            best = candidate
+            best_recency = recency
+
+    _seen_matches.record(current_user_email, best["email"])
+
+    return best
+
+def is_matchable(user_data):
+    """
+    Check whether a profile may be offered as a match
+    Profiles that failed re-verification (auth/reverify_profiles.py) are not; profiles
+    never re-scored were verified at sign-up
+    """
+    return user_data.get("tech_verified") is not False
 
 def find_random_match(current_user_email):
     """
     Find a random match for the current user from all users
+    Recent partners are avoided while other candidates are available
     Returns a user object or None if no match is found
     """
     # Get all users except the current user
-    all_users = get_all_users(exclude_email=current_user_email)
+    all_users = [user_data for user_data in get_all_users(exclude_email=current_user_email) if is_matchable(user_data)]
     
     if not all_users:
         return None
     
-    # Select a random user
-    random_match = random.choice(all_users)
+    # Select a random user the current user has not been matched with recently
+    random_match = _sample_unseen(current_user_email, all_users)
     
     return random_match
 
 def find_city_match(current_user_email, city):
     """
     Find a random match for the current user from users in the same city
+    Recent partners are avoided while other candidates are available
     Returns a user object or None if no match is found
     """
     # Get users from the same city except the current user
-    city_users = get_users_by_city(city, exclude_email=current_user_email)
+    city_users = [user_data for user_data in get_users_by_city(city, exclude_email=current_user_email)
+                  if is_matchable(user_data)]
     
     if not city_users:
         return None
     
-    # Select a random user
-    random_match = random.choice(city_users)
+    # Select a random user the current user has not been matched with recently
+    random_match = _sample_unseen(current_user_email, city_users)
     
     return random_match
+
+def find_online_match(current_user_email, city=None):
+    """
+    Find a random match for the current user among the users online right now
+    Draws from the presence tracker (from one city if given) without reading every
+    profile; recent partners are avoided while other online users are drawn
+    Returns a user object or None if nobody else is online
+    """
+    presence = get_presence_tracker()
+    exclude = {current_user_email}
+
+    # A drawn user whose profile cannot be matched is left out of the next draw
+    for _ in range(MATCH_SAMPLE_ATTEMPTS):
+        best_email = None
+        best_recency = None
+
+        for _ in range(MATCH_SAMPLE_ATTEMPTS):
+            candidate_email = presence.sample(city, exclude=exclude)
+            if candidate_email is None:
+                break
+
+            recency = _seen_matches.recency(current_user_email, candidate_email)
+            if recency == 0:
+                best_email = candidate_email
+                break
+            if best_recency is None or recency < best_recency:
+                best_email = candidate_email
+                best_recency = recency
+
+        if best_email is None:
+            return None
+
+        # Only the chosen candidate's profile is read
+        online_match = get_user_by_email(best_email)
+        if online_match and is_matchable(online_match):
+            _seen_matches.record(current_user_email, best_email)
+            return online_match
+
+        exclude.add(best_email)
+
+    return None
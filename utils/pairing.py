@@ -0,0 +1,150 @@
+import time
+import threading
+from collections import OrderedDict
+from database.user_operations import get_user_by_email
+from utils.matching import find_random_match, find_city_match, find_online_match, is_matchable
+from utils.config import PAIRING_TIMEOUT_SECONDS
+
+# Pool shared by everyone asking for an All-India match
+GLOBAL_POOL = "*"
+
+class PairingTicket:
+    """
+    A user's place in a wait pool; completed once a partner is found
+    """
+
+    def __init__(self, user_email, pool):
+        self.user_email = user_email
+        self.pool = pool
+        self.partner_email = None
+        self.joined_at = time.monotonic()
+
+    def _pair(self, partner_email):
+        self.partner_email = partner_email
+
+class PairingQueue:
+    """
+    Live pairing of users who are looking for a match right now
+
+    Every pool (a city, or GLOBAL_POOL) is a FIFO of waiting tickets. A user
+    joining a pool is paired with the longest-waiting user in it, or waits at
+    the end of it. Joining, pairing and cancelling are all O(1). The queue is
+    shared by every Streamlit session in the process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools = {}
+        self._tickets = {}
+
+    def join(self, user_email, pool=GLOBAL_POOL):
+        """
+        Enter a wait pool, replacing any ticket the user already holds
+        Returns the user's ticket; it is already paired if someone was waiting
+        """
+        ticket = PairingTicket(user_email, pool)
+
+        with self._lock:
+            self._remove(self._tickets.get(user_email))
+
+            waiting = self._pools.get(pool)
+            if waiting:
+                _, partner_ticket = waiting.popitem(last=False)
+                del self._tickets[partner_ticket.user_email]
+                partner_ticket._pair(user_email)
+                ticket._pair(partner_ticket.user_email)
+                return ticket
+
+            self._pools.setdefault(pool, OrderedDict())[user_email] = ticket
+            self._tickets[user_email] = ticket
+
+        return ticket
+
+    def _remove(self, ticket):
+        if ticket is None:
+            return
+
+        waiting = self._pools.get(ticket.pool)
+        if waiting and waiting.get(ticket.user_email) is ticket:
+            del waiting[ticket.user_email]
+            if not waiting:
+                del self._pools[ticket.pool]
+        if self._tickets.get(ticket.user_email) is ticket:
+            del self._tickets[ticket.user_email]
+
+    def cancel(self, ticket):
+        """
+        Leave the wait pool
+        Returns the partner's email if the ticket was paired before it could be cancelled
+        """
+        with self._lock:
+            self._remove(ticket)
+            return ticket.partner_email
+
+    def waiting_count(self, pool=None):
+        """
+        Count the users waiting in one pool, or in all pools if `pool` is None
+        """
+        with self._lock:
+            if pool is None:
+                return len(self._tickets)
+            return len(self._pools.get(pool, ()))
+
+_pairing_queue = PairingQueue()
+
+def get_pairing_queue():
+    """
+    Return the process-wide pairing queue
+    """
+    return _pairing_queue
+
+def start_live_match(current_user_email, city=None):
+    """
+    Enter the city's wait pool, or the All-India pool when no city is given
+    Returns the user's ticket, to be checked with check_live_match without blocking
+    """
+    return get_pairing_queue().join(current_user_email, city or GLOBAL_POOL)
+
+def check_live_match(ticket, timeout=None):
+    """
+    Check a ticket without waiting for it
+    The ticket is cancelled once it has waited `timeout` seconds (PAIRING_TIMEOUT_SECONDS if None)
+    Returns a tuple of (done, partner's email or None); done is False while the ticket still waits
+    """
+    if timeout is None:
+        timeout = PAIRING_TIMEOUT_SECONDS
+
+    if ticket.partner_email is not None:
+        return True, ticket.partner_email
+    if time.monotonic() - ticket.joined_at < timeout:
+        return False, None
+
+    # A partner may have arrived between the check and the cancel
+    return True, get_pairing_queue().cancel(ticket)
+
+def cancel_live_match(ticket):
+    """
+    Leave the wait pool, e.g. when the user stops looking
+    """
+    get_pairing_queue().cancel(ticket)
+
+def finish_match(current_user_email, city=None, partner_email=None):
+    """
+    Turn the outcome of live pairing into a match
+    Without a live partner, falls back to a random user who is online, then to a random
+    stored profile (from the city, if given)
+    Returns a user object or None if no match is found
+    """
+    if partner_email:
+        partner = get_user_by_email(partner_email)
+        if partner and is_matchable(partner):
+            return partner
+
+    online_match = find_online_match(current_user_email, city)
+    if online_match:
+        return online_match
+
+    if city:
+        return find_city_match(current_user_email, city)
+
+    return find_random_match(current_user_email)
@@ -0,0 +1,160 @@
+import time
+import random
+import threading
+from utils.config import PRESENCE_TTL_SECONDS, PRESENCE_TICK_SECONDS
+
+class _SampleSet:
+    """
+    Set with O(1) add, remove and uniform random choice (a list plus an index map)
+    """
+    __slots__ = ("items", "positions")
+
+    def __init__(self):
+        self.items = []
+        self.positions = {}
+
+    def add(self, item):
+        if item not in self.positions:
+            self.positions[item] = len(self.items)
+            self.items.append(item)
+
+    def remove(self, item):
+        position = self.positions.pop(item)
+        last = self.items.pop()
+        if last != item:
+            self.items[position] = last
+            self.positions[last] = position
+
+    def __len__(self):
+        return len(self.items)
+
+class PresenceTracker:
+    """
+    Who is online, kept alive by heartbeats that expire after a TTL
+
+    Expiry uses a timing wheel: time is cut into ticks of `tick_seconds`, and a user
+    whose presence expires at tick T sits in slot T modulo the wheel size. A heartbeat
+    moves the user to a later slot, and advancing the clock empties only the slots
+    that have come due, so no sweep ever scans the users who are still online.
+    Online users are also kept in per-city sample sets for O(1) random picks.
+    """
+
+    def __init__(self, ttl_seconds=PRESENCE_TTL_SECONDS, tick_seconds=PRESENCE_TICK_SECONDS, clock=time.monotonic):
+        self.tick_seconds = tick_seconds
+        self.ttl_ticks = max(1, int(-(-ttl_seconds // tick_seconds)))
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        # One more slot than the TTL spans, so a due slot never holds later expiries
+        self._wheel = [set() for _ in range(self.ttl_ticks + 1)]
+        self._tick = self._now_tick()
+        self._expiry = {}
+        self._cities = {}
+        self._everyone = _SampleSet()
+        self._by_city = {}
+
+    def _now_tick(self):
+        return int(self._clock() // self.tick_seconds)
+
+    def _advance(self):
+        """
+        Expire everyone whose slot has come due since the last call
+        """
+        now_tick = self._now_tick()
+        due_ticks = min(now_tick - self._tick, len(self._wheel))
+
+        for tick in range(self._tick + 1, self._tick + 1 + due_ticks):
+            slot = self._wheel[tick % len(self._wheel)]
+            for user_email in slot:
+                self._forget(user_email)
+            slot.clear()
+
+        self._tick = max(self._tick, now_tick)
+
+    def _forget(self, user_email):
+        del self._expiry[user_email]
+        city = self._cities.pop(user_email)
+        self._everyone.remove(user_email)
+        city_users = self._by_city[city]
+        city_users.remove(user_email)
+        if not city_users:
+            del self._by_city[city]
+
+    def heartbeat(self, user_email, city=None):
+        """
+        Mark a user online for the next TTL
+        """
+        with self._lock:
+            self._advance()
+            expiry = self._tick + self.ttl_ticks
+
+            previous = self._expiry.get(user_email)
+            if previous is not None:
+                self._wheel[previous % len(self._wheel)].discard(user_email)
+                if self._cities[user_email] != city:
+                    self._by_city[self._cities[user_email]].remove(user_email)
+                    if not self._by_city[self._cities[user_email]]:
+                        del self._by_city[self._cities[user_email]]
+                    self._by_city.setdefault(city, _SampleSet()).add(user_email)
+                    self._cities[user_email] = city
+            else:
+                self._everyone.add(user_email)
+                self._by_city.setdefault(city, _SampleSet()).add(user_email)
+                self._cities[user_email] = city
+
+            self._expiry[user_email] = expiry
+            self._wheel[expiry % len(self._wheel)].add(user_email)
+
+    def remove(self, user_email):
+        """
+        Mark a user offline immediately (e.g. on logout)
+        """
+        with self._lock:
+            expiry = self._expiry.get(user_email)
+            if expiry is not None:
+                self._wheel[expiry % len(self._wheel)].discard(user_email)
+                self._forget(user_email)
+
+    def is_online(self, user_email):
+        """
+        Check whether a user has heartbeated within the TTL
+        """
+        with self._lock:
+            self._advance()
+            return user_email in self._expiry
+
+    def online_count(self, city=None):
+        """
+        Count online users, in one city or overall
+        """
+        with self._lock:
+            self._advance()
+            if city is None:
+                return len(self._everyone)
+            return len(self._by_city.get(city, ()))
+
+    def sample(self, city=None, exclude=(), attempts=8):
+        """
+        Pick a random online user, from one city or overall, not in `exclude`
+        Returns an email or None if no eligible user was found in `attempts` draws
+        """
+        with self._lock:
+            self._advance()
+            pool = self._everyone if city is None else self._by_city.get(city)
+            if not pool:
+                return None
+
+            for _ in range(attempts):
+                user_email = random.choice(pool.items)
+                if user_email not in exclude:
+                    return user_email
+
+        return None
+
+_presence = PresenceTracker()
+
+def get_presence_tracker():
+    """
+    Return the process-wide presence tracker
+    """
+    return _presence
@@ -0,0 +1,178 @@
+"""
+Opt-in cProfile / tracemalloc profiling of Streamlit script runs
+
+With PROFILE_MODE set to cpu, memory or both, app.py wraps every script run
+between begin_profile() and end_profile(). CPU profiles are written as pstats
+files and allocation snapshots as tracemalloc dumps, one pair per run, named
+after the page that was rendered. Each page keeps its newest
+PROFILE_MAX_FILES_PER_PAGE files. Aggregate them with:
+
+    python -m utils.profiling --top 30
+    python -m utils.profiling --page Chat --sort tottime
+    python -m utils.profiling --memory --page "Find Connections"
+
+cProfile only sees the thread it was enabled on, so CPU profiles are per
+session. tracemalloc traces the whole process, so allocation snapshots taken
+while several sessions are active include their allocations too.
+"""
+import os
+import re
+import glob
+import time
+import pstats
+import cProfile
+import argparse
+import threading
+import tracemalloc
+from utils.config import PROFILE_MODE, PROFILE_DIRECTORY, PROFILE_MAX_FILES_PER_PAGE
+
+# Number of stack frames tracemalloc records per allocation
+TRACEMALLOC_FRAMES = 10
+
+_local = threading.local()
+_rotate_lock = threading.Lock()
+
+def _page_slug(page):
+    """
+    Turn a page name into a file name prefix ("Find Connections" -> "find-connections")
+    """
+    return re.sub(r"[^a-z0-9]+", "-", page.lower()).strip("-") or "page"
+
+def _rotate(page_slug, suffix):
+    """
+    Delete the oldest profiles of a page beyond PROFILE_MAX_FILES_PER_PAGE
+    """
+    with _rotate_lock:
+        paths = sorted(glob.glob(os.path.join(PROFILE_DIRECTORY, f"{page_slug}--*{suffix}")))
+        for path in paths[:-PROFILE_MAX_FILES_PER_PAGE]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+def _finish(run):
+    """
+    Stop profiling a run and write its files
+    """
+    os.makedirs(PROFILE_DIRECTORY, exist_ok=True)
+
+    # Timestamp first so that sorting file names sorts runs by age
+    base = os.path.join(
+        PROFILE_DIRECTORY,
+        f"{run['page_slug']}--{time.time_ns()}-{threading.get_ident()}"
+    )
+
+    profiler = run.get("profiler")
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(base + ".pstats")
+        _rotate(run["page_slug"], ".pstats")
+
+    if run.get("memory"):
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>")
+        ])
+        snapshot.dump(base + ".tracemalloc")
+        _rotate(run["page_slug"], ".tracemalloc")
+
+def begin_profile(page):
+    """
+    Start profiling a script run of the given page according to PROFILE_MODE
+    A previous run on this thread that never reached end_profile (st.rerun and
+    st.stop exit the script early) is finished first
+    """
+    if PROFILE_MODE == "off":
+        return
+
+    previous = getattr(_local, "run", None)
+    if previous is not None:
+        _local.run = None
+        _finish(previous)
+
+    run = {"page_slug": _page_slug(page)}
+
+    if PROFILE_MODE in ("memory", "both"):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        run["memory"] = True
+
+    if PROFILE_MODE in ("cpu", "both"):
+        run["profiler"] = cProfile.Profile()
+        run["profiler"].enable()
+
+    _local.run = run
+
+def end_profile():
+    """
+    Finish profiling the current script run and write its pstats / snapshot files
+    """
+    run = getattr(_local, "run", None)
+    if run is None:
+        return
+
+    _local.run = None
+    _finish(run)
+
+def _profiles_by_page(directory, suffix, page=None):
+    """
+    Group profile files in a directory by page slug
+    Returns a dictionary of page slug to file paths, oldest first
+    """
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(directory, f"*{suffix}"))):
+        page_slug = os.path.basename(path).split("--", 1)[0]
+        if page is None or page_slug == _page_slug(page):
+            pages.setdefault(page_slug, []).append(path)
+    return pages
+
+def report_cpu(directory, page=None, sort="cumulative", top=25):
+    """
+    Print the top functions of every page, merged across all its runs
+    """
+    for page_slug, paths in _profiles_by_page(directory, ".pstats", page).items():
+        print(f"=== {page_slug}: {len(paths)} runs ===")
+        stats = pstats.Stats(*paths)
+        stats.strip_dirs().sort_stats(sort).print_stats(top)
+
+def report_memory(directory, page=None, top=25):
+    """
+    Print the source lines holding the most memory at the end of each page's runs,
+    averaged across runs, with the growth between the oldest and newest run
+    """
+    for page_slug, paths in _profiles_by_page(directory, ".tracemalloc", page).items():
+        print(f"=== {page_slug}: {len(paths)} runs ===")
+
+        totals = {}
+        for path in paths:
+            for stat in tracemalloc.Snapshot.load(path).statistics("lineno"):
+                totals[stat.traceback] = totals.get(stat.traceback, 0) + stat.size
+
+        first = tracemalloc.Snapshot.load(paths[0])
+        last = tracemalloc.Snapshot.load(paths[-1])
+        growth = {stat.traceback: stat.size_diff for stat in last.compare_to(first, "lineno")}
+
+        ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+        for traceback, total in ranked:
+            average_kib = total / len(paths) / 1024
+            growth_kib = growth.get(traceback, 0) / 1024
+            print(f"{average_kib:>10.1f} KiB avg  {growth_kib:>+10.1f} KiB growth  {traceback}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate profiles written in PROFILE_MODE")
+    parser.add_argument("--directory", default=PROFILE_DIRECTORY)
+    parser.add_argument("--page", default=None, help="only report this page")
+    parser.add_argument("--sort", default="cumulative", help="pstats sort key")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--memory", action="store_true", help="report tracemalloc snapshots instead of pstats")
+    args = parser.parse_args()
+
+    if args.memory:
+        report_memory(args.directory, args.page, args.top)
+    else:
+        report_cpu(args.directory, args.page, args.sort, args.top)
+
+if __name__ == "__main__":
+    main()
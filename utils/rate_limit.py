@@ -0,0 +1,137 @@
+import time
+import threading
+from collections import OrderedDict
+from database.chat_repository import get_conversation_id
+from utils.config import (
+    RATE_LIMIT_ENABLED, RATE_LIMIT_MAX_KEYS,
+    SEND_RATE_PER_USER, SEND_BURST_PER_USER,
+    SEND_RATE_PER_CONVERSATION, SEND_BURST_PER_CONVERSATION,
+    MODERATION_RATE_LIMIT, MODERATION_BURST, MODERATION_MAX_WAIT_SECONDS
+)
+
+# Independent locks per limiter; a key always maps to the same stripe
+_STRIPES = 64
+
+class TokenBucketLimiter:
+    """
+    Token buckets keyed by an arbitrary string (a user, a conversation, ...)
+
+    Every key gets `burst` tokens that refill at `rate` per second, and each
+    allowed action takes one. Keys are spread over lock stripes so sessions
+    acting for different keys rarely wait on each other, and each stripe only
+    remembers its most recently used keys, bounding memory. A forgotten key
+    starts again with a full bucket, which is what it would have refilled to.
+    """
+
+    def __init__(self, rate, burst, max_keys=RATE_LIMIT_MAX_KEYS, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._max_keys_per_stripe = max(1, max_keys // _STRIPES)
+        self._locks = [threading.Lock() for _ in range(_STRIPES)]
+        self._buckets = [OrderedDict() for _ in range(_STRIPES)]
+
+    def acquire(self, key):
+        """
+        Take a token for `key` if one is available
+        Returns 0.0 if allowed, otherwise the seconds until a token will be available
+        """
+        if self.rate <= 0:
+            return 0.0
+
+        stripe = hash(key) % _STRIPES
+        buckets = self._buckets[stripe]
+
+        with self._locks[stripe]:
+            now = self._clock()
+            bucket = buckets.get(key)
+            if bucket is None:
+                # A bucket is [tokens, time of the last refill]
+                bucket = buckets[key] = [float(self.burst), now]
+                if len(buckets) > self._max_keys_per_stripe:
+                    buckets.popitem(last=False)
+            else:
+                buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+
+            return (1 - bucket[0]) / self.rate
+
+    def refund(self, key):
+        """
+        Return a token taken by `acquire`, e.g. when a later check denied the action
+        """
+        stripe = hash(key) % _STRIPES
+
+        with self._locks[stripe]:
+            bucket = self._buckets[stripe].get(key)
+            if bucket is not None:
+                bucket[0] = min(self.burst, bucket[0] + 1)
+
+_enabled = RATE_LIMIT_ENABLED
+_user_limiter = TokenBucketLimiter(SEND_RATE_PER_USER, SEND_BURST_PER_USER)
+_conversation_limiter = TokenBucketLimiter(SEND_RATE_PER_CONVERSATION, SEND_BURST_PER_CONVERSATION)
+_moderation_limiter = TokenBucketLimiter(MODERATION_RATE_LIMIT, MODERATION_BURST)
+
+def is_enabled():
+    """
+    Check whether rate limits are enforced
+    """
+    return _enabled
+
+def set_enabled(enabled):
+    """
+    Turn rate limiting on or off at runtime (e.g. for load tests)
+    """
+    global _enabled
+    _enabled = enabled
+
+def check_send_rate(sender_email, receiver_email):
+    """
+    Take a send token from the sender's bucket and from the conversation's bucket
+    Returns 0.0 if the message may be sent, otherwise the seconds to wait before retrying
+    """
+    if not _enabled:
+        return 0.0
+
+    retry_after = _user_limiter.acquire(sender_email)
+    if retry_after:
+        return retry_after
+
+    conversation_id = get_conversation_id(sender_email, receiver_email)
+    retry_after = _conversation_limiter.acquire(conversation_id)
+    if retry_after:
+        # The message is not sent, so it should not count against the sender
+        _user_limiter.refund(sender_email)
+
+    return retry_after
+
+def refund_send_rate(sender_email, receiver_email):
+    """
+    Give back the send tokens taken by check_send_rate for a message that was not sent
+    """
+    if not _enabled:
+        return
+
+    _user_limiter.refund(sender_email)
+    _conversation_limiter.refund(get_conversation_id(sender_email, receiver_email))
+
+def acquire_moderation_call(max_wait=MODERATION_MAX_WAIT_SECONDS):
+    """
+    Take a token from the process-wide moderation API ceiling, waiting up to `max_wait` seconds
+    Returns 0.0 once a moderation API call may be made, otherwise the seconds until a token
+    will be available
+    """
+    if not _enabled:
+        return 0.0
+
+    deadline = time.monotonic() + max_wait
+    while True:
+        retry_after = _moderation_limiter.acquire("*")
+        if not retry_after or time.monotonic() + retry_after > deadline:
+            return retry_after
+        time.sleep(retry_after)
@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import uuid
+import datetime
+import functools
+import threading
+from collections import OrderedDict
+from utils.config import TRACING_ENABLED, TRACE_FILE
+
+# Number of sessions whose last rerun trace is kept for the debug panel
+MAX_TRACED_SESSIONS = 1000
+
+_enabled = TRACING_ENABLED
+_local = threading.local()
+_lock = threading.Lock()
+_open_reruns = {}
+_last_traces = OrderedDict()
+
+class Span:
+    """
+    A single timed operation inside a rerun
+    """
+    __slots__ = ("name", "attributes", "offset_ms", "duration_ms", "error")
+
+    def __init__(self, name, attributes, offset_ms):
+        self.name = name
+        self.attributes = attributes
+        self.offset_ms = offset_ms
+        self.duration_ms = None
+        self.error = None
+
+    def set(self, **attributes):
+        """
+        Attach attributes (status codes, payload sizes, ...) to the span
+        """
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "offset_ms": round(self.offset_ms, 3),
+            "duration_ms": round(self.duration_ms, 3),
+            "error": self.error,
+            "attributes": self.attributes
+        }
+
+class _NoopSpan:
+    """
+    Span returned when tracing is disabled or no rerun is active; does nothing
+    """
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+class _SpanContext:
+    def __init__(self, rerun, name, attributes):
+        self.rerun = rerun
+        self.span = Span(name, attributes, (time.perf_counter() - rerun.start) * 1000)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.span.duration_ms = (time.perf_counter() - self.start) * 1000
+        if exc_type is not None:
+            self.span.error = exc_type.__name__
+        self.rerun.spans.append(self.span)
+        return False
+
+class RerunTrace:
+    """
+    All spans recorded during one Streamlit script run of one session
+    """
+
+    def __init__(self, session_id, page):
+        self.rerun_id = str(uuid.uuid4())
+        self.session_id = session_id
+        self.page = page
+        self.started_at = datetime.datetime.now().isoformat()
+        self.start = time.perf_counter()
+        self.spans = []
+
+    def to_dict(self):
+        """
+        Serialize the rerun with per-span-name totals
+        """
+        summary = {}
+        for span in self.spans:
+            entry = summary.setdefault(span.name, {"count": 0, "total_ms": 0.0, "payload": 0})
+            entry["count"] += 1
+            entry["total_ms"] = round(entry["total_ms"] + span.duration_ms, 3)
+            for key in ("result_size", "request_bytes", "response_bytes"):
+                entry["payload"] += span.attributes.get(key) or 0
+
+        return {
+            "rerun_id": self.rerun_id,
+            "session_id": self.session_id,
+            "page": self.page,
+            "started_at": self.started_at,
+            "duration_ms": round((time.perf_counter() - self.start) * 1000, 3),
+            "spans": [span.to_dict() for span in self.spans],
+            "summary": summary
+        }
+
+def is_enabled():
+    """
+    Check whether tracing is enabled
+    """
+    return _enabled
+
+def set_enabled(enabled):
+    """
+    Enable or disable tracing at runtime (TRACING_ENABLED sets the initial value)
+    """
+    global _enabled
+    _enabled = enabled
+
+def payload_size(value):
+    """
+    Return a cheap size measure of a value: its length if it has one, else None
+    """
+    if isinstance(value, (str, bytes, list, tuple, dict, set)):
+        return len(value)
+    return None
+
+def span(name, **attributes):
+    """
+    Context manager timing a block as a span of the current rerun
+    Returns a no-op span when tracing is disabled or no rerun is active
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+
+    rerun = getattr(_local, "rerun", None)
+    if rerun is None:
+        return _NOOP_SPAN
+
+    return _SpanContext(rerun, name, attributes)
+
+def traced(name=None):
+    """
+    Decorator recording every call of a function as a span, with the result size
+    When tracing is disabled the only overhead is one flag check per call
+    """
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+
+            with span(span_name) as current:
+                result = func(*args, **kwargs)
+                current.set(result_size=payload_size(result))
+                return result
+
+        return wrapper
+
+    return decorator
+
+def _write_trace(record):
+    """
+    Append a finished rerun to the JSONL trace file
+    """
+    directory = os.path.dirname(TRACE_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with open(TRACE_FILE, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+def _finish(rerun):
+    record = rerun.to_dict()
+
+    with _lock:
+        if _open_reruns.get(rerun.session_id) is rerun:
+            del _open_reruns[rerun.session_id]
+        _last_traces[rerun.session_id] = record
+        _last_traces.move_to_end(rerun.session_id)
+        while len(_last_traces) > MAX_TRACED_SESSIONS:
+            _last_traces.popitem(last=False)
+        _write_trace(record)
+
+def begin_rerun(session_id, page):
+    """
+    Start collecting spans for a script run of a session
+    A previous run of the same session that never reached end_rerun (st.rerun and
+    st.stop exit the script early) is finished first
+    """
+    if not _enabled:
+        return
+
+    with _lock:
+        previous = _open_reruns.get(session_id)
+
+    if previous is not None:
+        _finish(previous)
+
+    rerun = RerunTrace(session_id, page)
+    _local.rerun = rerun
+
+    with _lock:
+        _open_reruns[session_id] = rerun
+
+def end_rerun():
+    """
+    Finish the current script run and export its spans
+    """
+    rerun = getattr(_local, "rerun", None)
+    if rerun is None:
+        return
+
+    _local.rerun = None
+    _finish(rerun)
+
+def get_last_trace(session_id):
+    """
+    Return the most recent finished rerun trace of a session, or None
+    """
+    with _lock:
+        return _last_traces.get(session_id)
+
+def record_response(current_span, response):
+    """
+    Attach the status code and body size of an HTTP response to a span
+    """
+    current_span.set(status=response.status_code, response_bytes=len(response.content))
@@ -0,0 +1,180 @@
+"""
+Warm-start a server process before its first user arrives
+
+Without it the first request after a deploy pays for opening Chroma and its
+collections, loading the embedding model, the first reads of every
+repository and the first TLS handshakes with Clerk and OpenAI. warm_up()
+does all of that once per process, timing every step, and get_readiness()
+reports how far it got. A step that fails is recorded and skipped; it only
+means the first request pays for that part as before.
+
+Start the server through the warm-up, so it runs to completion in the server
+process before any request is accepted (extra arguments go to streamlit run):
+
+    python -m utils.warmup --serve --server.port 8501
+
+Started with plain `streamlit run app.py`, the app runs it on its first page
+load instead, and sessions that arrive meanwhile wait for it. To see the
+timings of a cold start:
+
+    python -m utils.warmup
+"""
+import os
+import sys
+import json
+import argparse
+import time
+import threading
+from database.storage import (
+    initialize_storage, uses_backend, get_user_repository, get_chat_repository,
+    get_inbox_repository, get_search_index
+)
+from database.chat_archive import get_chat_archive
+from auth.tech_keywords import keywords_version, score_resume_text, score_skills
+from utils.http import open_connection
+from moderation.moderation_queue import get_moderation_mode
+from utils.config import WARMUP_HTTP_TIMEOUT_SECONDS
+
+# Script the --serve entrypoint hands to streamlit run
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+# Reads with this address touch every repository without finding anything
+WARMUP_EMAIL = "warmup@techconnect.invalid"
+
+# API hosts whose connections are opened, if the app is configured to call them
+_API_HOSTS = {
+    "clerk": ("CLERK_SECRET_KEY", "https://api.clerk.dev"),
+    "openai": ("OPENAI_API_KEY", "https://api.openai.com")
+}
+
+_lock = threading.Lock()
+_status = {"state": "cold", "steps": [], "total_ms": None}
+
+def _open_storage():
+    initialize_storage()
+
+def _touch_collections():
+    # One read per repository brings its collection, indexes and SQLite pages into memory
+    get_user_repository().get_user_by_email(WARMUP_EMAIL)
+    get_chat_repository().get_messages(WARMUP_EMAIL, WARMUP_EMAIL, limit=1)
+    get_inbox_repository().list_conversations(WARMUP_EMAIL, limit=1)
+    get_search_index().search(WARMUP_EMAIL, "warm up", limit=1)
+
+def _load_embedding_model():
+    # Only a process that stores in Chroma itself embeds; the daemon does it for its clients
+    if not uses_backend("chroma"):
+        return "skipped"
+
+    from database.chroma_connection import EMBEDDING_FUNCTION
+    EMBEDDING_FUNCTION(["warm up"])
+
+def _prepare_matchers():
+    keywords_version()
+    score_resume_text("warm up")
+    score_skills(["warm up"])
+    # PyPDFLoader imports the PDF reader on the first resume upload
+    import pypdf
+
+def _resolve_moderation_mode():
+    # Settles the fallback from async moderation before the first send needs it
+    return get_moderation_mode()
+
+def _prime_caches():
+    get_chat_archive()
+    if uses_backend("chroma"):
+        from database.chroma_connection import get_chat_layout
+        get_chat_layout()
+
+def _open_http_connections():
+    opened = {}
+    for name, (key_variable, url) in _API_HOSTS.items():
+        if os.getenv(key_variable):
+            opened[name] = round(open_connection(url, WARMUP_HTTP_TIMEOUT_SECONDS), 1)
+    return opened or "skipped"
+
+# Steps in the order they run; storage comes first because the others use it
+WARMUP_STEPS = [
+    ("storage", _open_storage),
+    ("collections", _touch_collections),
+    ("embedding_model", _load_embedding_model),
+    ("matchers", _prepare_matchers),
+    ("caches", _prime_caches),
+    ("moderation", _resolve_moderation_mode),
+    ("http", _open_http_connections)
+]
+
+def warm_up():
+    """
+    Run every warm-up step once per process; later calls wait for the first and return
+    Returns the readiness status
+    """
+    with _lock:
+        if _status["state"] != "cold":
+            return get_readiness()
+        _status["state"] = "warming"
+
+        start = time.perf_counter()
+        for name, step in WARMUP_STEPS:
+            step_start = time.perf_counter()
+            entry = {"name": name, "ok": True}
+            try:
+                detail = step()
+                if detail is not None:
+                    entry["detail"] = detail
+            except Exception as e:
+                entry["ok"] = False
+                entry["error"] = f"{type(e).__name__}: {e}"
+            entry["ms"] = round((time.perf_counter() - step_start) * 1000, 1)
+            _status["steps"].append(entry)
+
+        _status["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        _status["state"] = "ready"
+
+    return get_readiness()
+
+def get_readiness():
+    """
+    Report the warm-up progress
+    Returns a dictionary with state ("cold", "warming" or "ready"), the finished steps
+    with their milliseconds and any errors, and the total milliseconds once ready
+    """
+    return {
+        "state": _status["state"],
+        "steps": [dict(step) for step in _status["steps"]],
+        "total_ms": _status["total_ms"]
+    }
+
+def is_ready():
+    """
+    Check whether the warm-up has finished
+    """
+    return _status["state"] == "ready"
+
+def serve(streamlit_args):
+    """
+    Warm up this process, then run the app's Streamlit server in it
+    The server shares the process's modules, so its first request finds everything warm
+    """
+    print(json.dumps(warm_up(), indent=2))
+
+    from streamlit.web import cli as streamlit_cli
+    sys.argv = ["streamlit", "run", APP_SCRIPT] + streamlit_args
+    sys.exit(streamlit_cli.main())
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm up a server process and print the step timings")
+    parser.add_argument("--serve", action="store_true", help="then run the app in this process; other arguments go to streamlit run")
+    args, streamlit_args = parser.parse_known_args()
+
+    if args.serve:
+        serve(streamlit_args)
+        return
+    if streamlit_args:
+        parser.error(f"unrecognized arguments: {' '.join(streamlit_args)}")
+
+    print(json.dumps(warm_up(), indent=2))
+
+if __name__ == "__main__":
+    # Run from the imported module, so the app's `from utils.warmup import ...` sees this warm-up's state
+    from utils.warmup import main as warmup_main
+    warmup_main()